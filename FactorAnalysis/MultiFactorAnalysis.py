@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:12:37 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import numpy as np
+
+import neutralize
+import preprocessing
+import bucketing
+import turnover
+import performance
+
+def _group_sum(data, keys):
+    '''
+    按keys对宽表逐列求和，并广播回原来的行
+    '''
+    return data.groupby(keys).transform('sum')
+
+class MultiFactorScreen:
+
+    def __init__(self, factors, hist_data, only_rebalance_date = False,
+                 subset = 'all', preprocess = True, market_value_neutral = True,
+                 industry_neutral = True, fill_value = 'mean', group_num = 5,
+                 balance_time = '1M', select_from_industry = False):
+        '''
+        factors: 要研究的因子数据，宽表，每一列是一个因子
+        hist_data: 股票历史价量数据，不做复制，所有因子共用
+        其余参数与SFPortfolio相同，每个因子使用同一套调仓日、股票池和收益率
+        '''
+        self._factors = pd.DataFrame(factors)
+        self._hist_data = hist_data
+        self._balance_time = balance_time
+        self._subset = subset
+        self._group_num = group_num
+        self._market_neutral = market_value_neutral
+        self._industry_neutral = industry_neutral
+        self._fill_value = fill_value
+        self._preprocess = preprocess
+        self._only_rebalance_date = only_rebalance_date
+        self._select_from_industry = select_from_industry
+
+        self._IC_data = None
+        self._group = None
+        self._returns = None
+        self._rebalance_date = self._cal_rebalance_date()
+        self._sub_data, self._factors_sub = self._extract_rebalance_day_data()
+
+    @property
+    def factor_names(self):
+        return list(self._factors.columns)
+
+    def _cal_rebalance_date(self):
+        '''
+        计算调仓日期，与SFPortfolio一致
+        '''
+        if self._only_rebalance_date:
+            return self._factors.index.get_level_values('date').unique().sort_values()
+        unique_date = self._hist_data.index.get_level_values('date').unique().sort_values()
+        trade_date = list(unique_date[::self._balance_time])
+        last_date = unique_date[-1]
+        if last_date != trade_date[-1]:
+            trade_date += [last_date]
+        return pd.Series(trade_date)
+
+    def _extract_rebalance_day_data(self):
+        '''
+        只提取一次调仓日的股票池和收益率，因子逐列做预处理和中性化后按股票池对齐成宽表
+        '''
+        sub_date = self._rebalance_date
+        hist_data_sub = self._hist_data[self._hist_data.index.get_level_values('date').isin(sub_date)]
+        factors_sub = self._factors[self._factors.index.get_level_values('date').isin(sub_date)]
+
+        if self._preprocess:#所有因子一次预处理
+            factors_sub = preprocessing.preprocess_factors(factors_sub, hist_data_sub, fill_value = self._fill_value)
+        if self._market_neutral or self._industry_neutral:#所有因子一次中性化
+            factors_sub = neutralize.neutralize(factors_sub, hist_data_sub, industry = self._industry_neutral, market_value = self._market_neutral)
+
+        used_columns = ['returns', 'adj_close', 'industry', 'market_value', 'is_ST', 'is_new_stock', 'status']
+        if self._subset != 'all':
+            used_columns.append(self._subset)
+        hist_data_sub = hist_data_sub[used_columns].sort_index()
+        adj_close = hist_data_sub['adj_close']
+        hist_data_sub['period_returns'] = adj_close.groupby(level = 'code').shift(-1) / adj_close - 1
+        hist_data_sub = hist_data_sub[(hist_data_sub['is_ST'] == 0) & (hist_data_sub['is_new_stock'] == 0) & (hist_data_sub['status'] == 1)]
+        if self._subset != 'all':
+            hist_data_sub = hist_data_sub[hist_data_sub[self._subset] == 1]
+
+        factors_sub = factors_sub.reindex(hist_data_sub.index)
+        has_factor = factors_sub.notna().any(axis = 1).values
+        return hist_data_sub[has_factor], factors_sub[has_factor]
+
+    def _rank_and_divide(self):
+        '''
+        所有因子同时在截面上排序并分成数量相等的组，组号为int8，没有因子值的位置为0
+        '''
+        by = self._sub_data['industry'] if self._select_from_industry else None
+        self._group = bucketing.bucket_factors(self._factors_sub, self._group_num, by = by)
+
+    def _cal_returns(self):
+        '''
+        计算每个因子每一组调仓之间的收益，返回{因子名: 收益率表}
+        '''
+        if self._group is None: self._rank_and_divide()
+        if self._IC_data is None: self._IC()
+
+        date = self._sub_data.index.get_level_values('date')
+        period_returns = self._sub_data['period_returns'].values[:, None]
+        has_returns = ~np.isnan(period_returns)
+        group_returns = {}
+        for g in range(1, self._group_num + 1):
+            in_group = (self._group.values == g) & has_returns
+            returns_sum = pd.DataFrame(np.where(in_group, period_returns, 0), index = date, columns = self._group.columns).groupby(level = 'date').sum()
+            count = pd.DataFrame(in_group, index = date, columns = self._group.columns).groupby(level = 'date').sum()
+            group_returns[g] = returns_sum / count.replace(0, np.nan)
+
+        has_factor = self._factors_sub.notna().groupby(date).any()
+        returns = {}
+        for factor_name in self.factor_names:
+            factor_returns = pd.concat([group_returns[g][factor_name] for g in range(1, self._group_num + 1)], axis = 1)
+            factor_returns = factor_returns[has_factor[factor_name]]
+            factor_returns.columns = list(range(1, self._group_num + 1))
+            factor_returns.columns.name = 'group'
+            factor_returns['long_short'] = - factor_returns[1] + factor_returns[self._group_num]
+            if self._IC_data['Rank_IC'][factor_name].mean() < 0:
+                factor_returns['long_short'] = -1 * factor_returns['long_short']
+            returns[factor_name] = factor_returns
+        self._returns = returns
+
+    def _IC(self):
+        '''
+        用按日期的分段求和同时计算所有因子的Rank IC和IC
+        '''
+        period_returns = self._sub_data['period_returns'].values[:, None]
+        valid = self._factors_sub.notna().values & ~np.isnan(period_returns) & (period_returns != 0)
+        date = self._sub_data.index.get_level_values('date')
+        factors = self._factors_sub.where(valid)
+        returns = pd.DataFrame(np.where(valid, period_returns, np.nan), index = self._factors_sub.index, columns = self._factors_sub.columns)
+
+        def corr(x, y):
+            x = x - x.groupby(date).transform('mean')
+            y = y - y.groupby(date).transform('mean')
+            xy = (x * y).groupby(date).sum()
+            xx = (x * x).groupby(date).sum()
+            yy = (y * y).groupby(date).sum()
+            count = x.notna().groupby(date).sum()
+            return (xy / np.sqrt(xx * yy)).where(count > 1)
+
+        Rank_IC = corr(factors.groupby(date).rank(), returns.groupby(date).rank())
+        IC = corr(factors, returns)
+        self._IC_data = {'Rank_IC':Rank_IC, 'IC':IC}
+
+    def IC(self):
+        if self._IC_data is None:
+            self._IC()
+        return pd.DataFrame({name:data.mean() for name, data in self._IC_data.items()})
+
+    def IR(self):
+        if self._IC_data is None:
+            self._IC()
+        return pd.DataFrame({name + '_IR':data.mean() / data.std() for name, data in self._IC_data.items()})
+
+    def sharpe_ratio(self):
+        if self._returns is None: self._cal_returns()
+        return pd.DataFrame({name:returns.mean() / returns.std() for name, returns in self._returns.items()}).T * ((252 / self._balance_time) ** 0.5)
+
+    def t_values(self):
+        '''
+        截面回归 returns ~ 行业哑变量 + market_value + 因子 中因子的t值，
+        行业哑变量通过行业内去均值吸收，市值通过Frisch-Waugh定理剔除，所有因子同时计算
+        '''
+        t_data = self._sub_data[['returns', 'industry', 'market_value']]
+        valid = self._factors_sub.notna().values & t_data.notna().all(axis = 1).values[:, None]
+        columns = self._factors_sub.columns
+        index = self._factors_sub.index
+        date = index.get_level_values('date')
+        date_industry = [date, t_data['industry'].values]
+
+        def masked(values):
+            return pd.DataFrame(np.where(valid, values, 0), index = index, columns = columns)
+        weights = masked(1.0)
+        count = _group_sum(weights, date_industry).replace(0, np.nan)
+
+        def demean(values):
+            values = masked(values)
+            return (values - _group_sum(values, date_industry) / count).where(valid, 0)
+        y = demean(t_data['returns'].values[:, None])
+        m = demean(t_data['market_value'].values[:, None])
+        f = demean(self._factors_sub.values)
+
+        def inner(a, b):
+            return (a * b).groupby(date).sum()
+        S_mm = inner(m, m)
+        S_ym, S_fm = inner(y, m), inner(f, m)
+        fy = inner(f, y) - S_fm * S_ym / S_mm
+        ff = inner(f, f) - S_fm ** 2 / S_mm
+        yy = inner(y, y) - S_ym ** 2 / S_mm
+        beta = fy / ff
+        n = weights.groupby(date).sum()
+        industry_num = (weights.groupby(date_industry).sum() > 0).groupby(level = 0).sum()
+        dof = n - industry_num - 2
+        t_series = beta / np.sqrt((yy - beta * fy) / dof / ff)
+        t_series = t_series.where(n > 0)
+
+        significant = t_series.abs() > 2
+        sign = np.sign(t_series).where(significant)
+        direction = sign * sign.ffill().shift(1)
+        count = t_series.count()
+        t_mean = t_series.mean()
+        t_significant_mean = significant.sum() / count
+        t_same_direction = (direction > 0).sum() / count
+        t_opposite_direction = (direction < 0).sum() / count
+        return t_mean, t_significant_mean, t_same_direction, t_opposite_direction
+
+    def turnover(self):
+        '''
+        计算所有因子第1组与最后一组的等权换手率之和，与SFPortfolio.turnover相同，按实际的调仓间隔年化
+        '''
+        if self._group is None: self._rank_and_divide()
+        return pd.Series({name:turnover.long_short_turnover(turnover.group_turnover(turnover.holdings(group)),
+                                                            self._group_num, self._rebalance_date)
+                          for name, group in self._group.items()})
+
+    def max_drawdown(self):
+        if self._returns is None: self._cal_returns()
+        return pd.DataFrame({name:performance.max_drawdown(returns) for name, returns in self._returns.items()}).T
+
+    @property
+    def returns(self):
+        if self._returns is None: self._cal_returns()
+        return self._returns
+
+    def summary(self):
+        '''
+        与SFPortfolio.summary相同的统计量，每行一个因子，不绘图
+        '''
+        if self._returns is None: self._cal_returns()
+        annual = 252 / self._balance_time
+
+        IC = self.IC()
+        IR = self.IR()
+        SR = self.sharpe_ratio()
+        returns_mean = pd.DataFrame({name:returns.mean() for name, returns in self._returns.items()}).T * annual
+        positive = IC['Rank_IC'] > 0
+        top, bottom = self._group_num, 1
+        t_mean, greater_than2, t_same_direction, t_opposite_direction = self.t_values()
+
+        statistics = pd.DataFrame({
+            'Top Portfolio Returns Mean':returns_mean[bottom].where(~positive, returns_mean[top]),
+            'Bottom Portfolio Returns Mean':returns_mean[top].where(~positive, returns_mean[bottom]),
+            'Market Returns Mean':returns_mean.mean(axis = 1),
+            'Long-Short Returns Mean':returns_mean['long_short'],
+            'Top Portfolio Sharpe Ratio':SR[bottom].where(~positive, SR[top]),
+            'Long-Short Portfolio Sharpe Ratio':SR['long_short'],
+            'Rank_IC':IC['Rank_IC'],
+            'IC':IC['IC'],
+            'Rank_IR':IR['Rank_IC_IR'],
+            'IR':IR['IC_IR'],
+            'Max Drawdown':self.max_drawdown()['long_short'],
+            't':t_mean,
+            'Greater Than 2':greater_than2,
+            't_same_direction':t_same_direction,
+            't_opposite_direction':t_opposite_direction,
+            'Win Ratio':pd.Series({name:(returns['long_short'] > 0).mean() for name, returns in self._returns.items()}),
+            'Turnover':self.turnover()},
+            index = self.factor_names)
+        statistics.index.name = 'factor'
+        return statistics
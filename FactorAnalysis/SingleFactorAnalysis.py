@@ -4,23 +4,55 @@ Created on Fri Jun 28 12:45:03 2019
 
 @author: lenovo
 """
-import time
 import pickle
 
-import statsmodels.api as sm
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from pandas.tseries.offsets import Day
 
 import utils
+import neutralize
+import bucketing
+import cross_section
+import turnover
+import ic_analysis
+import resampling
+import performance
+import result_cache
+import schema
+import profiling
+from plotting import PlottingMixin
 
-class SFPortfolio:
+class SFPortfolio(PlottingMixin):
     
+    #缓存的阶段及其直接依赖，一个阶段失效时依赖它的阶段也失效
+    #_returns依赖IC是因为多空组合的方向由IC的符号决定
+    STAGES = {'_sub_data':[],
+              '_IC_data':['_sub_data'],
+              '_t_values':['_sub_data'],
+              '_group':['_sub_data'],
+              '_returns':['_group', '_IC_data'],
+              '_group_turnover':['_group'],
+              '_daily_returns':['_group'],
+              '_holding_returns':['_group']}
+    #构造参数对应的属性和它直接影响的阶段
+    PARAMETERS = {'only_rebalance_date':('_only_rebalance_date', ['_sub_data']),
+                  'subset':('_subset', ['_sub_data']),
+                  'preprocess':('_preprocess', ['_sub_data']),
+                  'market_value_neutral':('_market_neutral', ['_sub_data']),
+                  'industry_neutral':('_industry_neutral', ['_sub_data']),
+                  'fill_value':('_fill_value', ['_sub_data']),
+                  'balance_time':('_balance_time', ['_sub_data']),
+                  'group_num':('_group_num', ['_group']),
+                  'select_from_industry':('_select_from_industry', ['_group']),
+                  'weights':('_weights', ['_group_turnover', '_daily_returns', '_holding_returns']),
+                  'low_memory':('_low_memory', [])}
+    
+    @profiling.profiled(rows = lambda result, self, factors, hist_data, *args, **kwargs:len(hist_data))
     def __init__(self, factors, hist_data, only_rebalance_date = False, 
                  subset = 'all', preprocess = True, market_value_neutral = True, 
                  industry_neutral = True, fill_value = 'mean', group_num = 5, 
-                 balance_time = '1M', weights = 'EW', select_from_industry = False):
+                 balance_time = '1M', weights = 'EW', select_from_industry = False, low_memory = False):
         '''
         factors: 要研究的因子数据
         hist_data: 股票历史价量数据
@@ -34,6 +66,7 @@ class SFPortfolio:
         balance_time: 调仓周期
         weights: 股票权重序列，EW代表等权
         select_from_industry:是否将股票按照行业分组
+        low_memory: 日度收益逐个调仓区间计算，峰值内存更低，结果相同
         '''
         self._factors = factors.copy()
         self._balance_time = balance_time
@@ -47,141 +80,282 @@ class SFPortfolio:
         self._preprocess = preprocess
         self._only_rebalance_date = only_rebalance_date
         self._select_from_industry = select_from_industry
+        self._low_memory = low_memory
         
-        self._IC_data = None
+        for stage in self.STAGES:
+            setattr(self, stage, None)
+        self._prepare_sub_data()
+    
+    def _prepare_sub_data(self):
+        '''
+        计算调仓日和调仓日的数据，调仓日相关的参数改变后重新调用
+        '''
+        self._trade_date = self._cal_trade_date(self._factors if self._only_rebalance_date else self._hist_data)
         self._rebalance_date = self._cal_rebalance_date()
-        self._group = None
-        self._returns = None
         self._sub_data = self._extract_rebalance_day_data()
     
-    def _extract_rebalance_day_data(self):
+    @classmethod
+    def _downstream(cls, stages):
+        '''
+        stages以及所有直接或间接依赖它们的阶段
+        '''
+        result = set(stages)
+        changed = True
+        while changed:
+            dependents = {stage for stage, dependencies in cls.STAGES.items() if result.intersection(dependencies)}
+            changed = not dependents <= result
+            result |= dependents
+        return result
+    
+    def _invalidate(self, *stages):
+        '''
+        清空stages及其下游阶段的缓存
+        分组失效时_sub_data换成去掉旧group列的副本，_cal_returns写入group列时不会改到共用它的对象
+        '''
+        stages = self._downstream(stages)
+        for stage in stages:
+            setattr(self, stage, None)
+        if '_group' in stages and self._sub_data is not None:
+            self._sub_data = self._sub_data.drop(columns = 'group', errors = 'ignore')
+    
+    def _assign(self, **attributes):
+        '''
+        直接替换属性(参数或者某个阶段的结果)，受影响的下游阶段失效，传入的阶段结果保留
+        用于共用上游结果的派生对象，例如sweep
+        '''
+        parameter_stages = dict(self.PARAMETERS.values())
+        stages = set()
+        for name in attributes:
+            stages.update(parameter_stages.get(name, [name] if name in self.STAGES else []))
+        self.__dict__.update(attributes)
+        self._invalidate(*(self._downstream(stages) - set(attributes)))
+        return self
+    
+    def set_params(self, **params):
+        '''
+        修改构造参数，只有受影响的阶段会重新计算，例如只改weights时分组、IC和分组收益都保留
+        '''
+        attributes = {}
+        for name, value in params.items():
+            if name not in self.PARAMETERS:
+                raise ValueError('不支持的参数: {}'.format(name))
+            attribute = self.PARAMETERS[name][0]
+            if getattr(self, attribute) != value:
+                attributes[attribute] = value
+        self._assign(**attributes)
+        if self._sub_data is None:
+            self._prepare_sub_data()
+        return self
+    
+    @profiling.profiled()
+    def _extract_rebalance_day_data(self, sub_date = None):
         '''
         提取填仓日的因子数据和股票价格数据，并根据参数进行因子数据预处理
+        sub_date: 只处理这些调仓日，必须是调仓日序列的一个后缀，默认为全部调仓日
         '''
-        sub_date =  self._rebalance_date
+        sub_date = self._rebalance_date if sub_date is None else sub_date
         hist_data_sub = self._hist_data[self._hist_data.index.get_level_values('date').isin(sub_date)]
-        
         factors_sub  = self._factors[self._factors.index.get_level_values('date').isin(sub_date)]
+        return result_cache.cached('SFPortfolio._extract_rebalance_day_data',
+                                   [hist_data_sub, factors_sub, self._stage_params('_sub_data')],
+                                   lambda:self._build_rebalance_day_data(hist_data_sub, factors_sub))
+    
+    def _build_rebalance_day_data(self, hist_data_sub, factors_sub):
+        factors_sub = self._process_factors(factors_sub, hist_data_sub)
+        hist_data_sub = hist_data_sub.sort_index()
+        hist_data_sub['period_returns'] = self._cal_period_returns(hist_data_sub)
+        return self._select_stocks(hist_data_sub, factors_sub)
+    
+    def _stage_params(self, stage):
+        '''
+        影响stage及其上游阶段的参数，用作缓存的键
+        '''
+        upstream = {stage}
+        while True:
+            dependencies = {dependency for name in upstream for dependency in self.STAGES[name]}
+            if dependencies <= upstream:
+                break
+            upstream |= dependencies
+        return {name:getattr(self, attribute) for name, (attribute, stages) in self.PARAMETERS.items()
+                if upstream.intersection(stages)}
+    
+    @profiling.profiled()
+    def _process_factors(self, factors_sub, hist_data_sub):
+        '''
+        根据参数对调仓日的因子做预处理和行业市值中性，只依赖每个调仓日的截面
+        '''
         factor_name = pd.DataFrame(factors_sub).columns[0]
         if self._preprocess:#因子数据预处理
-            factors_sub = utils.preprocess(factors_sub, factor_name, hist_data_sub, fill_value = self._fill_value)
+            factors_sub = utils.preprocess(factors_sub, factor_name, hist_data_sub, fill_value = self._fill_value, cache = False)
         if self._market_neutral or self._industry_neutral:#行业市值中性
-            factors_sub = utils.industry_market_value_neutral(factors_sub, hist_data_sub, industry = self._industry_neutral, market_value = self._market_neutral)
-            factors_sub = pd.Series(factors_sub)
-            factors_sub = factors_sub.droplevel(level = 0)
-            factors_sub.name = factor_name
-        
-        hist_data_sub = hist_data_sub.sort_index()
-        hist_data_sub['period_returns'] = hist_data_sub['adj_close'].groupby('code').apply(lambda s:s.shift(-1)/s - 1)
+            factors_sub = neutralize.neutralize(pd.DataFrame(factors_sub)[factor_name], hist_data_sub, industry = self._industry_neutral, market_value = self._market_neutral)
+        return pd.DataFrame(factors_sub).rename(columns = {factor_name:'factors'})
+    
+    @profiling.profiled()
+    def _select_stocks(self, hist_data_sub, factors_sub):
+        '''
+        剔除ST、新股、停牌和股票池以外的股票，与处理后的因子合并，只保留有因子值的行
+        '''
         hist_data_sub = hist_data_sub[(hist_data_sub['is_ST'] == 0) & (hist_data_sub['is_new_stock'] == 0) & (hist_data_sub['status'] == 1)]
-        hist_data_sub = hist_data_sub.join(pd.DataFrame(factors_sub).rename(columns = {factor_name:'factors'}))
+        hist_data_sub = hist_data_sub.join(factors_sub)
         if self._subset != 'all':
             hist_data_sub = hist_data_sub[hist_data_sub[self._subset] == 1]
         return hist_data_sub.dropna(subset = ['factors'])
     
+    @profiling.profiled()
+    def _cal_period_returns(self, hist_data_sub):
+        '''
+        每只股票从这个调仓日到它下一次出现的调仓日的收益
+        '''
+        return hist_data_sub['adj_close'].groupby('code').apply(lambda s:s.shift(-1)/s - 1)
+    
+    def _cal_trade_date(self, data, trade_date = None):
+        '''
+        data中出现过的日期，与已有的trade_date合并
+        '''
+        unique_date = data.index.get_level_values('date').unique()
+        if trade_date is not None:
+            unique_date = unique_date.union(trade_date)
+        return unique_date.sort_values()
+    
     def _cal_rebalance_date(self):
         '''
         计算调仓日期
         '''
         if self._only_rebalance_date:#如果因子值只包含调仓日数据则提取因子序列的日期index
-            trade_date = self._factors.index.get_level_values('date').unique().sort_values()
-            return trade_date
+            return self._trade_date
         #否则从历史数据提取日期序列
-        unique_date = self._hist_data.index.get_level_values('date').unique().sort_values()
+        unique_date = self._trade_date
         trade_date = list(unique_date[::self._balance_time])
-        last_date = list(unique_date)[-1]
+        last_date = unique_date[-1]
         if last_date != trade_date[-1]:
             trade_date += [last_date]
         return pd.Series(trade_date)
     
-    def _cal_portfolio_returns_between_balancing(self):
+    @profiling.profiled()
+    def _cal_portfolio_returns_between_balancing(self, hold = False):
         '''
-        计算股票组合股票组合日度收益率，速度慢
+        计算股票组合日度收益率
+        每只股票在调仓区间内从区间第一天开始累乘(1 + 收益率)，按(日期, 组)平均(MV按当天市值加权)，再在区间内逐日转成收益率
+        hold: False时与原来逐区间循环的实现相同，只有当天有分组的行(即调仓日的行)参与平均，结果只有调仓日；
+              True时组合持有调仓日的分组直到下一个调仓日，区间内每个交易日都有收益
+        默认一次按(区间, 股票)累乘、一次按(日期, 组)求和，不逐区间循环；
+        构造参数low_memory为True时逐个调仓区间做同样的计算，临时数组只有一个区间的大小，结果完全相同
+        股票和日期只使用索引的整数编码，不展开成object列，也不做merge，紧凑类型的数据不会被复制成默认类型
+        返回日期×组号
         '''
-        print('_cal_portfolio_returns_between_balancing--1',time.strftime('%Y-%m-%d %H:%M:%S',time.localtime(time.time())))
-        if self._weights == 'MV':
-            self._hist_data['weights'] = self._hist_data['market_value']
-            
-        used_columns = [] if self._weights == 'EW' else ['weights']
-        hist_data = pd.concat([self._hist_data[['returns'] + used_columns], self._group], axis = 1)
-        gross_returns = hist_data
-            
-        returns_date = gross_returns.index.get_level_values('date')
-        portfolio_returns_between_balancing = [0] * (len(self._rebalance_date) - 1)
-        
-        for i in range(len(self._rebalance_date) - 1):
-            #The start and end of a period between balancing
-            start_date, end_date = self._rebalance_date[i], self._rebalance_date[i + 1]
-            if i == len(self._rebalance_date) - 2: end_date += Day(1)
-            #history data during the period
-            returns_between_balancing = gross_returns[(returns_date >= start_date) & (returns_date < end_date)]
-            returns_between_balancing = (returns_between_balancing['returns'].fillna(0) + 1).groupby('code', group_keys = False).cumprod()
-            portfolio_returns_between_balancing[i] = returns_between_balancing
+        if self._group is None: self._rank_and_divide()
         
-        print('_cal_portfolio_returns_between_balancing--2', time.strftime('%Y-%m-%d %H:%M:%S',time.localtime(time.time())))
+        index = self._hist_data.index
+        code_position, date_position = index.names.index('code'), index.names.index('date')
+        code_level, code_id = index.levels[code_position], index.codes[code_position].astype(np.int64)
+        date_level, date_id = index.levels[date_position], index.codes[date_position].astype(np.int64)
+        rebalance_date = pd.DatetimeIndex(self._rebalance_date)
         
-        cum_returns_stocks = pd.concat(portfolio_returns_between_balancing).sort_index()
-        cum_returns_stocks.name = 'cum_returns'
-        cum_returns_stocks = pd.concat([cum_returns_stocks, gross_returns[['group'] + used_columns]], axis = 1)
-        #Calculate the portfolio value if start from 1
-        group_data = cum_returns_stocks[['cum_returns', 'group'] + used_columns].groupby(['date', 'group'])
-        if self._weights == 'EW':
-            cum_returns = group_data.mean()
+        #每个日期所属的调仓区间，最后一个区间包含最后一个调仓日，之后的日期不计算
+        last_period = len(rebalance_date) - 2
+        level_period = rebalance_date.searchsorted(date_level, side = 'right') - 1
+        level_period[(date_level >= rebalance_date[-1]) & (date_level < rebalance_date[-1] + Day(1))] = last_period
+        level_period[level_period > last_period] = -1
+        row_period = level_period[date_id]
+        if self._low_memory:
+            row_order, row_starts = bucketing.sort_segments(row_period)
+            chunks = [row_order[start:end] for start, end in zip(row_starts, np.append(row_starts[1:], len(row_order)))]
         else:
-            cum_returns =group_data.apply(lambda df:np.average(df.cum_returns, weights = df.weights)) 
+            chunks = [np.flatnonzero(row_period >= 0)]
         
-        print('_cal_portfolio_returns_between_balancing--3', time.strftime('%Y-%m-%d %H:%M:%S',time.localtime(time.time())))
+        #hold时每一行使用所在区间开始的调仓日的分组，否则只使用当天的分组
+        group = self._group['group'].dropna()
+        group_dates = group.index.get_level_values('date')
+        group_key = rebalance_date.get_indexer(group_dates) if hold else date_level.get_indexer(group_dates)
+        group_keys, group_values = self._group_keys(group, code_level, group_key)
         
-        cum_returns = cum_returns.unstack(level = 'group')
-        returns_date = cum_returns.index = cum_returns.index.get_level_values('date')
-        for i in range(len(self._rebalance_date) - 1):
-            #The start and end of a period between balancing
-            start_date, end_date = self._rebalance_date[i], self._rebalance_date[i + 1]
-            if i == len(self._rebalance_date) - 2: end_date += Day(1)
-            
-            cum_returns_between_balancing = cum_returns[(returns_date >= start_date) & (returns_date < end_date)]
-            returns_between_balancing = cum_returns_between_balancing.pct_change()
-            if len(cum_returns_between_balancing) != 0:
-                returns_between_balancing.iloc[0] = cum_returns_between_balancing.iloc[0] - 1
+        #Calculate the portfolio value if start from 1
+        group_num = int(group_values.max()) + 1 if len(group_values) else 1
+        cell_num = len(date_level) * group_num
+        total, weight, count = np.zeros(cell_num), np.zeros(cell_num), np.zeros(cell_num, dtype = np.int64)
+        returns = self._hist_data['returns'].values
+        market_value = self._hist_data['market_value'].values if self._weights != 'EW' else None
+        for rows in chunks:
+            #行按日期排序后按(区间, 股票)累乘，某天没有数据的股票不影响之后的累乘
+            rows = rows[np.argsort(date_level.asi8[date_id[rows]], kind = 'stable')]
+            cum_returns = pd.Series(np.nan_to_num(returns[rows]) + 1).groupby(row_period[rows] * len(code_level) + code_id[rows]).cumprod().values
+            row_key = (row_period[rows] if hold else date_id[rows]) * len(code_level) + code_id[rows]
+            row_group = self._match_group(group_keys, group_values, row_key)
+            keep = row_group >= 0
+            rows, row_group, cum_returns = rows[keep], row_group[keep], cum_returns[keep]
             
-            portfolio_returns_between_balancing[i] = returns_between_balancing
+            cell = date_id[rows] * group_num + row_group
+            count += np.bincount(cell, minlength = cell_num)
+            if market_value is None:
+                total += np.bincount(cell, cum_returns, minlength = cell_num)
+            else:
+                #与np.average相同，市值缺失时这一组当天的值为NaN
+                row_market_value = market_value[rows].astype(float)
+                total += np.bincount(cell, cum_returns * row_market_value, minlength = cell_num)
+                weight += np.bincount(cell, row_market_value, minlength = cell_num)
+        if market_value is None:
+            weight = count
         
-        print('_cal_portfolio_returns_between_balancing--4', time.strftime('%Y-%m-%d %H:%M:%S',time.localtime(time.time())))
+        count = count.reshape(len(date_level), group_num)
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            value = (total / weight).reshape(len(date_level), group_num)
+        value[count == 0] = np.nan
+        used_dates, used_groups = count.any(axis = 1), np.flatnonzero(count.any(axis = 0))
+        cum_returns = pd.DataFrame(value[used_dates][:, used_groups].astype(np.result_type(returns.dtype, np.float32)),
+                                   index = pd.DatetimeIndex(date_level.values[used_dates], name = 'date'),
+                                   columns = pd.Index(used_groups, name = 'group')).sort_index()
         
-        return pd.concat(portfolio_returns_between_balancing).sort_index()
+        #区间内逐日收益率，与逐区间的pct_change相同：缺失值先向前填充，区间第一天相对初始净值1计算
+        period = rebalance_date.searchsorted(cum_returns.index, side = 'right') - 1
+        period[period > last_period] = last_period
+        first_day = np.r_[True, period[1:] != period[:-1]]
+        filled = cum_returns.groupby(period).ffill()
+        daily_returns = filled / filled.groupby(period).shift(1) - 1
+        daily_returns.loc[first_day] = cum_returns.loc[first_day] - 1
+        return daily_returns
     
+    @staticmethod
+    def _group_keys(group, code_level, group_key):
+        '''
+        分组按(日期或区间, 股票)编码排序，group_key为group每一行的日期或区间编号
+        '''
+        group_code = code_level.get_indexer(group.index.get_level_values('code'))
+        valid = (group_code >= 0) & (group_key >= 0)
+        keys = group_key[valid].astype(np.int64) * len(code_level) + group_code[valid]
+        order = np.argsort(keys, kind = 'stable')
+        return keys[order], group.values[valid][order].astype(np.int64)
     
+    @staticmethod
+    def _match_group(keys, values, row_key):
+        '''
+        每一行的组号，keys和values为_group_keys的结果，没有分组的行为-1
+        '''
+        if len(keys) == 0:
+            return np.full(len(row_key), -1, dtype = np.int64)
+        position = np.minimum(np.searchsorted(keys, row_key), len(keys) - 1)
+        return np.where(keys[position] == row_key, values[position], -1)
+    
+    @profiling.profiled(rows = lambda result, self:len(self._group))
     def _rank_and_divide(self):
         '''
         将因子排序并分组，每一组组成一个资产组合
         '''
-        print('_rank_and_divide--1', time.strftime('%Y-%m-%d %H:%M:%S',time.localtime(time.time())))
-
-        factors_rank = self._sub_data['factors']
-        
-        if self._select_from_industry:#按照行业排序并分组
-            factors_rank = self._sub_data[['factors', 'industry']]
-            factors_rank = factors_rank.set_index('industry', append = True)
-            factors_rank = factors_rank.groupby(['date', 'industry'], group_keys = False).rank(pct = True)
-            factors_rank = factors_rank.droplevel(level = 'industry')
-        else:#全市场排序分组
-            factors_rank = factors_rank.groupby('date', group_keys = False).rank(pct = True)
-        #else:
-        #    industry = self._hist_data['industry'][self._hist_data.index.get_level_values(level = 'date').isin(self._rebalance_date)]
-        #    factors_rank = pd.concat([factors_rank, industry], axis = 1)
-        #    factors_rank = factors_rank.groupby(['date', 'industry'], group_keys = False).rank(pct = True)
-        #    #del factors_rank['industry']
-            
-        factors_rank = pd.DataFrame(factors_rank).sort_index()
-	
-        factors_rank.columns = ['group']
-        percent_group = 100 // self._group_num
-        factors_rank = factors_rank * 100 // percent_group + 1
-        factors_rank[factors_rank == self._group_num + 1] = self._group_num
-        
-        self._group = pd.DataFrame(factors_rank)
-        print('_rank_and_divide--2', time.strftime('%Y-%m-%d %H:%M:%S',time.localtime(time.time())))
+        columns = ['factors', 'industry'] if self._select_from_industry else ['factors']
+        self._group = result_cache.cached('SFPortfolio._cal_group', [self._sub_data[columns], self._stage_params('_group')],
+                                          lambda:self._cal_group(self._sub_data))
+    
+    @profiling.profiled()
+    def _cal_group(self, sub_data):
+        '''
+        对sub_data中的调仓日逐日(select_from_industry时逐日按行业)排序，分成数量相等的group_num组
+        没有分组的股票(例如没有行业)不在结果中
+        '''
+        by = sub_data['industry'] if self._select_from_industry else None
+        group = bucketing.bucket_factors(sub_data['factors'], self._group_num, by = by)
+        return pd.DataFrame({'group':group[group > 0]}).sort_index()
 	
+    @profiling.profiled(rows = lambda result, self:len(self._returns))
     def _cal_returns(self):
         '''
         计算每一组调仓之间的收益
@@ -189,72 +363,170 @@ class SFPortfolio:
         if self._group is None: self._rank_and_divide()
               
         self._sub_data['group'] = self._group['group']
-        
-        sub_data =  self._sub_data
+        #多空方向由IC决定，键中包含factors
+        self._returns = result_cache.cached('SFPortfolio._cal_returns', [self._sub_data[['factors', 'period_returns', 'group']], self._group_num],
+                                            lambda:self._add_long_short(self._cal_group_returns(self._sub_data)))
+    
+    @profiling.profiled()
+    def _cal_group_returns(self, sub_data):
         returns = sub_data.groupby(['date', 'group'])['period_returns'].mean().unstack('group')
         #returns.index = returns.index.get_level_values('date')
         returns = returns.sort_index()
         
+        returns = returns.reindex(columns = list(range(1, self._group_num + 1)))
         returns.columns = list(range(1, self._group_num + 1))
         returns.columns.name = 'group'
         #returns.columns = [int(i) for i in returns.columns]
-        
+        return returns
+    
+    def _add_long_short(self, returns):
         returns['long_short'] = - returns[1] + returns[self._group_num]
         if self.IC().iloc[0] < 0:
             returns['long_short'] = -1 * returns['long_short']
-        self._returns = returns
+        return returns
         
     def sharpe_ratio(self):
         if self._returns is None: self._cal_returns()
         sr = self._returns.mean() / self._returns.std() * ((252 / self._balance_time) ** 0.5)
         return sr
     
+    def group_turnover(self):
+        '''
+        每组相邻调仓日之间的换手率，date×group，EW为等权，MV按调仓日市值加权
+        '''
+        if self._group_turnover is None:
+            self._group_turnover = self._cal_group_turnover()
+        return self._group_turnover
+    
+    @profiling.profiled()
+    def _cal_group_turnover(self):
+        if self._group is None: self._rank_and_divide()
+        weights = None if self._weights == 'EW' else self._sub_data['market_value']
+        return turnover.group_turnover(turnover.holdings(self._group['group'], weights))
+    
     def turnover(self):
-        '''计算换手率'''
-        weights = pd.DataFrame(self._group).dropna()
-        weights['weights'] = 1
-        weights = weights.reset_index().set_index(['code', 'date', 'group'])
-        weights /= weights.groupby(['date', 'group']).transform('count')
-        weights = weights['weights'].unstack('code').fillna(0)
-        weights_shift = weights.groupby('group').shift(1)
-        diff = weights - weights_shift
-        turn = diff.abs().sum(axis = 1) / 2
-        turn = turn.unstack().iloc[1:]
-        return (turn[1] + turn[self._group_num]).mean() * 6
-    
-    def plot_cum(self, **args):
-        if self._returns is None: self._cal_returns()
-        fig, ax = plt.subplots()
-        cum_returns = (self._returns + 1).cumprod()
-        cum_returns[cum_returns.columns[:-1]].plot(ax = ax)
-        cum_returns['long_short'].plot(ax = ax, linewidth = 3, color = 'blueviolet', alpha = 0.7)
-        return ax
+        '''计算第1组与最后一组的换手率之和，按实际的调仓间隔年化'''
+        return turnover.long_short_turnover(self.group_turnover(), self._group_num, self._rebalance_date)
     
     def _mdd(self, s):
-        s = (s + 1).cumprod()
-        max_value = 1
-        max_draw_down = 0
-        for value in s:
-            draw_down = value / max_value - 1
-            if draw_down < max_draw_down: max_draw_down = draw_down
-            if value > max_value: max_value = value
-        return max_draw_down
+        return performance.max_drawdown(s)
     
     def _IC(self):
-        IC_data = self._sub_data[['period_returns', 'factors']]
-        IC_data = IC_data[IC_data['period_returns'] != 0]
-        IC_date_group = IC_data.groupby('date')
-        Rank_IC_series = IC_date_group.corr(method = 'spearman').iloc[::2, 1]
-        IC_series = IC_date_group.corr().iloc[::2, 1]
-        IC_data_frame = pd.concat([Rank_IC_series, IC_series], axis = 1)
-        IC_data_frame.columns = ['Rank_IC', 'IC']
-        IC_data_frame.index = IC_data_frame.index.get_level_values('date')
+        self._IC_data = result_cache.cached('SFPortfolio._IC', [self._sub_data[['factors', 'period_returns']]],
+                                            lambda:self._cal_IC(self._sub_data))
+    
+    @profiling.profiled()
+    def _cal_IC(self, sub_data):
+        IC_data_frame = ic_analysis.information_coefficients(sub_data['factors'], sub_data['period_returns'])
+        IC_data_frame.columns = IC_data_frame.columns.get_level_values('IC')
+        IC_data_frame.columns.name = None
         IC_data_frame = IC_data_frame.dropna()
-        self._IC_data = IC_data_frame
+        return IC_data_frame
+    
+    @profiling.profiled(rows = lambda result, self, new_factors, new_hist_data:len(new_hist_data))
+    def update(self, new_factors, new_hist_data):
+        '''
+        追加新交易日的因子数据和历史数据，结果与用全部数据重新构建SFPortfolio相同
+        调仓日的预处理、中性化和分组只依赖当天的截面，所以只重新处理最后一个不变的调仓日及之后的调仓日；
+        之前的调仓日只有下一次出现的调仓日在这之后的股票(例如停牌)，period_returns会变，
+        只对period_returns有变化的调仓日重新计算IC和分组收益
+        '''
+        self._factors = self._append(self._factors, new_factors)
+        self._hist_data = self._append(self._hist_data, new_hist_data)
+        self._trade_date = self._cal_trade_date(new_factors if self._only_rebalance_date else new_hist_data, self._trade_date)
+        
+        old_rebalance_date = list(self._rebalance_date)
+        self._rebalance_date = self._cal_rebalance_date()
+        new_rebalance_date = list(self._rebalance_date)
+        unchanged = 0
+        while unchanged < min(len(old_rebalance_date), len(new_rebalance_date)) and old_rebalance_date[unchanged] == new_rebalance_date[unchanged]:
+            unchanged += 1
+        start_date = new_rebalance_date[max(unchanged - 1, 0)]
+        
+        new_sub_data = self._extract_rebalance_day_data([d for d in new_rebalance_date if d >= start_date])
+        sub_data = self._sub_data.drop(columns = 'group', errors = 'ignore')
+        sub_data = pd.concat([sub_data[sub_data.index.get_level_values('date') < start_date], new_sub_data]).sort_index()
+        
+        hist_data_sub = self._hist_data[self._hist_data.index.get_level_values('date').isin(new_rebalance_date)].sort_index()
+        period_returns = self._cal_period_returns(hist_data_sub).reindex(sub_data.index)
+        changed = (period_returns != sub_data['period_returns']) & (period_returns.notna() | sub_data['period_returns'].notna())
+        sub_data['period_returns'] = period_returns
+        date = sub_data.index.get_level_values('date')
+        changed_date = date[changed.values].unique().union(date[date >= start_date].unique())
+        self._sub_data = sub_data
+        #t值、换手率和日度收益不做增量更新
+        self._invalidate('_t_values', '_group_turnover', '_daily_returns', '_holding_returns')
+        
+        if self._group is not None:
+            group = self._cal_group(new_sub_data)
+            self._group = pd.concat([self._group[self._group.index.get_level_values('date') < start_date], group]).sort_index()
+            self._sub_data['group'] = self._group['group']
+        changed_data = self._sub_data[self._sub_data.index.get_level_values('date').isin(changed_date)]
+        if self._IC_data is not None:
+            IC_data = self._IC_data[(self._IC_data.index < start_date) & ~self._IC_data.index.isin(changed_date)]
+            self._IC_data = pd.concat([IC_data, self._cal_IC(changed_data)]).sort_index()
+        if self._returns is not None:
+            returns = self._returns[(self._returns.index < start_date) & ~self._returns.index.isin(changed_date)].drop(columns = 'long_short')
+            returns = pd.concat([returns, self._cal_group_returns(changed_data)]).sort_index()
+            self._returns = self._add_long_short(returns)
+        return self
+    
+    def _append(self, data, new_data):
+        #保持data的紧凑类型，新数据的行业等分类列合并类别
+        data = schema.concat([data, new_data])
+        return data[~data.index.duplicated(keep = 'last')]
+    
+    @profiling.profiled()
+    def save(self, file_path):
+        '''
+        保存中间结果，之后可以load并update
+        历史数据只保存调仓日以及倒数第二个调仓日之后的部分，因子数据只保存倒数第二个调仓日之后的部分，
+        这是下一次update需要的全部数据，因此load得到的对象的daily_returns和holding_returns只覆盖这一部分
+        '''
+        state = self.__dict__.copy()
+        start_date = self._rebalance_date[max(len(self._rebalance_date) - 2, 0)]
+        factors_date = self._factors.index.get_level_values('date')
+        state['_factors'] = self._factors[factors_date >= start_date]
+        hist_date = self._hist_data.index.get_level_values('date')
+        state['_hist_data'] = self._hist_data[(hist_date >= start_date) | hist_date.isin(self._rebalance_date)]
+        with open(file_path, 'wb') as f:
+            pickle.dump(state, f)
+    
+    @classmethod
+    def load(cls, file_path):
+        with open(file_path, 'rb') as f:
+            state = pickle.load(f)
+        portfolio = cls.__new__(cls)
+        for stage in cls.STAGES:
+            state.setdefault(stage, None)
+        state.setdefault('_low_memory', False)
+        portfolio.__dict__.update(state)
+        return portfolio
+    
+    def profile(self, raw = False):
+        '''
+        这个对象各个阶段的耗时、行数和内存峰值，需要先用profiling.enable()或环境变量FACTOR_ANALYSIS_PROFILE开启
+        raw: 为True时返回每次调用一行的原始记录，否则按阶段汇总
+        '''
+        return profiling.records(self) if raw else profiling.report(self)
     
     @property
     def daily_returns(self):
-        return self._cal_portfolio_returns_between_balancing()
+        '''
+        各组在调仓日的收益率，与原来的实现相同，见_cal_portfolio_returns_between_balancing
+        '''
+        if self._daily_returns is None:
+            self._daily_returns = self._cal_portfolio_returns_between_balancing()
+        return self._daily_returns
+    
+    @property
+    def holding_returns(self):
+        '''
+        各组持有调仓日的分组直到下一个调仓日的逐日收益率
+        '''
+        if self._holding_returns is None:
+            self._holding_returns = self._cal_portfolio_returns_between_balancing(hold = True)
+        return self._holding_returns
     
     @property
     def returns(self):
@@ -272,17 +544,36 @@ class SFPortfolio:
         IR_data.index = ['Rank_IC_IR', 'IC_IR']
         return IR_data
     
+    @profiling.profiled()
+    def IC_decay(self, horizons = 6, window = 12):
+        '''
+        因子对之后1..horizons个调仓期收益的IC衰减和滚动IR，见ic_analysis.ic_analysis
+        远期收益使用调仓日全部股票的复权价，与period_returns一样不受股票筛选的影响
+        '''
+        hist_data = self._hist_data[self._hist_data.index.get_level_values('date').isin(self._rebalance_date)]
+        return ic_analysis.ic_analysis(self._sub_data['factors'], hist_data['adj_close'], horizons, window)
+    
         
     def t_values(self, freq = 'M'):
-        t_data = self._sub_data[['returns', 'industry', 'market_value', 'factors']]
+        if self._t_values is None:
+            self._t_values = self._cal_t_values()
+        return self._t_values
+    
+    def _cal_t_values(self):
+        return self._summarize_t_values(self._cal_t_series(self._sub_data))
+    
+    @profiling.profiled()
+    def _cal_t_series(self, sub_data):
+        '''
+        每个调仓日因子对当日收益率的t值
+        '''
+        t_data = sub_data[['returns', 'industry', 'market_value', 'factors']]
         t_data = t_data.dropna()
-        def regress_t(data):
-            industry_dummies = pd.get_dummies(data['industry'])
-            X = pd.concat([industry_dummies, data[['market_value', 'factors']]], axis = 1)
-            y = data['returns']
-            result = sm.OLS(y, X).fit()
-            return result.tvalues[-1]
-        t_series = t_data.groupby('date').apply(regress_t)
+        #行业哑变量作为固定效应吸收，所有日期一次求解
+        result = cross_section.cross_sectional_regression(t_data['returns'], t_data[['market_value', 'factors']], industry = t_data['industry'])
+        return result['t']['factors']
+    
+    def _summarize_t_values(self, t_series):
         #return (t_series > 2).mean()
         t_mean = t_series.mean()
         t_significant_mean = (t_series.abs() > 2).mean()
@@ -292,72 +583,55 @@ class SFPortfolio:
         t_opposite_direction = (direction < 0).sum() / len(t_series)
         return t_mean, t_significant_mean, t_same_direction, t_opposite_direction
     
+    def significance(self, n_permutations = 1000, n_bootstrap = 1000, block_length = None, seed = 0, n_jobs = None):
+        '''
+        Rank_IC、IC的截面置换检验和多空收益的分块自助法检验，比t值更适合筛选大量因子时使用
+        多个因子一起检验并计算q值用resampling.significance
+        '''
+        return resampling.significance({'factors':self}, n_permutations, n_bootstrap, block_length, seed, n_jobs = n_jobs).iloc[0]
+    
     def max_drawdown(self):
-        return self._returns.fillna(0).apply(self._mdd)
-    
-    def plot_annual_returns(self, title = None):
-         #年化收益率绘图
-        returns = self._returns.mean().iloc[:-1] * (252 / self._balance_time)
-        fig_returns, ax_returns = plt.subplots()
-        title = title if title is not None else 'Annual Returns'
-        returns.plot(kind = 'bar', ax = ax_returns, title = title)
-        return fig_returns
-    
-    def plot_sharpe_ratio(self):
-        fig_SR, ax_SR = plt.subplots()
-        SR = self.sharpe_ratio()
-        SR.plot(kind = 'bar', ax = ax_SR, title = 'Sharpe Ratio')
-        return fig_SR
-        
-    def plot_IC(self):
-        #绘制IC图
-        fig_IC, ax_IC = plt.subplots()
-        #index = self._IC_data.index
-        #xticks = [index[i].strftime('%Y-%m-%d') if i % 5 == 0 else '' for i in range(len(index))]
-        self._IC_data.plot(kind = 'bar', title = 'IC')
-        return fig_IC
-    
-    def plot_IR(self):
-        #绘制ICIR图
-        IR_by_year = self._IC_data.resample('Y').mean() / self._IC_data.resample('Y').std()
-        IR_by_year.index = IR_by_year.index.year
-        fig_IR, ax_IR = plt.subplots()
-        IR_by_year.plot(kind = 'bar', title = 'IR', figsize = (8, 6))
-        return fig_IR
-    
-    def plot_long_short_value(self, title = None, start_date = None):
-        #绘制多空净值图
-        returns = self._returns['long_short']
-        if start_date is not None:
-            returns = returns[start_date:]
-        pure_assets = (returns + 1).cumprod()
-        fig_value, ax_value = plt.subplots()
-        title = title if title is not None else 'Long Short Portfolio Value'
-        pure_assets.plot(ax = ax_value, title = title)
-        return fig_value
+        return performance.max_drawdown(self._returns)
     
     def information_ratio(self, base_returns):
         pass
     
-    def summary(self, freq = 'M'):
-        
-        SR = self.sharpe_ratio()
+    def summary(self, freq = 'M', plots = True):
+        '''
+        统计量，plots为True时同时绘图，批量计算时用plots = False或statistics()
+        '''
+        statistics = self.statistics(freq)
+        if not plots:
+            return statistics
         print(self.plot_sharpe_ratio())
         
         print(self.plot_annual_returns())
         
-        top_SR = SR.iloc[0]
-        bottom_SR = SR.iloc[-2]
-        if self.IC().iloc[0] > 0:
+        print(self.plot_IC())
+        print(self.plot_IR())
+        
+        print(self.plot_long_short_value())
+        
+        return statistics
+    
+    @profiling.profiled()
+    def statistics(self, freq = 'M'):
+        '''
+        summary中的统计量，不绘图
+        '''
+        #每个统计量只计算一次，结果都已缓存时不再重新计算
+        SR = self.sharpe_ratio()
+        IC_mean = self.IC()
+        returns_mean = self._returns.mean() * (252 / self._balance_time)
+        top_SR, bottom_SR = SR.iloc[0], SR.iloc[-2]
+        top_returns_mean, bottom_returns_mean = returns_mean.iloc[0], returns_mean.iloc[-2]
+        if IC_mean.iloc[0] > 0:
             top_SR, bottom_SR = bottom_SR, top_SR
-        long_short_SR = SR.iloc[-1]
-        top_returns_mean = self._returns.mean().iloc[0] * (252 / self._balance_time)
-        bottom_returns_mean = self._returns.mean().iloc[-2] * (252 / self._balance_time)
-        if self.IC().iloc[0] > 0:
             top_returns_mean, bottom_returns_mean = bottom_returns_mean, top_returns_mean
-        market_mean = self._returns.mean().mean() * (252 / self._balance_time)
-        long_short_returns_mean = self._returns.mean().iloc[-1] * (252 / self._balance_time)
-        Rank_IC, IC = self.IC().values
+        long_short_SR = SR.iloc[-1]
+        market_mean = returns_mean.mean()
+        long_short_returns_mean = returns_mean.iloc[-1]
+        Rank_IC, IC = IC_mean.values
         Rank_IR, IR = self.IR().values
         max_drawdown = self.max_drawdown().iloc[-1]
         t_mean, greater_than2, t_same_direction, t_opposite_direction = self.t_values()
@@ -376,10 +650,4 @@ class SFPortfolio:
                                 greater_than2, t_same_direction, t_opposite_direction, \
                                 win_ratio, turnover],\
                         index = index_names)
-        
-        print(self.plot_IC())
-        print(self.plot_IR())
-        
-        print(self.plot_long_short_value())
-        
         return statistics
\ No newline at end of file
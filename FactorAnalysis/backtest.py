@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:48:09 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import numpy as np
+from scipy import sparse
+
+import segment
+
+#权重矩阵中非零元素的比例低于这个值时用稀疏矩阵保存
+SPARSE_DENSITY = 0.1
+
+def weight_matrix(w):
+    '''
+    w: 调仓日×股票的权重，可以是普通或稀疏的DataFrame
+    返回(权重矩阵, 股票代码)，持仓集中时为scipy.sparse.csr_matrix，否则为numpy数组
+    '''
+    if hasattr(w, 'sparse'):
+        matrix = w.sparse.to_coo().tocsr()
+    else:
+        matrix = np.asarray(w.values, dtype = float)
+        if np.count_nonzero(matrix) < SPARSE_DENSITY * matrix.size:
+            matrix = sparse.csr_matrix(matrix)
+    return matrix, w.columns
+
+def _rows(matrix, rows):
+    return matrix[rows] if sparse.issparse(matrix) else matrix[rows, :]
+
+def _multiply(matrix, values):
+    '''
+    逐元素相乘，结果与matrix同类型
+    '''
+    if sparse.issparse(matrix):
+        return sparse.csr_matrix(matrix.multiply(values))
+    return matrix * values
+
+def _row_sum(matrix):
+    return np.asarray(matrix.sum(axis = 1)).ravel()
+
+def backtest(w, hist_data, rebalance_date, weight_change = None, transaction_cost = 0):
+    '''
+    按调仓日权重回测，调仓日之间权重随价格漂移
+    w: 调仓日×股票的权重，第i行在rebalance_date[i]建仓，持有到rebalance_date[i + 1]
+    hist_data: 包含returns的历史数据，索引为(code, date)
+    weight_change: 每个调仓日换手的比例，索引为日期，为None时使用计算出的换手率
+    transaction_cost: 单边交易成本，换手部分的净值在调仓日乘以(1 - transaction_cost) / (1 + transaction_cost)
+    所有调仓区间一次计算：按区间分段累乘收益，再与每一行所属区间的权重逐行相乘求和，
+    只计算有持仓的股票，持仓集中时权重用稀疏矩阵
+    返回(日度收益, 每个调仓区间的收益, 换手率)，前两项与utils.portfolio_returns相同
+    换手率为调仓日新权重与上一区间漂移后权重之差的绝对值之和的一半，索引为rebalance_date[1:]，
+    w没有最后一个调仓日的权重时最后一项为NaN
+    rebalance_date、weight_change的索引可以是字符串，按日期比较，返回结果的索引仍使用rebalance_date原来的值
+    '''
+    labels = pd.Index(rebalance_date)
+    rebalance_date = pd.DatetimeIndex(pd.to_datetime(labels))
+    period_num = len(rebalance_date) - 1
+    weights, codes = weight_matrix(w)
+    held = np.flatnonzero(np.asarray(abs(_rows(weights, np.arange(period_num))).sum(axis = 0)).ravel() != 0)
+    weights = weights[:, held]
+
+    returns = hist_data['returns'][hist_data.index.get_level_values('code').isin(codes)]
+    dates = returns.index.get_level_values('date').unique().sort_values()
+    #日期属于(rebalance_date[i], rebalance_date[i + 1]]的为第i个区间
+    period = rebalance_date.searchsorted(dates, side = 'left') - 1
+    in_period = (period >= 0) & (period < period_num)
+    dates, period = dates[in_period], period[in_period]
+
+    #直接按日期、股票的位置填入日期×股票矩阵，不用unstack
+    row = dates.get_indexer(returns.index.get_level_values('date'))
+    column = codes[held].get_indexer(returns.index.get_level_values('code'))
+    used = (row >= 0) & (column >= 0)
+    returns_matrix = np.zeros((len(dates), len(held)))
+    returns_matrix[row[used], column[used]] = returns.fillna(0).values[used]
+    cum_returns = pd.DataFrame(returns_matrix + 1).groupby(period).cumprod().values
+
+    starts = segment.segment_starts(period)
+    ends = np.append(starts[1:], len(period))[:len(starts)] - 1
+    portfolio_cum_returns = _row_sum(_multiply(_rows(weights, period), cum_returns))
+
+    end_value = portfolio_cum_returns[ends]
+    cum_returns_end = np.ones((period_num, len(held)))
+    cum_returns_end[period[ends]] = cum_returns[ends]
+    value = np.ones(period_num)
+    value[period[ends]] = end_value
+    #上一区间的权重漂移到调仓日，与新权重比较
+    drift_weights = _multiply(_rows(weights, np.arange(period_num)), cum_returns_end / value[:, None])
+    turnover = np.full(period_num, np.nan)
+    next_num = min(weights.shape[0], period_num + 1) - 1
+    if next_num > 0:
+        turnover[:next_num] = _row_sum(abs(_rows(weights, np.arange(1, next_num + 1)) - _rows(drift_weights, np.arange(next_num)))) / 2
+    turnover = pd.Series(turnover, index = rebalance_date[1:])
+
+    if weight_change is None:
+        weight_change = turnover.fillna(0)
+    else:
+        weight_change = weight_change.set_axis(pd.DatetimeIndex(pd.to_datetime(weight_change.index)))
+    weight_change = np.asarray(weight_change.loc[rebalance_date[1:][period[ends]]], dtype = float)
+    portfolio_cum_returns[ends] = weight_change * end_value / ((1 + transaction_cost) / (1 - transaction_cost)) + (1 - weight_change) * end_value
+
+    previous_value = np.append(np.nan, portfolio_cum_returns[:-1])
+    previous_value[starts] = 1
+    daily_returns = pd.Series(portfolio_cum_returns / previous_value - 1, index = dates)
+    long_term_returns = np.full(period_num, np.nan)
+    long_term_returns[period[ends]] = portfolio_cum_returns[ends] - 1
+    long_term_returns = pd.Series(long_term_returns, index = labels[1:])
+    turnover.index = labels[1:]
+    return daily_returns, long_term_returns, turnover
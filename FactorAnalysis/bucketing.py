@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:52:05 2026
+
+@author: lenovo
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import numpy as np
+
+import segment
+
+TIES = ('average', 'min', 'max', 'first', 'dense')
+
+def sort_segments(segment_key):
+    '''
+    按段稳定排序，返回(行顺序, 每段起点)，段编号为负数的行不参与排序
+    所有因子列共用，之后每列只需要在连续的段内排序
+    '''
+    rows = np.flatnonzero(segment_key >= 0)
+    order = rows[np.argsort(segment_key[rows], kind = 'stable')]
+    return order, segment.segment_starts(segment_key[order])
+
+def _rank(values, segments, ties):
+    '''
+    在每段内对values排序，返回(行号, 排名, 每段参与排名的个数)，按段内排好的顺序，不含缺失值
+    排名与pandas的rank(method = ties)相同，dense时个数为不同值的个数，与rank(pct = True)的分母一致
+    '''
+    segment_order, segment_starts = segments
+    values = values[segment_order]
+    #每段是连续的一小块内存，逐段argsort比对整列做lexsort快，缺失值排在每段最后
+    #只有first需要稳定排序让并列的值保持原来的顺序
+    kind = 'stable' if ties == 'first' else 'quicksort'
+    within = np.empty(len(values), dtype = np.int64)
+    bounds = np.append(segment_starts, len(values))
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        within[start:end] = start + np.argsort(values[start:end], kind = kind)
+    valid = ~np.isnan(values[within])
+    within = within[valid]
+    order = segment_order[within]
+    sorted_values = values[within]
+    sorted_key = np.repeat(np.arange(len(segment_starts)), np.diff(bounds))[within]
+    n = len(order)
+    if n == 0:
+        return order, np.zeros(0), np.zeros(0)
+
+    starts = segment.segment_starts(sorted_key)
+    segment_of_row = segment.segment_id(starts, n)
+    position = np.arange(n) - starts[segment_of_row] + 1
+    tie_starts = segment.segment_starts(sorted_key, sorted_values)
+    tie_of_row = segment.segment_id(tie_starts, n)
+    tie_ends = np.append(tie_starts[1:], n) - 1
+    if ties == 'first':
+        sorted_rank = position.astype(float)
+    elif ties == 'min':
+        sorted_rank = position[tie_starts][tie_of_row].astype(float)
+    elif ties == 'max':
+        sorted_rank = position[tie_ends][tie_of_row].astype(float)
+    elif ties == 'average':
+        sorted_rank = (position[tie_starts] + position[tie_ends])[tie_of_row] / 2
+    else:
+        dense = np.zeros(n, dtype = np.int64)
+        dense[tie_starts] = 1
+        dense = np.cumsum(dense)
+        sorted_rank = (dense - dense[starts][segment_of_row] + 1).astype(float)
+
+    if ties == 'dense':
+        sorted_count = np.maximum.reduceat(sorted_rank, starts)[segment_of_row]
+    else:
+        sorted_count = segment.segment_length(starts, n)[segment_of_row].astype(float)
+    return order, sorted_rank, sorted_count
+
+def bucket(values, segment_key, group_num, ties = 'average', method = 'exact', segments = None):
+    '''
+    一列因子值在每段内按排名分组，返回int8的组号1..group_num，没有因子值的为0
+    segment_key: 每行所属段的整数编码，负数的行不分组
+    segments: sort_segments(segment_key)的结果，多列共用时传入
+    method: 'exact'为等数量分组，第r名(共m个)在第floor((r - 1) * group_num / m) + 1组，任何group_num各组数量最多相差1；
+            'percent'与原来的rank(pct = True) * 100 // (100 // group_num) + 1相同，并把group_num + 1组并入最后一组
+    '''
+    if ties not in TIES:
+        raise ValueError('不支持的ties: {}'.format(ties))
+    if not 0 < group_num <= np.iinfo(np.int8).max:
+        raise ValueError('group_num必须在1到127之间')
+    if method == 'percent' and group_num > 100:
+        raise ValueError("method为'percent'时group_num不能超过100")
+    if segments is None:
+        segments = sort_segments(segment_key)
+    if method not in ('exact', 'percent'):
+        raise ValueError('不支持的method: {}'.format(method))
+    order, rank, count = _rank(np.asarray(values, dtype = float), segments, ties)
+    if method == 'exact':
+        sorted_group = np.floor((rank - 1) * group_num / count) + 1
+    else:
+        sorted_group = rank / count * 100 // (100 // group_num) + 1
+        sorted_group[sorted_group == group_num + 1] = group_num
+    group = np.zeros(len(values), dtype = np.int8)
+    group[order] = sorted_group
+    return group
+
+def segment_key(index, by = None):
+    '''
+    按日期(以及by，例如行业)分段的整数编码，by缺失的行为-1，不参与分组
+    '''
+    date_id = pd.factorize(index.get_level_values('date'))[0].astype(np.int64)
+    if by is None:
+        return date_id
+    by_id, by_levels = pd.factorize(np.asarray(by))
+    return np.where(by_id >= 0, date_id * len(by_levels) + by_id, -1)
+
+def bucket_factors(factors, group_num, by = None, ties = 'average', method = 'exact', n_jobs = None):
+    '''
+    对一个或多个因子在每个日期(by不为None时为每个日期-行业)的截面上排序分组
+    factors: Series或DataFrame，索引包含date
+    by: 与factors对齐的分组变量，例如行业
+    n_jobs: 大于1时各列在线程池中并行排序，numpy的排序不占用GIL
+    返回与factors形状相同的int8组号，没有因子值的为0
+    '''
+    is_series = isinstance(factors, pd.Series)
+    factors = pd.DataFrame(factors)
+    key = segment_key(factors.index, by)
+    values = factors.values.astype(float)
+    segments = sort_segments(key)
+
+    def bucket_column(i):
+        return bucket(values[:, i], key, group_num, ties, method, segments)
+    if n_jobs is not None and n_jobs > 1 and values.shape[1] > 1:
+        with ThreadPoolExecutor(n_jobs) as executor:
+            groups = list(executor.map(bucket_column, range(values.shape[1])))
+    else:
+        groups = [bucket_column(i) for i in range(values.shape[1])]
+
+    result = pd.DataFrame(np.column_stack(groups) if groups else np.zeros((len(factors), 0), dtype = np.int8),
+                          index = factors.index, columns = factors.columns)
+    if is_series:
+        return result[factors.columns[0]]
+    return result
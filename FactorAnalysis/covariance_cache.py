@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:10:36 2026
+
+@author: lenovo
+"""
+import os
+from collections import OrderedDict
+
+import pandas as pd
+import numpy as np
+
+import result_cache
+import portfolio_optimization
+
+#内存中缓存的上限，按字节计
+MAX_BYTES = 1 << 30
+
+class DatePartition:
+
+    def __init__(self, data):
+        '''
+        data: 索引包含date的Series或DataFrame
+        只排序一次并记录每个日期的起始行，之后按日期取截面是一次二分查找加切片，不用扫描整个索引
+        同一日期内保持原来的行顺序
+        '''
+        dates = data.index.get_level_values('date')
+        order = np.argsort(dates.values, kind = 'mergesort')
+        self._data = data.iloc[order].droplevel('date')
+        sorted_dates = dates.values[order]
+        self._dates = np.unique(sorted_dates)
+        self._offsets = np.searchsorted(sorted_dates, self._dates, side = 'left')
+        self._offsets = np.append(self._offsets, len(sorted_dates))
+
+    @property
+    def dates(self):
+        return pd.DatetimeIndex(self._dates, name = 'date')
+
+    def get(self, date):
+        position = np.searchsorted(self._dates, np.datetime64(pd.Timestamp(date), 'ns'))
+        if position == len(self._dates) or self._dates[position] != np.datetime64(pd.Timestamp(date), 'ns'):
+            return self._data.iloc[0:0]
+        return self._data.iloc[self._offsets[position]:self._offsets[position + 1]]
+
+def assemble_covariance(factors_expo, factors_covariance, specific_variance):
+    '''
+    一个日期的XFX' + diag(特异方差)，股票与utils.get_covariance_specific_date相同
+    '''
+    factors_expo, factors_covariance, specific_variance = portfolio_optimization.align_factor_model(factors_expo, factors_covariance, specific_variance)
+    X = factors_expo.values
+    covariance = X.dot(factors_covariance.values).dot(X.T)
+    covariance[np.diag_indices_from(covariance)] += specific_variance.values
+    return pd.DataFrame(covariance, index = factors_expo.index, columns = factors_expo.index)
+
+def _to_arrays(kind, entry):
+    if kind == 'covariance':
+        return {'values':entry.values, 'codes':_to_array(entry.index)}
+    factors_expo, factors_covariance, specific_variance = entry
+    return {'expo':factors_expo.values, 'factors_covariance':factors_covariance.values,
+            'specific_variance':specific_variance.values,
+            'codes':_to_array(factors_expo.index), 'factors':_to_array(factors_covariance.columns)}
+
+def _from_arrays(kind, arrays, index_name):
+    codes = pd.Index(arrays['codes'].astype(object), name = index_name)
+    if kind == 'covariance':
+        return pd.DataFrame(arrays['values'], index = codes, columns = codes)
+    factors = pd.Index(arrays['factors'].astype(object))
+    return (pd.DataFrame(arrays['expo'], index = codes, columns = factors),
+            pd.DataFrame(arrays['factors_covariance'], index = factors, columns = factors),
+            pd.Series(arrays['specific_variance'], index = codes))
+
+def _to_array(index):
+    values = np.asarray(index)
+    if values.dtype == object:
+        values = values.astype(str)
+    return values
+
+class CovarianceCache:
+
+    def __init__(self, factors_expo, specific_variance, factors_covariance_dict, max_bytes = MAX_BYTES, cache_dir = None):
+        '''
+        按日期缓存风险模型：组装好的N×N协方差(covariance)或低秩形式(factor_model)
+        factors_expo, specific_variance: 索引为(code, date)，与backtest_risk_models中的factors_expo_sub、specific_variance_sub相同
+        max_bytes: 内存中缓存的上限，超过时淘汰最久没有使用的日期
+        cache_dir: 不为None时被淘汰的结果写成.npy文件，之后从磁盘读取而不是重新计算；
+                   文件名包含这个日期的暴露、因子协方差和特异方差的哈希，不同的数据可以使用同一个目录
+        hits/misses/disk_hits记录命中内存、需要计算、从磁盘读取的次数
+        '''
+        self._factors_expo = DatePartition(factors_expo)
+        self._specific_variance = DatePartition(specific_variance)
+        self._index_name = self._factors_expo.get(self._factors_expo.dates[0]).index.name if len(self._factors_expo.dates) else None
+        self._factors_covariance_dict = factors_covariance_dict
+        self._max_bytes = max_bytes
+        self._cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._hashes = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+    def factor_model(self, date):
+        '''
+        (因子暴露X, 因子协方差F, 特异方差)，与portfolio_optimization.factor_model_on_date相同
+        '''
+        return self._get('factor_model', date, lambda:self._build_factor_model(date))
+
+    def covariance(self, date):
+        '''
+        与utils.get_covariance_specific_date相同的协方差矩阵，低秩形式只用于组装，不放入缓存
+        '''
+        return self._get('covariance', date, lambda:assemble_covariance(*self._build_factor_model(date)))
+
+    def _build_factor_model(self, date):
+        return portfolio_optimization.align_factor_model(self._factors_expo.get(date), self._factors_covariance_dict[date],
+                                                         self._specific_variance.get(date))
+
+    def _content_hash(self, date):
+        '''
+        这个日期输入数据的哈希，用在磁盘文件名中，每个日期只计算一次
+        '''
+        if date not in self._hashes:
+            self._hashes[date] = result_cache.content_hash(self._factors_expo.get(date), self._factors_covariance_dict[date],
+                                                           self._specific_variance.get(date))
+        return self._hashes[date]
+
+    def _get(self, kind, date, build):
+        key = (kind, pd.Timestamp(date))
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+        entry = self._load(key)
+        if entry is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            entry = build()
+        self._put(key, entry)
+        return entry
+
+    def _put(self, key, entry):
+        size = sum(values.nbytes for values in _to_arrays(key[0], entry).values())
+        if size > self._max_bytes:
+            self._spill(key, entry)
+            return
+        self._entries[key] = (entry, size)
+        self._bytes += size
+        while self._bytes > self._max_bytes:
+            evicted_key, (evicted, evicted_size) = self._entries.popitem(last = False)
+            self._bytes -= evicted_size
+            self._spill(evicted_key, evicted)
+
+    def _file(self, key, part):
+        kind, date = key
+        return os.path.join(self._cache_dir, '{}_{}_{}_{}.npy'.format(kind, date.strftime('%Y%m%d'), self._content_hash(date), part))
+
+    def _spill(self, key, entry):
+        if self._cache_dir is None:
+            return
+        arrays = _to_arrays(key[0], entry)
+        if all(os.path.isfile(self._file(key, part)) for part in arrays):
+            return
+        os.makedirs(self._cache_dir, exist_ok = True)
+        for part, values in arrays.items():
+            np.save(self._file(key, part), values)
+
+    def _load(self, key):
+        if self._cache_dir is None:
+            return None
+        parts = ['values', 'codes'] if key[0] == 'covariance' else ['expo', 'factors_covariance', 'specific_variance', 'codes', 'factors']
+        if not all(os.path.isfile(self._file(key, part)) for part in parts):
+            return None
+        return _from_arrays(key[0], {part:np.load(self._file(key, part)) for part in parts}, self._index_name)
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def stats(self):
+        return {'hits':self.hits, 'misses':self.misses, 'disk_hits':self.disk_hits,
+                'entries':len(self._entries), 'bytes':self._bytes}
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 13:12:30 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import numpy as np
+
+def _regress(y, X, date_id, date_num, industry_id = None, industry_num = 0):
+    '''
+    y: (n,)，X: (n×k)，date_id/industry_id为整数编码
+    只用bincount累加每个日期的交叉乘积和，不排序；行业固定效应先在每个日期-行业内减去组均值吸收，
+    再累加交叉乘积，不从未中心化的和中扣除(市值这类量级很大的变量会损失精度)，
+    最后把每个日期的正规方程堆叠成(d×k×k)一次求解，残差平方和由残差直接计算
+    '''
+    n, k = X.shape
+    Z = np.column_stack([X, y])
+    if industry_id is not None:
+        group_id = date_id * industry_num + industry_id
+        group_num = date_num * industry_num
+        count = np.bincount(group_id, minlength = group_num).astype(float)
+        count_nonzero = np.where(count > 0, count, 1)
+        for i in range(k + 1):
+            Z[:, i] -= (np.bincount(group_id, Z[:, i], minlength = group_num) / count_nonzero)[group_id]
+        industry_count = (count > 0).reshape(date_num, industry_num).sum(axis = 1)
+    else:
+        industry_count = 0
+
+    ZtZ = np.empty((date_num, k + 1, k + 1))
+    for i in range(k + 1):
+        for j in range(i, k + 1):
+            ZtZ[:, i, j] = ZtZ[:, j, i] = np.bincount(date_id, Z[:, i] * Z[:, j], minlength = date_num)
+    XtX, Xty = ZtZ[:, :k, :k], ZtZ[:, :k, k]
+
+    #按列范数缩放后再求逆，避免市值这类量级很大的变量让正规方程病态
+    scale = np.sqrt(np.diagonal(XtX, axis1 = 1, axis2 = 2))
+    scale = np.where(scale > 0, scale, 1)
+    XtX_scaled = XtX / (scale[:, :, None] * scale[:, None, :])
+    XtX_inv = np.linalg.pinv(XtX_scaled) / (scale[:, :, None] * scale[:, None, :])
+    coef = np.einsum('dij,dj->di', XtX_inv, Xty)
+
+    residual = Z[:, k] - np.einsum('nk,nk->n', Z[:, :k], coef[date_id])
+    rss = np.bincount(date_id, residual * residual, minlength = date_num)
+    dof = np.bincount(date_id, minlength = date_num) - np.linalg.matrix_rank(XtX_scaled) - industry_count
+    sigma2 = np.where(dof > 0, rss / np.where(dof > 0, dof, 1), np.nan)
+    se = np.sqrt(sigma2[:, None] * np.diagonal(XtX_inv, axis1 = 1, axis2 = 2))
+    return coef, se, dof
+
+def cross_sectional_regression(y, X, industry = None):
+    '''
+    逐日截面回归 y ~ X (+ 行业固定效应)，不含截距项，有行业固定效应时截距被行业吸收
+    y: 被解释变量，索引为(code, date)
+    X: 解释变量，与y索引相同
+    industry: 行业，为None时不加行业固定效应
+    返回列为(coef/se/t, 变量名)、索引为日期的DataFrame，以及每日自由度dof
+    '''
+    X = pd.DataFrame(X)
+    if X.index is not y.index:
+        X = X.reindex(y.index)
+    y_values = np.asarray(y.values, dtype = float)
+    X_values = np.asarray(X.values, dtype = float)
+    valid = ~np.isnan(y_values) & ~np.isnan(X_values).any(axis = 1)
+    industry_id, industry_num = None, 0
+    if industry is not None:
+        if industry.index is not y.index:
+            industry = industry.reindex(y.index)
+        industry_id, industry_levels = pd.factorize(industry.values)
+        industry_num = len(industry_levels)
+        valid &= industry_id >= 0
+
+    if isinstance(y.index, pd.MultiIndex):#直接使用索引中日期的编码
+        level = y.index.names.index('date')
+        date_id, dates = y.index.codes[level], y.index.levels[level]
+    else:
+        date_id, dates = pd.factorize(y.index.get_level_values('date'))
+    date_id = np.asarray(date_id, dtype = np.int64)
+    if not valid.all():
+        y_values, X_values, date_id = y_values[valid], X_values[valid], date_id[valid]
+        industry_id = None if industry_id is None else industry_id[valid]
+    coef, se, dof = _regress(y_values, X_values, date_id, len(dates), industry_id, industry_num)
+
+    has_data = np.bincount(date_id, minlength = len(dates)) > 0
+    order = np.argsort(dates[has_data], kind = 'mergesort')
+    index = pd.Index(dates[has_data][order], name = 'date')
+    coef, se, dof = coef[has_data][order], se[has_data][order], dof[has_data][order]
+    coef = pd.DataFrame(coef, index = index, columns = X.columns)
+    se = pd.DataFrame(se, index = index, columns = X.columns)
+    result = pd.concat({'coef':coef, 'se':se, 't':coef / se}, axis = 1)
+    result['dof'] = dof
+    return result
+
+def fama_macbeth(coef, lags = None):
+    '''
+    Fama-MacBeth因子收益率：对逐日回归系数求时间序列均值
+    coef: 日期×变量的回归系数，例如cross_sectional_regression(...)['coef']
+    lags: Newey-West调整的滞后阶数，为None时使用普通标准误
+    '''
+    count = coef.count()
+    mean = coef.mean()
+    deviation = coef - mean
+    variance = (deviation ** 2).sum() / count
+    if lags:
+        for lag in range(1, lags + 1):
+            weight = 1 - lag / (lags + 1)
+            variance += 2 * weight * (deviation * deviation.shift(lag)).sum() / count
+    se = np.sqrt(variance / count)
+    return pd.DataFrame({'mean':mean, 'se':se, 't':mean / se})
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 22:05:40 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import numpy as np
+
+import segment
+
+def _horizons(horizons):
+    return list(range(1, horizons + 1)) if np.isscalar(horizons) else list(horizons)
+
+def forward_returns(close, horizons = 1):
+    '''
+    close: 调仓日的复权价，索引为(code, date)
+    每只股票到它之后第h次出现的调仓日的收益，h = 1时与SFPortfolio的period_returns相同
+    行按(code, date)排序后一次按位置平移，所有期限一起计算
+    返回列为各个期限的DataFrame，索引与close排序后相同
+    '''
+    close = close.sort_index()
+    code_id = pd.factorize(close.index.get_level_values('code'))[0]
+    values = close.values.astype(float)
+    n = len(values)
+    result = {}
+    for h in _horizons(horizons):
+        position = np.arange(n) + h
+        same_code = np.zeros(n, dtype = bool)
+        same_code[:max(n - h, 0)] = code_id[h:] == code_id[:max(n - h, 0)]
+        result[h] = np.where(same_code, values[np.minimum(position, n - 1)] / values - 1, np.nan)
+    return pd.DataFrame(result, index = close.index)
+
+def _masked_rank(values, segment_id, valid, order):
+    '''
+    values在每段内只在valid的行中的平均排名(与pandas的rank相同)，其余为NaN
+    order: 按(段, 值)排好的行顺序，同一列的多个valid共用一次排序
+    '''
+    n = len(values)
+    if n == 0:
+        return np.zeros(0)
+    sorted_segment = segment_id[order]
+    sorted_values = values[order]
+    sorted_valid = valid[order].astype(np.int64)
+    before = np.cumsum(sorted_valid) - sorted_valid
+    segment_starts = segment.segment_starts(sorted_segment)
+    tie_starts = segment.segment_starts(sorted_segment, sorted_values)
+    segment_of_row = segment.segment_id(segment_starts, n)
+    tie_of_row = segment.segment_id(tie_starts, n)
+    tie_count = np.add.reduceat(sorted_valid, tie_starts)[tie_of_row]
+    sorted_rank = before[tie_starts][tie_of_row] - before[segment_starts][segment_of_row] + (tie_count + 1) / 2
+    rank = np.empty(n)
+    rank[order] = np.where(sorted_valid > 0, sorted_rank, np.nan)
+    return rank
+
+def _segment_corr(x, y, segment_id, segment_num, valid):
+    '''
+    每段内valid的行上x与y的相关系数，先减去段内均值再求和，少于2行或方差为0时为NaN
+    '''
+    s = segment_id[valid]
+    x = x[valid]
+    y = y[valid]
+    count = np.bincount(s, minlength = segment_num)
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        x = x - (np.bincount(s, x, minlength = segment_num) / count)[s]
+        y = y - (np.bincount(s, y, minlength = segment_num) / count)[s]
+        xy = np.bincount(s, x * y, minlength = segment_num)
+        xx = np.bincount(s, x * x, minlength = segment_num)
+        yy = np.bincount(s, y * y, minlength = segment_num)
+        corr = xy / np.sqrt(xx * yy)
+    corr[(count < 2) | (xx == 0) | (yy == 0)] = np.nan
+    return corr
+
+def information_coefficients(factors, returns, exclude_zero = True):
+    '''
+    每个日期因子与各期收益的Rank IC(Spearman)和IC(Pearson)
+    factors: 一个因子，索引为(code, date)
+    returns: 与factors对齐的一个或多个期限的收益(Series或DataFrame，例如forward_returns的结果)
+    exclude_zero: 与SFPortfolio一样不使用收益为0的行(通常是停牌)
+    因子在每个日期只排序一次，各期限缺失的行不同，只重新累计有效行数得到排名；
+    相关系数用按日期的分段求和计算，不构造每个日期的相关系数矩阵
+    返回索引为date、列为(Rank_IC/IC, 期限)的DataFrame，没有有效数据的日期为NaN
+    '''
+    returns = pd.DataFrame(returns)
+    factor_values = np.asarray(factors, dtype = float)
+    date_id, dates = pd.factorize(factors.index.get_level_values('date'), sort = True)
+    date_num = len(dates)
+    factor_order = np.lexsort((factor_values, date_id))
+    factor_valid = ~np.isnan(factor_values)
+
+    result = {}
+    for name, column in returns.items():
+        values = column.values.astype(float)
+        valid = factor_valid & ~np.isnan(values)
+        if exclude_zero:
+            valid &= values != 0
+        factor_rank = _masked_rank(factor_values, date_id, valid, factor_order)
+        return_rank = _masked_rank(values, date_id, valid, np.lexsort((values, date_id)))
+        result[('Rank_IC', name)] = _segment_corr(factor_rank, return_rank, date_id, date_num, valid)
+        result[('IC', name)] = _segment_corr(factor_values, values, date_id, date_num, valid)
+    result = pd.DataFrame(result, index = pd.DatetimeIndex(dates, name = 'date'))
+    result.columns = pd.MultiIndex.from_tuples(result.columns, names = ['IC', 'horizon'])
+    return result
+
+def decay(IC):
+    '''
+    各期限IC的均值和IR(均值/标准差)，索引为期限
+    '''
+    mean = IC.mean().unstack('IC')
+    IR = (IC.mean() / IC.std()).unstack('IC').add_suffix('_IR')
+    return pd.concat([mean, IR], axis = 1)[['Rank_IC', 'IC', 'Rank_IC_IR', 'IC_IR']]
+
+def rolling_IR(IC, window = 12, min_periods = None):
+    '''
+    最近window个调仓日的IC均值/标准差
+    '''
+    rolling = IC.rolling(window, min_periods = min_periods)
+    return rolling.mean() / rolling.std()
+
+def yearly_IR(IC):
+    '''
+    每年的IC均值/标准差，与SFPortfolio.plot_IR相同
+    '''
+    grouped = IC.groupby(IC.index.year)
+    return grouped.mean() / grouped.std()
+
+def ic_analysis(factors, close, horizons = 6, window = 12, exclude_zero = True):
+    '''
+    一次计算因子的IC衰减和滚动IR
+    factors: 调仓日的因子，索引为(code, date)
+    close: 调仓日的复权价，包含没有因子值的股票，用于计算各期限的远期收益
+    horizons: 期限(调仓期数)，整数h表示1..h
+    返回字典: IC为各日期、各期限的Rank_IC和IC，decay为各期限的均值和IR，
+    rolling_IR为window期滚动IR，yearly_IR为每年的IR
+    '''
+    returns = forward_returns(close, horizons).reindex(factors.index)
+    IC = information_coefficients(factors, returns, exclude_zero)
+    return {'IC':IC, 'decay':decay(IC), 'rolling_IR':rolling_IR(IC, window), 'yearly_IR':yearly_IR(IC)}
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 12:21:06 2026
+
+@author: lenovo
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import numpy as np
+
+import segment
+
+def _residuals(y, valid, date_id, industry_id = None, x = None):
+    '''
+    y: 因子值(n×k)，行已按(日期, 行业)排序
+    valid: 每一列参与回归的行
+    industry_id: 行业编号，为None时不做行业中性
+    x: 对数市值，为None时不做市值中性
+    行业哑变量通过日期-行业内去均值吸收(Frisch-Waugh)，市值再做一次每日一元回归
+    '''
+    n = len(y)
+    if n == 0:
+        return y
+    weights = valid.astype(float)
+    y = np.where(valid, y, 0.0)
+    if x is not None:
+        x = np.where(valid, x[:, None], 0.0)
+
+    if industry_id is not None:
+        starts = segment.segment_starts(date_id, industry_id)
+        segment_id = segment.segment_id(starts, n)
+        count = np.add.reduceat(weights, starts, axis = 0)
+        count[count == 0] = np.nan
+        y = np.where(valid, y - (np.add.reduceat(y, starts, axis = 0) / count)[segment_id], 0.0)
+        if x is not None:
+            x = np.where(valid, x - (np.add.reduceat(x, starts, axis = 0) / count)[segment_id], 0.0)
+
+    if x is not None:
+        starts = segment.segment_starts(date_id)
+        segment_id = segment.segment_id(starts, n)
+        xy = np.add.reduceat(x * y, starts, axis = 0)
+        xx = np.add.reduceat(x * x, starts, axis = 0)
+        beta = np.divide(xy, xx, out = np.zeros_like(xy), where = xx > 0)
+        y = y - beta[segment_id] * x
+
+    return np.where(valid, y, np.nan)
+
+def neutralize(factors, hist_data, industry = True, market_value = True, n_jobs = None):
+    '''
+    对因子做行业、市值中性，返回回归残差，不依赖statsmodels
+    factors: 一个因子(Series)或多个因子(DataFrame)，索引为(code, date)
+    hist_data: 包含industry和market_value的历史数据
+    n_jobs: 大于1时按日期分块，用进程池并行计算
+    返回与factors同类型的残差，索引为(code, date)，与industry_market_value_neutral一样只保留参与回归的行
+    '''
+    if not industry and not market_value:
+        raise ValueError("industry与market_value必须至少有一个为True")
+
+    is_series = isinstance(factors, pd.Series)
+    factors = pd.DataFrame(factors)
+    neutral_names = []
+    if industry:
+        neutral_names.append('industry')
+    if market_value:
+        neutral_names.append('market_value')
+    data = hist_data[neutral_names].join(factors, how = 'left')
+    data = data[data[neutral_names].notna().all(axis = 1).values]
+
+    date_id = pd.factorize(data.index.get_level_values('date'), sort = True)[0]
+    industry_id = pd.factorize(data['industry'], sort = True)[0] if industry else np.zeros(len(data), dtype = np.int64)
+    order = np.lexsort((industry_id, date_id))
+    date_id = date_id[order]
+    industry_id = industry_id[order] if industry else None
+    x = np.log(data['market_value'].values[order].astype(float)) if market_value else None
+    y = data[factors.columns].values[order].astype(float)
+    valid = ~np.isnan(y)
+
+    if n_jobs is not None and n_jobs > 1 and len(y) > 0:
+        bounds = segment.chunk_bounds(segment.segment_starts(date_id), len(date_id), n_jobs * 4)
+        with ProcessPoolExecutor(n_jobs) as executor:
+            futures = [executor.submit(_residuals, y[start:end], valid[start:end], date_id[start:end],
+                                       None if industry_id is None else industry_id[start:end],
+                                       None if x is None else x[start:end])
+                       for start, end in bounds]
+            residuals = np.vstack([future.result() for future in futures])
+    else:
+        residuals = _residuals(y, valid, date_id, industry_id, x)
+
+    result = np.empty_like(residuals)
+    result[order] = residuals
+    #按float64计算，结果保持输入的精度，float32的因子不会变成float64
+    result = pd.DataFrame(result.astype(np.result_type(np.float32, *factors.dtypes), copy = False), index = data.index, columns = factors.columns)
+    result = result[result.notna().any(axis = 1).values]
+    if is_series:
+        return result[factors.columns[0]]
+    return result
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 11:02:15 2026
+
+@author: lenovo
+"""
+import os
+import json
+
+import pandas as pd
+import numpy as np
+from pandas.api.types import is_categorical_dtype
+
+import schema
+
+META_FILE = 'meta.json'
+
+def write_panel(data, store_path):
+    '''
+    把read_data得到的面板数据按列写成二进制文件
+    行按(date, code)排序，日期和股票代码做字典编码，并记录每个日期的起始行，读取时按日期二分查找
+    '''
+    data = data.reset_index()
+    has_code = 'code' in data.columns
+    sort_columns = ['date', 'code'] if has_code else ['date']
+    data = data.sort_values(sort_columns, kind = 'mergesort')
+    os.makedirs(store_path, exist_ok = True)
+
+    date_codes, date_levels = pd.factorize(data['date'], sort = True)
+    date_offsets = np.searchsorted(date_codes, np.arange(len(date_levels) + 1))
+    np.save(os.path.join(store_path, 'date_levels.npy'), date_levels.values.astype('datetime64[ns]'))
+    np.save(os.path.join(store_path, 'date_offsets.npy'), date_offsets.astype(np.int64))
+    if has_code:
+        code_codes, code_levels = pd.factorize(data['code'], sort = True)
+        np.save(os.path.join(store_path, 'code_levels.npy'), _to_array(code_levels))
+        np.save(os.path.join(store_path, 'code_codes.npy'), code_codes.astype(np.int32))
+
+    columns = []
+    for i, name in enumerate(data.columns.difference(sort_columns, sort = False)):
+        file_name = 'column_{}'.format(i)
+        values = data[name]
+        if is_categorical_dtype(values.dtype) or values.dtype == object:
+            if is_categorical_dtype(values.dtype):
+                codes, levels = values.cat.codes.values, values.cat.categories
+            else:
+                codes, levels = pd.factorize(values, sort = True)
+            np.save(os.path.join(store_path, file_name + '_levels.npy'), _to_array(levels))
+            np.save(os.path.join(store_path, file_name + '.npy'), codes.astype(np.int32))
+            columns.append({'name':name, 'file':file_name, 'encoded':True})
+        else:
+            np.save(os.path.join(store_path, file_name + '.npy'), values.values)
+            columns.append({'name':name, 'file':file_name, 'encoded':False})
+
+    meta = {'rows':len(data), 'has_code':has_code, 'columns':columns}
+    with open(os.path.join(store_path, META_FILE), 'w') as f:
+        json.dump(meta, f)
+    return PanelStore(store_path)
+
+def convert_csv(file_path, store_path):
+    '''
+    只解析一次CSV，之后用PanelStore读取
+    '''
+    import utils
+    return write_panel(utils.read_data(file_path), store_path)
+
+def is_panel_store(path):
+    return isinstance(path, (str, os.PathLike)) and os.path.isfile(os.path.join(path, META_FILE))
+
+def _to_array(levels):
+    '''
+    字典用定长数组保存，不依赖pickle，可以直接内存映射
+    '''
+    levels = np.asarray(levels)
+    if levels.dtype == object:
+        levels = levels.astype(str)
+    return levels
+
+class PanelStore:
+
+    def __init__(self, store_path):
+        '''
+        store_path: write_panel/convert_csv写出的目录，所有数组以内存映射方式打开
+        '''
+        with open(os.path.join(store_path, META_FILE)) as f:
+            self._meta = json.load(f)
+        self._path = store_path
+        self._date_levels = self._load('date_levels')
+        self._date_offsets = self._load('date_offsets')
+
+    def _load(self, file_name):
+        return np.load(os.path.join(self._path, file_name + '.npy'), mmap_mode = 'r')
+
+    @property
+    def columns(self):
+        return [column['name'] for column in self._meta['columns']]
+
+    @property
+    def dates(self):
+        return pd.DatetimeIndex(self._date_levels, name = 'date')
+
+    def _date_slice(self, start_date = None, end_date = None):
+        '''
+        [start_date, end_date)对应的日期位置，与get_data_between_date的区间一致
+        '''
+        start = 0 if start_date is None else np.searchsorted(self._date_levels, np.datetime64(pd.Timestamp(start_date), 'ns'), side = 'left')
+        end = len(self._date_levels) if end_date is None else np.searchsorted(self._date_levels, np.datetime64(pd.Timestamp(end_date), 'ns'), side = 'left')
+        return start, max(start, end)
+
+    def read(self, columns = None, start_date = None, end_date = None, compact = False, float32 = False):
+        '''
+        只读取需要的列和日期区间
+        返回的索引与read_data相同，行按(date, code)排序
+        compact, float32: 读取每一列时直接转为schema.compact的紧凑类型，不先读出默认类型的整张表，
+                          字典编码的列直接返回分类类型，类别是整个文件的字典，不同日期区间读出的部分可以直接合并
+        '''
+        start, end = self._date_slice(start_date, end_date)
+        row_start, row_end = self._date_offsets[start], self._date_offsets[end]
+
+        date_levels = pd.DatetimeIndex(self._date_levels[start:end], name = 'date')
+        date_codes = np.repeat(np.arange(end - start), np.diff(self._date_offsets[start:end + 1]))
+        if self._meta['has_code']:
+            code_levels = self._load('code_levels')
+            if code_levels.dtype.kind == 'U':
+                code_levels = code_levels.astype(object)
+            index = pd.MultiIndex(levels = [pd.Index(code_levels), date_levels],
+                                  codes = [self._load('code_codes')[row_start:row_end], date_codes],
+                                  names = ['code', 'date'], verify_integrity = False)
+        else:
+            index = date_levels[date_codes]
+
+        meta_columns = self._meta['columns']
+        if columns is not None:
+            meta_columns = [column for name in columns for column in meta_columns if column['name'] == name]
+        data = {}
+        for column in meta_columns:
+            values = self._load(column['file'])[row_start:row_end]
+            if column['encoded']:
+                levels = self._load(column['file'] + '_levels').astype(object)
+                values = pd.Categorical.from_codes(values, levels)
+                data[column['name']] = values if compact else np.array(values.astype(object))
+            elif compact:
+                data[column['name']] = schema.compact_values(column['name'], np.array(values), float32)
+            else:
+                data[column['name']] = np.array(values)
+        return schema.to_frame(data, index)
+
+    def get_data_between_date(self, start_date, end_date, columns = None, compact = False, float32 = False):
+        return self.read(columns, start_date, end_date, compact, float32)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 22:41:17 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import numpy as np
+
+#每年的交易日数
+TRADING_DAYS = 252
+
+DESCRIBE_INDEX = ['annual_returns', 'annual_std', 'max_drawdown', 'sharpe_ratio',
+                  'annual_excess_returns', 'tracking_error', 'information_ratio', 'excess_max_drawdown',
+                  'positive_ratio', 'positive_sequence_length', 'negative_sequence_length',
+                  'daily_excess_win_ratio', 'turnover', 'win_ratio']
+
+def _as_frame(returns):
+    '''
+    Series转为一列的DataFrame，返回(DataFrame, 是否为Series)
+    '''
+    if isinstance(returns, pd.Series):
+        return returns.to_frame(), True
+    return pd.DataFrame(returns), False
+
+def _result(values, frame, is_series):
+    result = pd.Series(values, index = frame.columns)
+    return result.iloc[0] if is_series else result
+
+def cum_value(returns):
+    '''
+    日期×组合的收益率矩阵的净值，初始净值为1，缺失的收益率按0计算
+    '''
+    return np.cumprod(1 + np.nan_to_num(np.asarray(returns, dtype = float)), axis = 0)
+
+def _drawdown(values, positions = True):
+    '''
+    返回(每列的最大回撤, 高点位置, 低点位置)，没有回撤时位置为-1，高点是初始净值时也为-1
+    '''
+    value = cum_value(values)
+    n, m = value.shape
+    if n == 0:
+        return np.zeros(m), np.full(m, -1), np.full(m, -1)
+    max_value = np.maximum.accumulate(np.maximum(value, 1), axis = 0)
+    drawdowns = value / max_value - 1
+    trough = drawdowns.argmin(axis = 0)
+    max_drawdown = np.minimum(drawdowns[trough, np.arange(m)], 0)
+    if not positions:
+        return max_drawdown, None, None
+    #每个位置之前最近一次创新高的位置，-1表示初始净值
+    rows = np.broadcast_to(np.arange(n)[:, None], (n, m))
+    peak = np.maximum.accumulate(np.where(value >= max_value, rows, -1), axis = 0)[trough, np.arange(m)]
+    has_drawdown = max_drawdown < 0
+    return max_drawdown, np.where(has_drawdown, peak, -1), np.where(has_drawdown, trough, -1)
+
+def _dates(index, positions):
+    '''
+    位置对应的日期，-1为NaT
+    '''
+    return pd.Series(index).reindex(positions).values
+
+def drawdown(returns):
+    '''
+    每列的最大回撤及其高点、低点的日期，与utils.mdd相同，初始净值1也算作高点
+    高点为低点之前净值最高的日期，高点是初始净值或没有回撤时为NaT
+    返回索引为列名、列为max_drawdown、peak、trough的DataFrame
+    '''
+    frame, _ = _as_frame(returns)
+    max_drawdown, peak, trough = _drawdown(frame.values)
+    return pd.DataFrame({'max_drawdown':max_drawdown, 'peak':_dates(frame.index, peak),
+                         'trough':_dates(frame.index, trough)}, index = frame.columns)
+
+def max_drawdown(returns):
+    '''
+    每列的最大回撤，Series时返回一个数
+    '''
+    frame, is_series = _as_frame(returns)
+    return _result(_drawdown(frame.values, positions = False)[0], frame, is_series)
+
+def longest_streak(returns, positive = True):
+    '''
+    每列最长的连续不亏(positive = False时为连续不赚)的期数，与utils.longest_positive_length相同，
+    收益率缺失的期不中断连续
+    用累加计数减去最近一次中断时的计数得到每个位置的连续长度
+    '''
+    frame, is_series = _as_frame(returns)
+    values = frame.values.astype(float)
+    if len(values) == 0:
+        return _result(np.zeros(values.shape[1], dtype = np.int64), frame, is_series)
+    kept = ~(values < 0) if positive else ~(values > 0)
+    count = np.cumsum(kept, axis = 0)
+    last_break = np.maximum.accumulate(np.where(kept, 0, count), axis = 0)
+    return _result((count - last_break).max(axis = 0), frame, is_series)
+
+def annual_returns(returns, periods = TRADING_DAYS):
+    return returns.mean() * periods
+
+def annual_std(returns, periods = TRADING_DAYS):
+    return returns.std() * np.sqrt(periods)
+
+def sharpe_ratio(returns, periods = TRADING_DAYS):
+    return returns.mean() / returns.std() * np.sqrt(periods)
+
+def tracking_error(excess_returns, periods = TRADING_DAYS):
+    return annual_std(excess_returns, periods)
+
+def information_ratio(excess_returns, periods = TRADING_DAYS):
+    return sharpe_ratio(excess_returns, periods)
+
+def win_ratio(returns):
+    '''
+    收益为正的期数占比，缺失的期算作不为正
+    '''
+    return (returns > 0).mean()
+
+def annual_turnover(turnover, rebalance_time = 20, periods = TRADING_DAYS):
+    '''
+    每次调仓单边换手率的均值按双边、每rebalance_time个交易日调仓一次年化
+    '''
+    return turnover.mean() * 2 * periods / rebalance_time
+
+def _align(data, columns):
+    '''
+    Series或一列的DataFrame用于每个组合，否则按列名对齐
+    '''
+    frame, _ = _as_frame(data)
+    if frame.shape[1] == 1 and list(frame.columns) != list(columns):
+        return pd.DataFrame(np.repeat(frame.values, len(columns), axis = 1), index = frame.index, columns = columns)
+    return frame.reindex(columns = columns)
+
+def describe(portfolio_returns, index_returns, rebalance_returns, turnover, rebalance_time = 20):
+    '''
+    所有组合一次计算utils.describe_index_enhence中的统计量
+    portfolio_returns: 日期×组合的日度收益率
+    index_returns: 基准指数的日度收益率
+    rebalance_returns, turnover: 日期×组合的调仓区间收益率和换手率，Series时用于每个组合
+    返回索引为统计量、列为组合的DataFrame
+    '''
+    portfolio_returns, _ = _as_frame(portfolio_returns)
+    columns = portfolio_returns.columns
+    excess_returns = portfolio_returns - np.atleast_2d(np.asarray(index_returns, dtype = float)).T
+    rebalance_returns = _align(rebalance_returns, columns)
+    turnover = _align(turnover, columns)
+
+    result = {}
+    result['annual_returns'] = annual_returns(portfolio_returns)
+    result['annual_std'] = annual_std(portfolio_returns)
+    result['max_drawdown'] = max_drawdown(portfolio_returns)
+    result['sharpe_ratio'] = result['annual_returns'] / result['annual_std']
+    result['annual_excess_returns'] = annual_returns(excess_returns)
+    result['tracking_error'] = tracking_error(excess_returns)
+    result['information_ratio'] = result['annual_excess_returns'] / result['tracking_error']
+    result['excess_max_drawdown'] = max_drawdown(excess_returns)
+    result['positive_ratio'] = win_ratio(rebalance_returns)
+    result['positive_sequence_length'] = longest_streak(rebalance_returns)
+    result['negative_sequence_length'] = longest_streak(rebalance_returns, positive = False)
+    result['daily_excess_win_ratio'] = win_ratio(excess_returns)
+    result['turnover'] = annual_turnover(turnover, rebalance_time)
+    result['win_ratio'] = win_ratio(rebalance_returns)
+    return pd.DataFrame(result, index = columns, columns = DESCRIBE_INDEX).astype(float).T
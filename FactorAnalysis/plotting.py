@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:30:14 2026
+
+@author: lenovo
+"""
+
+def _pyplot():
+    '''
+    第一次绘图时才导入matplotlib，只计算统计量时不需要安装matplotlib
+    '''
+    try:
+        import matplotlib.pyplot as plt
+    except ImportError as e:
+        raise ImportError('绘图需要安装matplotlib: pip install matplotlib') from e
+    return plt
+
+class PlottingMixin:
+    '''
+    SFPortfolio的绘图方法，使用_returns、_IC_data、_balance_time和sharpe_ratio()
+    '''
+    
+    def plot_cum(self, **args):
+        plt = _pyplot()
+        if self._returns is None: self._cal_returns()
+        fig, ax = plt.subplots()
+        cum_returns = (self._returns + 1).cumprod()
+        cum_returns[cum_returns.columns[:-1]].plot(ax = ax)
+        cum_returns['long_short'].plot(ax = ax, linewidth = 3, color = 'blueviolet', alpha = 0.7)
+        return ax
+    
+    def plot_annual_returns(self, title = None):
+         #年化收益率绘图
+        plt = _pyplot()
+        returns = self._returns.mean().iloc[:-1] * (252 / self._balance_time)
+        fig_returns, ax_returns = plt.subplots()
+        title = title if title is not None else 'Annual Returns'
+        returns.plot(kind = 'bar', ax = ax_returns, title = title)
+        return fig_returns
+    
+    def plot_sharpe_ratio(self):
+        plt = _pyplot()
+        fig_SR, ax_SR = plt.subplots()
+        SR = self.sharpe_ratio()
+        SR.plot(kind = 'bar', ax = ax_SR, title = 'Sharpe Ratio')
+        return fig_SR
+        
+    def plot_IC(self):
+        #绘制IC图
+        plt = _pyplot()
+        fig_IC, ax_IC = plt.subplots()
+        #index = self._IC_data.index
+        #xticks = [index[i].strftime('%Y-%m-%d') if i % 5 == 0 else '' for i in range(len(index))]
+        self._IC_data.plot(kind = 'bar', title = 'IC')
+        return fig_IC
+    
+    def plot_IR(self):
+        #绘制ICIR图
+        plt = _pyplot()
+        IR_by_year = self._IC_data.resample('Y').mean() / self._IC_data.resample('Y').std()
+        IR_by_year.index = IR_by_year.index.year
+        fig_IR, ax_IR = plt.subplots()
+        IR_by_year.plot(kind = 'bar', title = 'IR', figsize = (8, 6))
+        return fig_IR
+    
+    def plot_long_short_value(self, title = None, start_date = None):
+        #绘制多空净值图
+        plt = _pyplot()
+        returns = self._returns['long_short']
+        if start_date is not None:
+            returns = returns[start_date:]
+        pure_assets = (returns + 1).cumprod()
+        fig_value, ax_value = plt.subplots()
+        title = title if title is not None else 'Long Short Portfolio Value'
+        pure_assets.plot(ax = ax_value, title = title)
+        return fig_value
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:31:27 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import numpy as np
+from scipy import sparse
+
+#热启动时给上一期没有持仓的股票留出的权重比例，保证初始点严格在不等式约束内部
+WARM_START_MIX = 0.1
+
+def factor_model_on_date(date, factors_expo_sub, factors_covariance_dict, specific_variance_sub):
+    '''
+    与utils.get_covariance_specific_date相同的股票和因子，但不计算N×N的协方差矩阵
+    返回(因子暴露X: N×K, 因子协方差F: K×K, 特异方差: N)
+    '''
+    factors_expo = factors_expo_sub[factors_expo_sub.index.get_level_values('date') == date].droplevel('date')
+    specific_variance = specific_variance_sub[specific_variance_sub.index.get_level_values('date') == date].droplevel('date')
+    return align_factor_model(factors_expo, factors_covariance_dict[date], specific_variance)
+
+def align_factor_model(factors_expo, factors_covariance, specific_variance):
+    '''
+    一个日期的因子暴露、因子协方差和特异方差对齐：缺少的因子暴露为0，
+    只保留特异方差和因子暴露都不缺失的股票，顺序与特异方差相同
+    '''
+    factors_expo = factors_expo.reindex(columns = factors_covariance.columns, fill_value = 0)
+    specific_variance = specific_variance.dropna()
+    factors_expo = factors_expo.reindex(specific_variance.index)
+    valid = factors_expo.notna().all(axis = 1).values
+    return factors_expo[valid], factors_covariance, specific_variance[valid]
+
+def _to_spmatrix(values):
+    from cvxopt import spmatrix
+    values = sparse.coo_matrix(values)
+    return spmatrix(values.data.astype(float), values.row.astype(int), values.col.astype(int), size = values.shape)
+
+def _initvals(previous, codes, exposures, G, h):
+    '''
+    把上一期的解按股票代码对齐到这一期，作为内点法的初始点
+    新出现的股票分到WARM_START_MIX的权重，不等式的对偶变量取上一期的均值
+    '''
+    from cvxopt import matrix
+    N, M = exposures.shape
+    weights = previous['weights'].reindex(codes).fillna(0).values
+    if previous['z'] is not None:#不能卖空
+        weights = weights.clip(min = 0)
+    if weights.sum() <= 0:
+        return None
+    weights = (1 - WARM_START_MIX) * weights / weights.sum() + WARM_START_MIX / N
+    x = np.append(weights, exposures.T.dot(weights))
+    initvals = {'x':matrix(x)}
+    if len(previous['y']) == M + 1:
+        initvals['y'] = matrix(previous['y'])
+    if G is not None:
+        s = np.array(h).ravel() - np.array(G * matrix(x)).ravel()
+        z = []
+        if previous['z_return'] is not None:
+            z.append(previous['z_return'])
+        if previous['z'] is not None:
+            z_weights = previous['z'].reindex(codes)
+            z.append(z_weights.fillna(z_weights.mean()).fillna(1.0).values)
+        z = np.concatenate(z) if z else np.array([])
+        if (s > 0).all() and len(z) == len(s):
+            initvals['s'] = matrix(s)
+            initvals['z'] = matrix(np.maximum(z, 1e-8))
+    return initvals
+
+def factor_mean_variance_optimization(factors_expo, factors_covariance, specific_variance, mean = None,
+                                      expected_return = None, can_short = False, previous = None):
+    '''
+    以因子模型的形式求最小方差组合，与utils.mean_variance_optimization的二次规划等价：
+    增加因子暴露变量f = X'w，目标为(w'Dw + f'Ff)/2，约束为sum(w) = 1、X'w - f = 0，
+    预期收益同样作为一个辅助变量r = mean'w，约束r >= expected_return，
+    所有矩阵都是稀疏的，不需要N×N的协方差矩阵
+    factors_expo, factors_covariance, specific_variance: factor_model_on_date的结果
+    mean, expected_return: 预期收益和最低收益要求
+    previous: 上一期返回的solution，用于热启动
+    返回(权重, 目标函数值, solution)
+    '''
+    from cvxopt import solvers
+    from cvxopt import matrix
+    codes = factors_expo.index
+    N, K = factors_expo.shape
+    exposures = factors_expo.values.astype(float)
+    variable_covariance = factors_covariance.values.astype(float)
+    if expected_return is not None:
+        mean = pd.Series(mean).reindex(codes).values.astype(float)
+        exposures = np.column_stack([exposures, mean])
+        variable_covariance = sparse.block_diag([variable_covariance, sparse.csr_matrix((1, 1))])
+    M = exposures.shape[1]
+
+    #方差的量级很小，按等权组合的方差缩放目标函数，否则cvxopt的绝对误差标准会让迭代过早停止
+    scale = factor_portfolio_variance(pd.Series(1 / N, index = codes), factors_expo, factors_covariance, specific_variance)
+    P = _to_spmatrix(sparse.block_diag([sparse.diags(specific_variance.values.astype(float)), variable_covariance]) / scale)
+    q = matrix(np.zeros((N + M, 1)))
+    A = _to_spmatrix(sparse.vstack([sparse.hstack([np.ones((1, N)), sparse.csr_matrix((1, M))]),
+                                    sparse.hstack([exposures.T, -sparse.eye(M)])]))
+    b = matrix(np.append(1.0, np.zeros(M)))
+
+    G_rows, h = [], []
+    if expected_return is not None:
+        G_rows.append(sparse.hstack([sparse.csr_matrix((1, N + M - 1)), -np.ones((1, 1))]))
+        h.append(-expected_return)
+    if not can_short:
+        G_rows.append(sparse.hstack([-sparse.eye(N), sparse.csr_matrix((N, M))]))
+        h.extend([0.0] * N)
+    G = _to_spmatrix(sparse.vstack(G_rows)) if G_rows else None
+    h = matrix(np.array(h, dtype = float)) if G_rows else None
+
+    initvals = _initvals(previous, codes, exposures, G, h) if previous is not None else None
+    result = solvers.qp(P, q, G, h, A, b, initvals = initvals)
+
+    x = np.array(result['x']).ravel()
+    weights = pd.Series(x[:N], index = codes)
+    z = np.array(result['z']).ravel() if G is not None else np.array([])
+    solution = {'weights':weights, 'y':np.array(result['y']).ravel(),
+                'z_return':z[:1] if expected_return is not None else None,
+                'z':pd.Series(z[-N:], index = codes) if not can_short else None}
+    return weights, result['primal objective'] * scale, solution
+
+def factor_portfolio_variance(weights, factors_expo, factors_covariance, specific_variance):
+    '''
+    w'(XFX' + D)w，不计算N×N的协方差矩阵
+    '''
+    exposure = factors_expo.values.T.dot(weights.values)
+    return exposure.dot(factors_covariance.values).dot(exposure) + (weights.values ** 2).dot(specific_variance.values)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 14:20:11 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import numpy as np
+
+import segment
+
+FILL_QUANTILE = {'q.25':0.25, 'q.75':0.75}
+
+def _segment_mean(values, starts):
+    count = np.add.reduceat(~np.isnan(values), starts, axis = 0)
+    total = np.add.reduceat(np.nan_to_num(values), starts, axis = 0)
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        return np.where(count > 0, total / count, np.nan), count
+
+def _segment_std(values, starts, mean):
+    '''
+    与pandas的std一致，ddof = 1
+    '''
+    segment_of_row = segment.segment_id(starts, len(values))
+    count = np.add.reduceat(~np.isnan(values), starts, axis = 0)
+    square = np.add.reduceat(np.nan_to_num(values - mean[segment_of_row]) ** 2, starts, axis = 0)
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        return np.where(count > 1, np.sqrt(square / (count - 1)), np.nan)
+
+def _segment_statistic(values, starts, fill_value):
+    if fill_value == 'mean':
+        return _segment_mean(values, starts)[0]
+    if fill_value == 'min':
+        return np.fmin.reduceat(values, starts, axis = 0)
+    if fill_value == 'max':
+        return np.fmax.reduceat(values, starts, axis = 0)
+    return segment.segment_quantile(values, starts, FILL_QUANTILE[fill_value])
+
+def _clip_outlier(values, date_id, method):
+    '''
+    每个日期截面去极值，median为中位数±3倍MAD(×1.483)截尾，std为超过5倍标准差置为NaN、超过3倍标准差截尾
+    '''
+    if len(values) == 0:
+        return values
+    order = np.argsort(date_id, kind = 'mergesort')
+    sorted_values = values[order]
+    starts = segment.segment_starts(date_id[order])
+    segment_of_row = segment.segment_id(starts, len(values))
+    if method == 'median':
+        median = segment.segment_quantile(sorted_values, starts, 0.5)
+        deviation = np.abs(sorted_values - median[segment_of_row])
+        bound = 3 * 1.483 * segment.segment_quantile(deviation, starts, 0.5)
+        center, error_bound = median, None
+    else:
+        center = _segment_mean(sorted_values, starts)[0]
+        std = _segment_std(sorted_values, starts, center)
+        bound, error_bound = 3 * std, 5 * std
+    center, bound = center[segment_of_row], bound[segment_of_row]
+    with np.errstate(invalid = 'ignore'):
+        clipped = np.where(sorted_values > center + bound, center + bound, sorted_values)
+        clipped = np.where(sorted_values < center - bound, center - bound, clipped)
+        if error_bound is not None:
+            clipped[np.abs(sorted_values - center) > error_bound[segment_of_row]] = np.nan
+    result = np.empty_like(clipped)
+    result[order] = clipped
+    return result
+
+def preprocess_factors(factors, hist_data, fill_value = 'mean', outlier = 'median', standardize = True):
+    '''
+    去极值、缺失值填充、标准化，与utils.handle_outlier、fill_missing_values、standardlize_factors依次处理的结果相同
+    factors: 一个因子(Series)或多个因子(DataFrame)，索引为(code, date)
+    hist_data: 包含industry的历史数据，决定结果包含的行
+    fill_value: 'mean'/'min'/'max'/'q.25'/'q.75'，行业内股票少于10只时使用全市场的值，None为不填充
+    outlier: 'median'或'std'
+    行只按(日期, 行业)排序一次，所有分组统计量都是排好序的数组上的分段计算
+    '''
+    if fill_value is not None and fill_value not in ('mean', 'min', 'max', 'q.25', 'q.75'):
+        raise ValueError('不支持的fill_value: {}'.format(fill_value))
+    is_series = isinstance(factors, pd.Series)
+    factors = pd.DataFrame(factors)
+    columns = factors.columns
+    dtype = np.result_type(np.float32, *factors.dtypes)
+
+    values = factors.values.astype(float)
+    if outlier is not None:
+        date_id = pd.factorize(factors.index.get_level_values('date'))[0]
+        values = _clip_outlier(values, date_id, outlier)
+    factors = pd.DataFrame(values, index = factors.index, columns = columns)
+
+    data = hist_data[['industry']].join(factors, how = 'left')
+    data = data[data['industry'].notna().values]
+    date_id = pd.factorize(data.index.get_level_values('date'), sort = True)[0]
+    #行业编号按行业名排序，日期内的行序与同时处理哪些日期无关，分段求和的结果也就相同
+    industry_id = pd.factorize(data['industry'], sort = True)[0]
+    order = np.lexsort((industry_id, date_id))
+    values = data[columns].values.astype(float)[order]
+    n = len(values)
+    date_starts = segment.segment_starts(date_id[order])
+    date_segment = segment.segment_id(date_starts, n)
+
+    if fill_value is not None and n > 0:
+        industry_starts = segment.segment_starts(date_id[order], industry_id[order])
+        industry_segment = segment.segment_id(industry_starts, n)
+        industry_count = segment.segment_length(industry_starts, n)[industry_segment]
+        industry_statistic = _segment_statistic(values, industry_starts, fill_value)[industry_segment]
+        market_statistic = _segment_statistic(values, date_starts, fill_value)[date_segment]
+        fill = np.where((industry_count < 10)[:, None], market_statistic, industry_statistic)
+        values = np.where(np.isnan(values), fill, values)
+
+    if standardize and n > 0:
+        mean = _segment_mean(values, date_starts)[0]
+        std = _segment_std(values, date_starts, mean)
+        values = (values - mean[date_segment]) / std[date_segment]
+
+    result = np.empty_like(values)
+    result[order] = values
+    #按float64计算，结果保持输入的精度
+    result = pd.DataFrame(result.astype(dtype, copy = False), index = data.index, columns = columns).sort_index()
+    if is_series:
+        return result[columns[0]]
+    return result
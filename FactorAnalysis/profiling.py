@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 20:12:33 2026
+
+@author: lenovo
+"""
+import os
+import time
+import weakref
+import threading
+import itertools
+import functools
+import tracemalloc
+from collections import deque
+
+import pandas as pd
+import numpy as np
+
+#设为1开启计时，设为memory同时用tracemalloc记录内存峰值
+ENV_VAR = 'FACTOR_ANALYSIS_PROFILE'
+#最多保留的记录条数，超过时丢弃最早的
+MAX_RECORDS = 100000
+
+_enabled = False
+_trace_memory = False
+_records = deque(maxlen = MAX_RECORDS)
+_local = threading.local()
+#owner对应的编号，不使用id()：对象被回收后id会被新对象重用
+_owner_tokens = weakref.WeakKeyDictionary()
+_next_token = itertools.count()
+
+def enable(memory = False):
+    '''
+    开启计时，memory为True时同时记录每个阶段的内存峰值，tracemalloc本身会让程序明显变慢
+    '''
+    global _enabled, _trace_memory
+    _enabled = True
+    _trace_memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def disable():
+    global _enabled, _trace_memory
+    _enabled = False
+    _trace_memory = False
+
+def is_enabled():
+    return _enabled
+
+def reset():
+    _records.clear()
+
+def _owner_token(owner, create = True):
+    '''
+    owner在这个进程中唯一的编号，不能弱引用的对象为None，不记录owner
+    '''
+    try:
+        token = _owner_tokens.get(owner)
+        if token is None and create:
+            token = _owner_tokens.setdefault(owner, next(_next_token))
+    except TypeError:
+        return None
+    return token
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+class stage:
+
+    def __init__(self, name, rows = None, owner = None):
+        '''
+        计时一个阶段，可以嵌套，没有开启时什么也不做
+        with profiling.stage('name') as s:
+            ...
+            s.rows = len(result)
+        owner: 记录所属的对象，例如SFPortfolio，为None时继承外层阶段的owner
+        '''
+        self.name = name
+        self.rows = rows
+        self._owner = owner
+        self._active = False
+
+    def __enter__(self):
+        if not _enabled:
+            return self
+        self._active = True
+        stack = _stack()
+        parent = stack[-1] if stack else None
+        self._parent = parent.name if parent is not None else None
+        self._owner_id = _owner_token(self._owner) if self._owner is not None else (parent._owner_id if parent is not None else None)
+        self._depth = len(stack)
+        self._memory = _trace_memory and tracemalloc.is_tracing()
+        if self._memory:
+            #外层阶段的峰值先记下来，再清零，内层阶段结束后再合并回外层
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None and parent._memory:
+                parent._peak = max(parent._peak, peak)
+            tracemalloc.reset_peak()
+            self._start_memory = current
+            self._peak = current
+        stack.append(self)
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        if not self._active:
+            return False
+        elapsed = time.perf_counter_ns() - self._start
+        stack = _stack()
+        stack.pop()
+        peak = np.nan
+        if self._memory:
+            self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            peak = self._peak - self._start_memory
+            parent = stack[-1] if stack else None
+            if parent is not None and parent._memory:
+                parent._peak = max(parent._peak, self._peak)
+            tracemalloc.reset_peak()
+        _records.append({'stage':self.name, 'parent':self._parent, 'depth':self._depth,
+                         'owner':self._owner_id, 'elapsed_ns':elapsed,
+                         'rows':self.rows, 'peak_memory':peak})
+        self._active = False
+        return False
+
+def _count_rows(value):
+    if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)):
+        return len(value)
+    return None
+
+def _default_rows(result, *args, **kwargs):
+    '''
+    结果的行数，结果不是表格时为第一个表格参数的行数
+    '''
+    rows = _count_rows(result)
+    if rows is None:
+        rows = next((_count_rows(arg) for arg in args if _count_rows(arg) is not None), None)
+    return rows
+
+def profiled(name = None, rows = None):
+    '''
+    函数或方法的计时装饰器，没有开启时只多一次全局变量判断
+    name: 阶段名称，默认为函数的__qualname__
+    rows: rows(result, *args, **kwargs)返回这个阶段处理的行数，默认见_default_rows
+    方法的第一个参数作为记录的owner
+    '''
+    count_rows = _default_rows if rows is None else rows
+    def decorator(function):
+        stage_name = function.__qualname__ if name is None else name
+        is_method = '.' in function.__qualname__ and '<locals>' not in function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with stage(stage_name, owner = args[0] if is_method and args else None) as record:
+                result = function(*args, **kwargs)
+                record.rows = count_rows(result, *args, **kwargs)
+            return result
+        return wrapper
+    return decorator
+
+def records(owner = None):
+    '''
+    每次调用一行的原始记录，owner不为None时只包含这个对象的阶段(以及在其中调用的函数)
+    '''
+    data = pd.DataFrame(list(_records), columns = ['stage', 'parent', 'depth', 'owner', 'elapsed_ns', 'rows', 'peak_memory'])
+    if owner is not None:
+        token = _owner_token(owner, create = False)
+        data = data[data['owner'] == token]
+    return data.reset_index(drop = True)
+
+def report(owner = None):
+    '''
+    按阶段汇总：调用次数、总时间、平均时间、最长时间(毫秒)、处理的行数、内存峰值(MB)，按总时间降序
+    '''
+    data = records(owner)
+    data['elapsed_ms'] = data['elapsed_ns'] / 1e6
+    data['rows'] = pd.to_numeric(data['rows'])
+    data['peak_memory'] = pd.to_numeric(data['peak_memory']) / 2 ** 20
+    grouped = data.groupby('stage', sort = False)
+    result = pd.DataFrame({'calls':grouped.size(),
+                           'total_ms':grouped['elapsed_ms'].sum(),
+                           'mean_ms':grouped['elapsed_ms'].mean(),
+                           'max_ms':grouped['elapsed_ms'].max(),
+                           'rows':grouped['rows'].sum(min_count = 1),
+                           'peak_memory_MB':grouped['peak_memory'].max()})
+    return result.sort_values('total_ms', ascending = False)
+
+_mode = os.environ.get(ENV_VAR, '').strip().lower()
+if _mode not in ('', '0', 'false', 'off'):
+    enable(memory = _mode == 'memory')
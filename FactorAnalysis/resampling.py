@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:26:08 2026
+
+@author: lenovo
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import numpy as np
+
+import ic_analysis
+import profiling
+
+#随机数流的编号，每一批用SeedSequence(seed, spawn_key = (流, 批次))，结果与进程数和同时检验的其他因子无关
+PERMUTATION_STREAM = 0
+BOOTSTRAP_STREAM = 1
+#检验的统计量，Rank_IC和IC用截面置换，long_short用分块自助法
+STATISTICS = ['Rank_IC', 'IC', 'long_short']
+
+def _generator(stream, batch, seed):
+    return np.random.Generator(np.random.PCG64(np.random.SeedSequence(seed, spawn_key = (stream, batch))))
+
+def _batches(n, batch_size):
+    '''
+    n次重抽样分成的(批次, 次数)，只由n和batch_size决定
+    '''
+    return [(batch, min(batch_size, n - start)) for batch, start in enumerate(range(0, n, batch_size))]
+
+def _standardize(values, segment_id, segment_num):
+    '''
+    每段内减去均值并除以平方和的平方根，两列标准化后的值的段内乘积之和就是相关系数
+    少于2行或方差为0的段无效，值记为0
+    '''
+    count = np.bincount(segment_id, minlength = segment_num)
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        centered = values - (np.bincount(segment_id, values, minlength = segment_num) / count)[segment_id]
+        norm = np.sqrt(np.bincount(segment_id, centered * centered, minlength = segment_num))
+        valid = (count >= 2) & (norm > 0)
+        result = np.where(valid[segment_id], centered / norm[segment_id], 0.0)
+    return result, valid
+
+def rank_data(factors, returns, exclude_zero = True):
+    '''
+    置换检验用的截面数据，排名只计算一次，之后每次置换只打乱因子在日期内的顺序
+    factors, returns: 索引为(code, date)且对齐的因子和收益，例如SFPortfolio._sub_data的factors和period_returns
+    exclude_zero: 与SFPortfolio的IC一样不使用收益为0的行
+    返回字典: factor/returns为按日期排序的有效行上标准化后的(排名, 值)两列，bounds为每个日期的起止行，
+    date_valid为可以计算IC的日期，IC为各日期的Rank_IC和IC，与ic_analysis.information_coefficients相同
+    '''
+    factor_values = np.asarray(factors, dtype = float)
+    return_values = np.asarray(returns, dtype = float)
+    date_id, dates = pd.factorize(factors.index.get_level_values('date'), sort = True)
+    date_num = len(dates)
+    valid = ~np.isnan(factor_values) & ~np.isnan(return_values)
+    if exclude_zero:
+        valid &= return_values != 0
+    factor_rank = ic_analysis._masked_rank(factor_values, date_id, valid, np.lexsort((factor_values, date_id)))
+    return_rank = ic_analysis._masked_rank(return_values, date_id, valid, np.lexsort((return_values, date_id)))
+
+    rows = np.flatnonzero(valid)
+    rows = rows[np.argsort(date_id[rows], kind = 'stable')]
+    segment_id = date_id[rows]
+    columns, date_valid = [], np.ones(date_num, dtype = bool)
+    for values in [factor_rank, factor_values, return_rank, return_values]:
+        values, segment_valid = _standardize(values[rows], segment_id, date_num)
+        columns.append(values)
+        date_valid &= segment_valid
+    factor = np.column_stack(columns[:2]) * date_valid[segment_id, None]
+    returns = np.column_stack(columns[2:]) * date_valid[segment_id, None]
+    IC = np.column_stack([np.bincount(segment_id, factor[:, i] * returns[:, i], minlength = date_num) for i in range(2)])
+    return {'dates':pd.DatetimeIndex(dates, name = 'date'), 'bounds':np.searchsorted(segment_id, np.arange(date_num + 1)),
+            'date_valid':date_valid, 'factor':factor, 'returns':returns, 'IC':IC}
+
+def _permutation_batches(data, batches, seed):
+    '''
+    每一批在每个日期内把因子的行顺序打乱size次，返回每次置换后Rank_IC和IC在各日期上的均值，size×2
+    同一次置换对排名和因子值使用相同的顺序
+    '''
+    factor, returns, bounds = data['factor'], data['returns'], data['bounds']
+    dates = np.flatnonzero(data['date_valid'])
+    result = []
+    for batch, size in batches:
+        rng = _generator(PERMUTATION_STREAM, batch, seed)
+        IC = np.zeros((size, 2))
+        for date in dates:
+            start, end = bounds[date], bounds[date + 1]
+            order = rng.permuted(np.broadcast_to(np.arange(end - start), (size, end - start)), axis = 1)
+            for i in range(2):
+                IC[:, i] += factor[start:end, i][order].dot(returns[start:end, i])
+        result.append(IC / max(len(dates), 1))
+    return np.concatenate(result) if result else np.zeros((0, 2))
+
+def _chunks(batches, chunks):
+    '''
+    各批按顺序分成chunks份连续的批次，依次合并的结果与不分份相同
+    '''
+    bounds = np.linspace(0, len(batches), min(chunks, len(batches)) + 1).round().astype(int)
+    return [batches[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+def _permutation_p_values(data, null):
+    observed = data['IC'][data['date_valid']].mean(axis = 0) if data['date_valid'].any() else np.full(2, np.nan)
+    p_values = (1 + (np.abs(null) >= np.abs(observed)).sum(axis = 0)) / (1 + len(null))
+    p_values[np.isnan(observed)] = np.nan
+    return observed, p_values, null
+
+def permutation_test(data, n_permutations = 1000, seed = 0, batch_size = 100):
+    '''
+    Rank_IC和IC均值的截面置换检验(双侧)，原假设为每个日期内因子与收益无关
+    data: rank_data的结果
+    返回(各统计量的观测值, 各统计量的p值, n_permutations×2的置换分布)，p值为(1 + 不小于观测值的次数) / (1 + n_permutations)
+    '''
+    return _permutation_p_values(data, _permutation_batches(data, _batches(n_permutations, batch_size), seed))
+
+def block_bootstrap(returns, n_bootstrap = 1000, block_length = None, seed = 0, batch_size = 100):
+    '''
+    收益序列均值为0的圆形分块自助法检验(双侧)，用t统计量，分块保留序列的自相关
+    returns: 例如SFPortfolio.returns['long_short']，缺失值去掉
+    block_length: 块长，默认为序列长度的立方根
+    返回(均值, p值, 原假设下的t统计量分布)
+    '''
+    values = np.asarray(pd.Series(returns).dropna(), dtype = float)
+    n = len(values)
+    if n < 2:
+        return (values.mean() if n else np.nan), np.nan, np.zeros(0)
+    block_length = max(1, int(round(n ** (1 / 3)))) if block_length is None else int(block_length)
+    block_num = -(-n // block_length)
+    mean = values.mean()
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        observed = mean / values.std(ddof = 1) * np.sqrt(n)
+        null = []
+        for batch, size in _batches(n_bootstrap, batch_size):
+            starts = _generator(BOOTSTRAP_STREAM, batch, seed).integers(0, n, size = (size, block_num))
+            index = ((starts[:, :, None] + np.arange(block_length)) % n).reshape(size, -1)[:, :n]
+            sample = values[index] - mean
+            null.append(sample.mean(axis = 1) / sample.std(axis = 1, ddof = 1) * np.sqrt(n))
+    null = np.concatenate(null) if null else np.zeros(0)
+    if np.isnan(observed):
+        return mean, np.nan, null
+    return mean, (1 + (np.abs(null) >= np.abs(observed)).sum()) / (1 + len(null)), null
+
+def fdr(p_values):
+    '''
+    Benjamini-Hochberg的q值，缺失的p值不计入检验个数，结果仍为缺失
+    '''
+    p = np.asarray(p_values, dtype = float)
+    q = np.full(p.shape, np.nan)
+    valid = np.flatnonzero(~np.isnan(p))
+    order = valid[np.argsort(p[valid], kind = 'stable')]
+    adjusted = p[order] * len(order) / np.arange(1, len(order) + 1)
+    q[order] = np.minimum(np.minimum.accumulate(adjusted[::-1])[::-1], 1)
+    if isinstance(p_values, pd.Series):
+        return pd.Series(q, index = p_values.index, name = p_values.name)
+    return q
+
+@profiling.profiled()
+def significance(portfolios, n_permutations = 1000, n_bootstrap = 1000, block_length = None, seed = 0,
+                 batch_size = 100, n_jobs = None):
+    '''
+    多个因子的Rank_IC、IC和多空收益的显著性，以及所有因子一起做多重检验校正后的q值
+    portfolios: {因子名: SFPortfolio}，使用各自_sub_data中的因子和period_returns，以及returns中的long_short
+    n_permutations: Rank_IC和IC的截面置换次数
+    n_bootstrap, block_length: long_short的分块自助法次数和块长，见block_bootstrap
+    seed: 随机数种子，相同的种子和batch_size结果相同，与n_jobs和同时检验的因子无关
+    n_jobs: 大于1时置换在进程池中并行，因子少时一个因子的各批也分到多个进程
+    返回每个因子一行的DataFrame，列为各统计量的观测值、p值(_p)和q值(_q)
+    '''
+    names = list(portfolios)
+    data = {name:rank_data(portfolio._sub_data['factors'], portfolio._sub_data['period_returns'])
+            for name, portfolio in portfolios.items()}
+    if n_jobs is not None and n_jobs > 1 and n_permutations > 0:
+        #先提交所有因子的所有份，再按批次顺序合并
+        chunks = _chunks(_batches(n_permutations, batch_size), -(-n_jobs // max(len(names), 1)))
+        with ProcessPoolExecutor(n_jobs) as executor:
+            futures = {name:[executor.submit(_permutation_batches, data[name], chunk, seed) for chunk in chunks] for name in names}
+            permutations = {name:_permutation_p_values(data[name], np.concatenate([future.result() for future in futures[name]]))
+                            for name in names}
+    else:
+        permutations = {name:permutation_test(data[name], n_permutations, seed, batch_size) for name in names}
+
+    rows = []
+    for name, portfolio in portfolios.items():
+        if portfolio._returns is None: portfolio._cal_returns()
+        observed, p_values, _ = permutations[name]
+        long_short, long_short_p, _ = block_bootstrap(portfolio._returns['long_short'], n_bootstrap, block_length, seed, batch_size)
+        rows.append([observed[0], p_values[0], observed[1], p_values[1], long_short, long_short_p])
+    result = pd.DataFrame(rows, index = pd.Index(names, name = 'factor'),
+                          columns = [column for statistic in STATISTICS for column in [statistic, statistic + '_p']])
+    for statistic in STATISTICS:
+        result.insert(result.columns.get_loc(statistic + '_p') + 1, statistic + '_q', fdr(result[statistic + '_p']))
+    return result
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 23:24:08 2026
+
+@author: lenovo
+"""
+import os
+import json
+import shutil
+import hashlib
+import threading
+import contextlib
+
+import pandas as pd
+import numpy as np
+
+#设为缓存目录开启磁盘缓存
+ENV_VAR = 'FACTOR_ANALYSIS_CACHE'
+#缓存目录的大小上限，按字节计
+MAX_BYTES = 4 << 30
+#计算方法改变、旧的缓存结果不再正确时加1
+CACHE_VERSION = 1
+META_FILE = 'meta.json'
+
+_cache = None
+_local = threading.local()
+
+class _Unsupported(Exception):
+    '''
+    结果中有不能按列保存的数据，这样的结果不缓存
+    '''
+
+def content_hash(*parts):
+    '''
+    输入内容的哈希，pandas对象按值、索引、列名和类型计算，numpy数组按字节，其余按repr
+    '''
+    hasher = hashlib.blake2b(digest_size = 20)
+    for part in parts:
+        if isinstance(part, (pd.Series, pd.DataFrame)):
+            hasher.update(repr((type(part).__name__, list(part.index.names), part.shape,
+                                list(pd.DataFrame(part).columns), list(pd.DataFrame(part).dtypes))).encode())
+            hasher.update(pd.util.hash_pandas_object(part, index = True).values.tobytes())
+        elif isinstance(part, np.ndarray):
+            hasher.update(repr((part.dtype.str, part.shape)).encode())
+            hasher.update(np.ascontiguousarray(part).tobytes())
+        elif isinstance(part, dict):
+            hasher.update(repr(sorted(part.items())).encode())
+        else:
+            hasher.update(repr(part).encode())
+    return hasher.hexdigest()
+
+def _label(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+def _save_values(values, path, file_name, files):
+    '''
+    一列保存为.npy，object列保存为整数编码和字符串字典，分类列保存它的编码和类别，不使用pickle
+    '''
+    if isinstance(values, pd.Categorical):
+        levels = _save_values(values.categories.values, path, file_name + '_categories', files)
+        np.save(os.path.join(path, file_name + '.npy'), values.codes)
+        files.append(file_name)
+        return {'file':file_name, 'encoded':False, 'categories':levels}
+    values = np.asarray(values)
+    if values.dtype == object:
+        codes, levels = pd.factorize(values)
+        if not all(isinstance(level, str) for level in levels):
+            raise _Unsupported()
+        np.save(os.path.join(path, file_name + '_levels.npy'), np.asarray(levels, dtype = str))
+        values = codes.astype(np.int32)
+        encoded = True
+    elif values.dtype.kind in 'biufcmM':
+        encoded = False
+    else:
+        raise _Unsupported()
+    np.save(os.path.join(path, file_name + '.npy'), values)
+    files.append(file_name)
+    return {'file':file_name, 'encoded':encoded}
+
+def _load_values(path, column):
+    values = np.load(os.path.join(path, column['file'] + '.npy'))
+    if 'categories' in column:
+        return pd.Categorical.from_codes(values, _load_values(path, column['categories']))
+    if column['encoded']:
+        levels = np.load(os.path.join(path, column['file'] + '_levels.npy')).astype(object)
+        values = pd.Categorical.from_codes(values, levels).astype(object)
+    return np.asarray(values)
+
+def _write(value, path):
+    '''
+    Series/DataFrame按列写成二进制文件，索引为MultiIndex时保存每层的字典和编码
+    '''
+    if not isinstance(value, (pd.Series, pd.DataFrame)):
+        raise _Unsupported()
+    frame = value.to_frame() if isinstance(value, pd.Series) else value
+    if isinstance(frame.columns, pd.MultiIndex):
+        raise _Unsupported()
+    files = []
+    meta = {'series':isinstance(value, pd.Series), 'name':_label(value.name) if isinstance(value, pd.Series) else None,
+            'columns':[_label(name) for name in frame.columns], 'columns_name':_label(frame.columns.name),
+            'columns_dtype':str(frame.columns.dtype), 'index_names':[_label(name) for name in frame.index.names]}
+    index = frame.index
+    if isinstance(index, pd.MultiIndex):
+        meta['index'] = [{'levels':_save_values(level, path, 'level_{}'.format(i), files),
+                          'codes':_save_values(codes.astype(np.int32), path, 'codes_{}'.format(i), files)}
+                         for i, (level, codes) in enumerate(zip(index.levels, index.codes))]
+    else:
+        meta['index'] = _save_values(index, path, 'index', files)
+    meta['data'] = [_save_values(column.values, path, 'column_{}'.format(i), files)
+                    for i, (name, column) in enumerate(frame.items())]
+    try:
+        text = json.dumps(meta)
+    except TypeError:
+        #列名等不能保存为JSON
+        raise _Unsupported()
+    with open(os.path.join(path, META_FILE), 'w') as f:
+        f.write(text)
+
+def _read(path):
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    if isinstance(meta['index'], list):
+        index = pd.MultiIndex(levels = [_load_values(path, level['levels']) for level in meta['index']],
+                              codes = [_load_values(path, level['codes']) for level in meta['index']],
+                              names = meta['index_names'], verify_integrity = False)
+    else:
+        index = pd.Index(_load_values(path, meta['index']), name = meta['index_names'][0])
+    columns = pd.Index(meta['columns'], dtype = meta['columns_dtype'], name = meta['columns_name'])
+    data = {i:_load_values(path, column) for i, column in enumerate(meta['data'])}
+    frame = pd.DataFrame(data, index = index)
+    frame.columns = columns
+    if meta['series']:
+        return frame.iloc[:, 0].rename(meta['name'])
+    return frame
+
+def _entry_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+class ResultCache:
+
+    def __init__(self, cache_dir, max_bytes = MAX_BYTES):
+        '''
+        按内容寻址的磁盘缓存，每个结果是cache_dir下以键命名的目录，各列为.npy文件
+        max_bytes: 目录的大小上限，超过时删除最久没有读写的结果，读写时间记录在meta.json的修改时间上，多次运行之间保留
+        hits/misses/writes/evictions记录这个对象的命中、未命中、写入和淘汰次数
+        '''
+        self._cache_dir = cache_dir
+        self._max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok = True)
+
+    def _path(self, key):
+        return os.path.join(self._cache_dir, key)
+
+    def get(self, key):
+        '''
+        没有这个键或者读取失败(例如正被其他进程淘汰)时返回None
+        '''
+        path = self._path(key)
+        try:
+            value = _read(path)
+            os.utime(os.path.join(path, META_FILE))
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        '''
+        先写到临时目录再改名，其他进程不会读到写了一半的结果；不能按列保存的结果不缓存，返回False
+        '''
+        path = self._path(key)
+        temp_path = '{}.tmp{}_{}'.format(path, os.getpid(), threading.get_ident())
+        os.makedirs(temp_path, exist_ok = True)
+        try:
+            _write(value, temp_path)
+            if _entry_size(temp_path) > self._max_bytes:
+                return False
+            os.rename(temp_path, path)
+        except _Unsupported:
+            return False
+        except OSError:
+            #其他进程已经写入了同一个键
+            return os.path.isdir(path)
+        finally:
+            shutil.rmtree(temp_path, ignore_errors = True)
+        self.writes += 1
+        self._evict()
+        return True
+
+    def _entries(self):
+        '''
+        [(最近读写时间, 大小, 路径)]，不含正在写入的临时目录
+        '''
+        entries = []
+        for entry in os.scandir(self._cache_dir):
+            meta_file = os.path.join(entry.path, META_FILE)
+            if entry.is_dir() and '.tmp' not in entry.name and os.path.isfile(meta_file):
+                entries.append((os.stat(meta_file).st_mtime, _entry_size(entry.path), entry.path))
+        return sorted(entries)
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self._max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors = True)
+            total -= size
+            self.evictions += 1
+
+    @property
+    def nbytes(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def stats(self):
+        entries = self._entries()
+        return {'hits':self.hits, 'misses':self.misses, 'writes':self.writes, 'evictions':self.evictions,
+                'entries':len(entries), 'bytes':sum(size for _, size, _ in entries)}
+
+    def clear(self):
+        for _, _, path in self._entries():
+            shutil.rmtree(path, ignore_errors = True)
+
+def enable(cache_dir, max_bytes = MAX_BYTES):
+    '''
+    开启磁盘缓存，返回ResultCache，可以用它的stats()查看命中情况
+    '''
+    global _cache
+    _cache = ResultCache(cache_dir, max_bytes)
+    return _cache
+
+def disable():
+    global _cache
+    _cache = None
+
+def get_cache():
+    '''
+    当前开启的缓存，没有开启或者在disabled()中时为None
+    '''
+    if getattr(_local, 'disabled', 0):
+        return None
+    return _cache
+
+@contextlib.contextmanager
+def disabled():
+    '''
+    在这个范围内不读写缓存，例如
+    with result_cache.disabled():
+        portfolio = SFPortfolio(...)
+    '''
+    _local.disabled = getattr(_local, 'disabled', 0) + 1
+    try:
+        yield
+    finally:
+        _local.disabled -= 1
+
+def cached(stage, parts, compute, use_cache = True):
+    '''
+    以stage和输入内容parts为键读取缓存，没有命中时调用compute()并写入缓存
+    use_cache: 为False时这一次调用不使用缓存
+    '''
+    cache = get_cache() if use_cache else None
+    if cache is None:
+        return compute()
+    key = content_hash(CACHE_VERSION, stage, *parts)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.put(key, value)
+    return value
+
+_cache_dir = os.environ.get(ENV_VAR, '').strip()
+if _cache_dir:
+    enable(_cache_dir)
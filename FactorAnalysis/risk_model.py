@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 16:05:12 2026
+
+@author: lenovo
+"""
+from collections.abc import Mapping
+
+import pandas as pd
+import numpy as np
+
+import cross_section
+import profiling
+
+def decay_rate(half_life):
+    '''
+    半衰期(交易日)对应的每日衰减系数，half_life为None时为1，即扩展窗口等权
+    '''
+    return 1.0 if half_life is None else 0.5 ** (1 / half_life)
+
+class FactorCovariance(Mapping):
+
+    def __init__(self, values, dates, factors):
+        '''
+        按日期的因子协方差，所有日期保存在一个连续的(日期×K×K)数组values中
+        可以像{date:因子协方差DataFrame}一样使用，例如作为utils.backtest_risk_models的factors_covariance_dict，
+        取一个日期时得到数组的视图，不复制
+        '''
+        self.values = np.ascontiguousarray(values)
+        self.dates = pd.DatetimeIndex(dates, name = 'date')
+        self.factors = pd.Index(factors)
+
+    def __getitem__(self, date):
+        position = self.dates.get_loc(pd.Timestamp(date))
+        return pd.DataFrame(self.values[position], index = self.factors, columns = self.factors)
+
+    def __iter__(self):
+        return iter(self.dates)
+
+    def __len__(self):
+        return len(self.dates)
+
+def _lagged(factors_expo, returns, lag):
+    '''
+    暴露的日期换成returns中之后第lag个日期，用前一个交易日收盘时已知的暴露解释当天的收益
+    '''
+    if lag == 0:
+        return factors_expo
+    return_dates = returns.index.get_level_values('date').unique().sort_values()
+    index = factors_expo.index
+    position = return_dates.searchsorted(index.get_level_values('date'), side = 'right') + lag - 1
+    keep = position < len(return_dates)
+    arrays = [return_dates[position[keep]] if name == 'date' else index.get_level_values(name)[keep] for name in index.names]
+    return pd.DataFrame(factors_expo.values[keep], index = pd.MultiIndex.from_arrays(arrays, names = index.names),
+                        columns = factors_expo.columns)
+
+@profiling.profiled()
+def factor_returns(returns, factors_expo, weights = None, lag = 1):
+    '''
+    逐日截面回归得到因子收益和特异收益，回归见cross_section.cross_sectional_regression，不含截距项
+    returns: 股票日收益，索引为(code, date)，例如hist_data['returns']
+    factors_expo: 因子暴露，索引为(code, date)、列为因子，与utils.backtest_risk_models相同
+    weights: 回归权重(最小化Σw·u²)，例如市值的平方根，为None时为普通最小二乘
+    lag: 用lag个交易日之前的暴露解释当天的收益，0为同一天
+    返回(因子收益: 日期×因子, 特异收益: 与returns索引相同，没有暴露或回归的行为NaN)
+    '''
+    X = _lagged(factors_expo, returns, lag).reindex(returns.index)
+    y = returns.astype(float)
+    if weights is None:
+        coef = cross_section.cross_sectional_regression(y, X)['coef']
+    else:
+        root = np.sqrt(weights.reindex(returns.index).astype(float))
+        coef = cross_section.cross_sectional_regression(y * root, X.mul(root, axis = 0))['coef']
+    position = coef.index.get_indexer(returns.index.get_level_values('date'))
+    row_coef = np.where(position[:, None] >= 0, coef.values[np.maximum(position, 0)], np.nan)
+    specific_returns = pd.Series(y.values - (X.values * row_coef).sum(axis = 1), index = returns.index, name = 'specific_returns')
+    return coef, specific_returns
+
+def _shrinkage_intensity(sample, A, B, C, W):
+    '''
+    Ledoit-Wolf的最优收缩强度min(b², d²) / d²，目标为trace / K倍单位阵
+    sample: 加权样本协方差，W为权重和；A、B、C为按权重平方累加的(x_i·x_j)²、x_i·x_j和观测个数，
+    b² = Σ_ij Σ_t w_t²(x_ti·x_tj - sample_ij)²，w_t为归一化的权重，等权时与Ledoit-Wolf(2004)相同
+    '''
+    mu = np.trace(sample) / len(sample)
+    d2 = ((sample - mu * np.eye(len(sample))) ** 2).sum()
+    if not d2 > 0:
+        return 0.0
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        b2 = np.nansum((A - 2 * B * sample + C * sample ** 2) / W ** 2)
+    return min(b2, d2) / d2
+
+def _shrink(covariance, intensity):
+    mu = np.trace(covariance) / len(covariance)
+    return intensity * mu * np.eye(len(covariance)) + (1 - intensity) * covariance
+
+def ledoit_wolf(returns):
+    '''
+    样本协方差(减去均值，除以n)按Ledoit-Wolf的最优强度向trace / K倍单位阵收缩
+    returns: 日期×资产，有缺失值的日期不使用
+    返回(收缩后的协方差, 收缩强度)
+    '''
+    returns = pd.DataFrame(returns).dropna()
+    x = returns.values - returns.values.mean(axis = 0)
+    n = len(x)
+    sample = x.T.dot(x) / n
+    intensity = _shrinkage_intensity(sample, (x ** 2).T.dot(x ** 2), x.T.dot(x), n, n)
+    return pd.DataFrame(_shrink(sample, intensity), index = returns.columns, columns = returns.columns), intensity
+
+@profiling.profiled()
+def ewma_covariance(factor_returns, half_life = 90, newey_west_lags = 0, shrinkage = False, min_periods = 20):
+    '''
+    逐日递推的指数加权因子协方差，每个日期只做O(K²)的更新，不重新估计整个窗口
+    与常见的风险模型一样不减去均值，权重和归一化，起始阶段没有偏差
+    factor_returns: 日期×因子，例如factor_returns的结果，缺失值只不参与对应因子对的估计，从未同时出现的因子对为NaN
+    half_life: 半衰期(交易日)，None为扩展窗口等权
+    newey_west_lags: Newey-West调整的滞后阶数，加上按Bartlett权重(1 - l / (lags + 1))的各阶指数加权自协方差
+    shrinkage: 为True时按Ledoit-Wolf的最优强度向trace / K倍单位阵收缩，强度由零阶的指数加权样本估计
+    min_periods: 至少有min_periods个有因子收益的日期之后才输出
+    返回FactorCovariance，只包含输出的日期
+    '''
+    values = factor_returns.values.astype(float)
+    date_num, K = values.shape
+    decay = decay_rate(half_life)
+    valid = ~np.isnan(values)
+    f = np.where(valid, values, 0.0)
+    #各阶滞后的加权交叉乘积和与权重和，S[l] = Σ w_t·f_t·f_{t-l}'
+    S = np.zeros((newey_west_lags + 1, K, K))
+    W = np.zeros((newey_west_lags + 1, K, K))
+    #Ledoit-Wolf需要的统计量，权重为衰减系数的平方
+    A, B, C = np.zeros((K, K)), np.zeros((K, K)), np.zeros((K, K))
+    result = np.empty((date_num, K, K))
+    output = np.zeros(date_num, dtype = bool)
+    count = 0
+    for t in range(date_num):
+        S *= decay
+        W *= decay
+        for lag in range(min(newey_west_lags, t) + 1):
+            S[lag] += np.outer(f[t], f[t - lag])
+            W[lag] += np.outer(valid[t], valid[t - lag])
+        if shrinkage:
+            product = np.outer(f[t], f[t])
+            A = decay ** 2 * A + product ** 2
+            B = decay ** 2 * B + product
+            C = decay ** 2 * C + np.outer(valid[t], valid[t])
+        count += valid[t].any()
+        if count < min_periods:
+            continue
+
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            sample = S[0] / W[0]
+        covariance = sample.copy()
+        for lag in range(1, newey_west_lags + 1):
+            gamma = np.divide(S[lag], W[lag], out = np.zeros((K, K)), where = W[lag] > 0)
+            covariance += (1 - lag / (newey_west_lags + 1)) * (gamma + gamma.T)
+        if shrinkage:
+            covariance = _shrink(covariance, _shrinkage_intensity(sample, A, B, C, W[0]))
+        result[t] = covariance
+        output[t] = True
+    return FactorCovariance(result[output], factor_returns.index[output], factor_returns.columns)
+
+@profiling.profiled()
+def ewma_specific_variance(specific_returns, half_life = 90, min_periods = 20):
+    '''
+    每只股票特异收益平方的指数加权均值，逐日递推，每个日期O(N)
+    specific_returns: 索引为(code, date)，例如factor_returns返回的特异收益
+    股票没有数据的日期照常衰减，已有的估计不变
+    返回与specific_returns索引相同的特异方差，有效观测少于min_periods的为NaN
+    '''
+    index = specific_returns.index
+    values = specific_returns.values.astype(float)
+    code_id, codes = pd.factorize(index.get_level_values('code'))
+    date_id, dates = pd.factorize(index.get_level_values('date'), sort = True)
+    order = np.argsort(date_id, kind = 'stable')
+    bounds = np.searchsorted(date_id[order], np.arange(len(dates) + 1))
+    decay = decay_rate(half_life)
+    S, W = np.zeros(len(codes)), np.zeros(len(codes))
+    count = np.zeros(len(codes), dtype = np.int64)
+    result = np.full(len(values), np.nan)
+    for date in range(len(dates)):
+        rows = order[bounds[date]:bounds[date + 1]]
+        S *= decay
+        W *= decay
+        valid = ~np.isnan(values[rows])
+        ids = code_id[rows[valid]]
+        S[ids] += values[rows[valid]] ** 2
+        W[ids] += 1
+        count[ids] += 1
+        ids = code_id[rows]
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            result[rows] = np.where(count[ids] >= min_periods, S[ids] / W[ids], np.nan)
+    return pd.Series(result, index = index, name = 'specific_variance')
+
+@profiling.profiled()
+def estimate(returns, factors_expo, weights = None, lag = 1, half_life = 90, specific_half_life = None,
+             newey_west_lags = 0, shrinkage = False, min_periods = 20):
+    '''
+    从截面回归开始估计风险模型，结果可以直接传给utils.backtest_risk_models:
+    backtest_risk_models(hist_data, factors_expo, model['factors_covariance'], model['specific_variance'], trade_date_list)
+    returns, factors_expo, weights, lag: 见factor_returns
+    half_life, newey_west_lags, shrinkage, min_periods: 见ewma_covariance
+    specific_half_life: 特异方差的半衰期，默认与half_life相同
+    返回字典: factor_returns为日期×因子的因子收益，specific_returns为特异收益，
+    factors_covariance为FactorCovariance，specific_variance为与returns索引相同的特异方差
+    '''
+    factor_return, specific_returns = factor_returns(returns, factors_expo, weights, lag)
+    specific_half_life = half_life if specific_half_life is None else specific_half_life
+    return {'factor_returns':factor_return, 'specific_returns':specific_returns,
+            'factors_covariance':ewma_covariance(factor_return, half_life, newey_west_lags, shrinkage, min_periods),
+            'specific_variance':ewma_specific_variance(specific_returns, specific_half_life, min_periods)}
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:36:52 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import numpy as np
+from pandas.api.types import is_categorical_dtype, is_float_dtype, is_integer_dtype
+
+#取值为少数几个整数的标记列，另外以is_开头的列(ST、新股、指数成分)也是标记列
+FLAG_COLUMNS = ['status', 'trade_status']
+#转为分类类型的列，其余object列也转为分类
+CATEGORY_COLUMNS = ['industry']
+
+def is_flag(name):
+    return name in FLAG_COLUMNS or str(name).startswith('is_')
+
+def compact_values(name, values, float32 = False):
+    '''
+    一列值(numpy数组或Categorical)转为紧凑的类型，规则与compact相同，不需要转换时返回values本身
+    panel_store读取时逐列转换，不需要先展开成默认类型的整张表
+    '''
+    if is_categorical_dtype(values.dtype):
+        return values
+    if name in CATEGORY_COLUMNS or values.dtype == object:
+        #类别数不超过127/32767时编码为int8/int16
+        return pd.Categorical(values)
+    if is_flag(name) and values.dtype.kind in 'biuf':
+        #有缺失值或者不是int8范围内的整数时保持原来的类型
+        if not np.isnan(values.astype(float)).any() and (values == values.astype(np.int8)).all():
+            return values.astype(np.int8)
+    if float32 and is_float_dtype(values.dtype):
+        return values.astype(np.float32)
+    return values
+
+def _compact_column(name, column, float32):
+    values = compact_values(name, column.values, float32)
+    if values is column.values:
+        return column
+    return pd.Series(values, index = column.index, name = column.name)
+
+def to_frame(columns, index):
+    '''
+    与pd.DataFrame(columns, index = index)相同，columns为{列名: 数组}
+    分类列和其他列一起传给DataFrame时会多出几倍于数据的临时内存，先构造其他列再逐个插入分类列
+    '''
+    names = list(columns)
+    categorical = [name for name in names if is_categorical_dtype(columns[name].dtype)]
+    others = [name for name in names if name not in categorical]
+    frame = pd.DataFrame({name:columns[name] for name in others}, index = index, columns = others)
+    for name in categorical:
+        frame.insert(names.index(name), name, columns[name])
+    return frame
+
+def compact(data, float32 = False):
+    '''
+    hist_data或因子面板转为紧凑的类型：行业等object列为分类(int8/int16编码)，标记列(is_ST、status、is_hs300等)为int8，
+    float32为True时浮点列(价格、收益率、因子)转为float32
+    索引中的股票代码和日期在MultiIndex中本来就是字典编码，不需要转换
+    返回新的Series/DataFrame，不修改data
+    '''
+    if isinstance(data, pd.Series):
+        return _compact_column(data.name, data, float32)
+    return to_frame({name:compact_values(name, column.values, float32) for name, column in data.items()}, data.index)
+
+def memory_usage(data):
+    '''
+    data占用的字节数，包括索引和object列中的字符串
+    '''
+    usage = data.memory_usage(index = True, deep = True)
+    return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+
+def _union_categories(columns):
+    categories = []
+    for column in columns:
+        if is_categorical_dtype(column.dtype):
+            categories.append(pd.Index(column.cat.categories))
+        else:
+            categories.append(pd.Index(column.dropna().unique()))
+    return categories[0].append(categories[1:]).unique() if len(categories) > 1 else categories[0]
+
+def _conform(column, dtype, categories):
+    '''
+    转为dtype，分类列使用合并后的类别；整数列有缺失值时不转换
+    '''
+    if categories is not None:
+        return column.astype(pd.CategoricalDtype(categories))
+    if column.dtype == dtype or (is_integer_dtype(dtype) and column.isna().any()):
+        return column
+    return column.astype(dtype)
+
+def concat(objs):
+    '''
+    与pd.concat相同，但保持第一部分的紧凑类型：分类列合并各部分的类别，其余列转为第一部分的类型，
+    pd.concat遇到类别不同的分类列会变成object、int8与int64会变成int64
+    '''
+    objs = [obj for obj in objs]
+    first = objs[0]
+    if isinstance(first, pd.Series):
+        categories = _union_categories(objs) if is_categorical_dtype(first.dtype) else None
+        return pd.concat([_conform(obj, first.dtype, categories) for obj in objs])
+    categories = {name:_union_categories([obj[name] for obj in objs if name in obj])
+                  for name, dtype in first.dtypes.items() if is_categorical_dtype(dtype)}
+    conformed = []
+    for obj in objs:
+        obj = obj.copy(deep = False)
+        for name, dtype in first.dtypes.items():
+            if name in obj:
+                obj[name] = _conform(obj[name], dtype, categories.get(name))
+        conformed.append(obj)
+    return pd.concat(conformed)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 13:05:44 2026
+
+@author: lenovo
+"""
+import numpy as np
+
+def segment_starts(*keys):
+    '''
+    已排序的键值发生变化的位置，即每一段的起点
+    '''
+    change = np.zeros(len(keys[0]), dtype = bool)
+    if len(change) == 0:
+        return np.flatnonzero(change)
+    change[0] = True
+    for key in keys:
+        change[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(change)
+
+def segment_id(starts, n):
+    '''
+    每一行所属的段编号
+    '''
+    segment = np.zeros(n, dtype = np.int64)
+    segment[starts[1:]] = 1
+    return np.cumsum(segment)
+
+def segment_length(starts, n):
+    return np.diff(np.append(starts, n))
+
+def chunk_bounds(starts, n, chunk_num):
+    '''
+    按段把已排序的行切成chunk_num块，同一段不会被拆开
+    '''
+    cut = np.linspace(0, len(starts), chunk_num + 1).astype(int)
+    bounds = np.append(starts, n)[cut]
+    return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+def segment_quantile(values, starts, q):
+    '''
+    values: (n×k)，行已按段排好，每段内逐列计算忽略NaN的分位数，插值方式与pandas的linear相同
+    返回(段数×k)
+    '''
+    n, k = values.shape
+    segment = segment_id(starts, n)
+    result = np.full((len(starts), k), np.nan)
+    for j in range(k):
+        column = values[:, j]
+        sorted_values = column[np.lexsort((column, segment))]
+        count = np.add.reduceat(~np.isnan(column), starts) if n else np.zeros(0, dtype = int)
+        has_value = count > 0
+        position = q * (count[has_value] - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, count[has_value] - 1)
+        lower_value = sorted_values[starts[has_value] + lower]
+        upper_value = sorted_values[starts[has_value] + upper]
+        result[has_value, j] = lower_value + (position - lower) * (upper_value - lower_value)
+    return result
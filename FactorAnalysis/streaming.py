@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:40:18 2026
+
+@author: lenovo
+"""
+from collections import deque
+
+import pandas as pd
+import numpy as np
+
+import segment
+import panel_store
+import turnover
+import profiling
+from SingleFactorAnalysis import SFPortfolio
+
+#CSV每次读取的行数
+CHUNK_ROWS = 1 << 20
+#PanelStore每次读取的日期数
+CHUNK_DATES = 20
+#流式计算需要的历史数据列，subset不为'all'时再加上subset
+HIST_COLUMNS = ['adj_close', 'returns', 'industry', 'market_value', 'is_ST', 'is_new_stock', 'status']
+#调仓日截面在算出period_returns之前需要保留的列，t值和换手率在调仓日当天就计算
+WINDOW_COLUMNS = ['adj_close', 'factors', 'period_returns', 'group']
+
+def _split_dates(data):
+    '''
+    把一块数据按日期拆开，日期升序，同一日期内保持原来的行顺序
+    '''
+    dates = data.index.get_level_values('date').values
+    order = np.argsort(dates, kind = 'mergesort')
+    bounds = np.append(segment.segment_starts(dates[order]), len(order))
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        yield pd.Timestamp(dates[order[start]]), data.iloc[order[start:end]]
+
+def _read_csv(file_path, columns, chunk_rows):
+    '''
+    分块读取按日期排好序的CSV，块末尾可能不完整的日期留到下一块
+    '''
+    usecols = None if columns is None else (lambda name:name in columns or name in ('code', 'date'))
+    rest = None
+    for chunk in pd.read_csv(file_path, usecols = usecols, chunksize = chunk_rows):
+        chunk['date'] = pd.to_datetime(chunk['date'])
+        chunk = chunk.set_index(['code', 'date'] if 'code' in chunk.columns else 'date')
+        if rest is not None:
+            chunk = pd.concat([rest, chunk])
+        dates = chunk.index.get_level_values('date')
+        if not dates.is_monotonic_increasing:
+            raise ValueError('CSV文件必须按日期排序: {}'.format(file_path))
+        complete = (dates < dates[-1])
+        yield from _split_dates(chunk[complete])
+        rest = chunk[~complete]
+    if rest is not None and len(rest):
+        yield from _split_dates(rest)
+
+def iter_dates(source, columns = None, chunk_rows = CHUNK_ROWS, chunk_dates = CHUNK_DATES):
+    '''
+    按日期顺序逐日产生(date, 当天的数据)，索引与utils.read_data相同
+    source: 索引包含date的DataFrame或Series、PanelStore或panel_store.write_panel写出的目录、按日期排好序的CSV文件
+    columns: 只读取这些列，只对PanelStore和CSV有效
+    CSV每次读取chunk_rows行，PanelStore每次读取chunk_dates个日期，内存中只有当前的一块
+    '''
+    if isinstance(source, (pd.DataFrame, pd.Series)):
+        yield from _split_dates(source)
+        return
+    if panel_store.is_panel_store(source):
+        source = panel_store.PanelStore(source)
+    if isinstance(source, panel_store.PanelStore):
+        dates = source.dates
+        for i in range(0, len(dates), chunk_dates):
+            end_date = dates[i + chunk_dates] if i + chunk_dates < len(dates) else None
+            yield from _split_dates(source.read(columns, dates[i], end_date))
+        return
+    yield from _read_csv(source, columns, chunk_rows)
+
+class _DateCursor:
+
+    def __init__(self, days):
+        '''
+        days: iter_dates的结果，只能向后移动，只保留当前日期的数据
+        '''
+        self._days = days
+        self._current = next(self._days, None)
+
+    def get(self, date):
+        '''
+        date当天的数据，跳过之前的日期，没有数据时为None
+        '''
+        while self._current is not None and self._current[0] < date:
+            self._current = next(self._days, None)
+        if self._current is not None and self._current[0] == date:
+            return self._current[1]
+        return None
+
+class StreamingSFPortfolio(SFPortfolio):
+
+    def __init__(self, factors, hist_data, only_rebalance_date = False,
+                 subset = 'all', preprocess = True, market_value_neutral = True,
+                 industry_neutral = True, fill_value = 'mean', group_num = 5,
+                 balance_time = '1M', weights = 'EW', select_from_industry = False,
+                 max_gap = 1, chunk_rows = CHUNK_ROWS, chunk_dates = CHUNK_DATES):
+        '''
+        SFPortfolio的流式版本，因子和历史数据按日期顺序分块读取，不复制整个面板
+        factors, hist_data: iter_dates支持的数据源，例如PanelStore目录或按日期排好序的CSV文件
+        max_gap: 调仓日的股票在之后连续max_gap个调仓日都没有数据时认为已经退市，period_returns为NaN，
+                 内存中最多保留max_gap + 2个调仓日的截面；之后又出现的股票SFPortfolio会用再次出现的价格计算，
+                 只有这种情况两者结果不同，None表示一直等到数据结束，结果总是相同但内存没有上界
+        chunk_rows, chunk_dates: 见iter_dates
+        其余参数与SFPortfolio相同，periods()遍历结束后returns、IC、statistics等与SFPortfolio相同，
+        不保存日度数据，因此没有daily_returns和holding_returns，也不能update
+        '''
+        self._factors = factors
+        self._hist_data = hist_data
+        self._balance_time = balance_time
+        self._weights = weights
+        self._subset = subset
+        self._group_num = group_num
+        self._market_neutral = market_value_neutral
+        self._industry_neutral = industry_neutral
+        self._fill_value = fill_value
+        self._preprocess = preprocess
+        self._only_rebalance_date = only_rebalance_date
+        self._select_from_industry = select_from_industry
+        self._low_memory = False
+        self._max_gap = max_gap
+        self._chunk_rows = chunk_rows
+        self._chunk_dates = chunk_dates
+
+        self._rebalance_date = None
+        for stage in self.STAGES:
+            setattr(self, stage, None)
+
+    def _iter_dates(self, source, columns):
+        return iter_dates(source, columns, self._chunk_rows, self._chunk_dates)
+
+    def _rebalance_days(self):
+        '''
+        逐个产生调仓日的(date, 历史数据, 因子数据)，与SFPortfolio._cal_rebalance_date相同：
+        每balance_time个交易日调仓一次，最后一个交易日也作为调仓日
+        '''
+        hist_columns = HIST_COLUMNS + ([self._subset] if self._subset != 'all' else [])
+        if self._only_rebalance_date:
+            hist_data = _DateCursor(self._iter_dates(self._hist_data, hist_columns))
+            for date, factors in self._iter_dates(self._factors, None):
+                yield date, hist_data.get(date), factors
+            return
+
+        factors = _DateCursor(self._iter_dates(self._factors, None))
+        last = None
+        for i, (date, hist_data) in enumerate(self._iter_dates(self._hist_data, hist_columns)):
+            if i % self._balance_time == 0:
+                yield date, hist_data, factors.get(date)
+                last = None
+            else:
+                last = (date, hist_data, factors.get(date))
+        if last is not None:
+            yield last
+
+    @profiling.profiled()
+    def _new_window(self, date, hist_data, factors):
+        '''
+        一个调仓日的截面：预处理、中性化、筛选股票，period_returns等到之后的调仓日再填入
+        '''
+        if hist_data is None or factors is None or len(factors) == 0:
+            return None
+        factors = self._process_factors(factors, hist_data)
+        data = self._select_stocks(hist_data.sort_index().assign(period_returns = np.nan), factors)
+        if len(data) == 0:
+            return None
+        data['group'] = self._cal_group(data)['group']
+        weights = None if self._weights == 'EW' else data['market_value']
+        t = self._cal_t_series(data)
+        return {'date':date, 'data':data[WINDOW_COLUMNS].copy(), 'holdings':turnover.holdings(data['group'], weights),
+                't':t.iloc[0] if len(t) else np.nan, 'unresolved':np.ones(len(data), dtype = bool), 'age':0}
+
+    def _resolve(self, window, hist_data):
+        '''
+        用这个调仓日的价格填入之前调仓日还没有下一次价格的股票的period_returns
+        '''
+        data = window['data']
+        rows = np.flatnonzero(window['unresolved'])
+        close = hist_data['adj_close'].droplevel('date')
+        position = close.index.get_indexer(data.index.get_level_values('code')[rows])
+        found = position >= 0
+        period_returns = data['period_returns'].values.copy()
+        period_returns[rows[found]] = close.values[position[found]] / data['adj_close'].values[rows[found]] - 1
+        data['period_returns'] = period_returns
+        window['unresolved'][rows[found]] = False
+
+    @profiling.profiled()
+    def _finish_window(self, window):
+        data = window['data']
+        returns = self._cal_group_returns(data)
+        IC = self._cal_IC(data)
+        return {'date':window['date'],
+                'returns':returns.iloc[0] if len(returns) else pd.Series(np.nan, index = returns.columns),
+                'IC':IC.iloc[0] if len(IC) else pd.Series(np.nan, index = IC.columns),
+                't':window['t'],
+                'turnover':window['turnover']}
+
+    def periods(self):
+        '''
+        逐个调仓日产生这一期的结果，每期在所有股票的period_returns确定之后产生，字典包含
+        date; returns: 各组收益，多空方向要到最后才能确定，所以不含long_short; IC: Rank_IC和IC;
+        t: 因子的t值; turnover: 各组相对该组上一个调仓日的换手率，没有上一期的组不包含在内
+        遍历结束后汇总成与SFPortfolio相同的returns、IC、t值和换手率
+        '''
+        rebalance_date, results, turnovers = [], [], []
+        pending = deque()
+        previous_holdings = None
+        for date, hist_data, factors in self._rebalance_days():
+            rebalance_date.append(date)
+            if hist_data is not None:
+                for window in pending:
+                    self._resolve(window, hist_data)
+                    window['age'] += 1
+            else:
+                for window in pending:
+                    window['age'] += 1
+
+            window = self._new_window(date, hist_data, factors)
+            if window is not None:
+                holdings = window.pop('holdings')
+                window['turnover'] = pd.Series(dtype = float)
+                if previous_holdings is not None:
+                    turn = turnover.group_turnover(pd.concat([previous_holdings, holdings]).sort_values('group', kind = 'mergesort', ignore_index = True))
+                    if len(turn):
+                        window['turnover'] = turn.iloc[-1].dropna()
+                        turnovers.append(turn.iloc[-1:])
+                    previous_holdings = previous_holdings[~previous_holdings['group'].isin(holdings['group'])]
+                previous_holdings = pd.concat([previous_holdings, holdings], ignore_index = True)
+                pending.append(window)
+
+            while pending and (not pending[0]['unresolved'].any() or
+                               (self._max_gap is not None and pending[0]['age'] > self._max_gap)):
+                result = self._finish_window(pending.popleft())
+                results.append(result)
+                yield result
+        while pending:
+            result = self._finish_window(pending.popleft())
+            results.append(result)
+            yield result
+
+        self._rebalance_date = pd.Series(rebalance_date)
+        dates = pd.DatetimeIndex([result['date'] for result in results], name = 'date')
+        self._IC_data = pd.DataFrame([result['IC'] for result in results], index = dates).dropna()
+        self._t_series = pd.Series([result['t'] for result in results], index = dates).dropna()
+        self._t_values = self._summarize_t_values(self._t_series)
+        returns = pd.DataFrame([result['returns'] for result in results], index = dates)
+        returns.columns.name = 'group'
+        self._returns = self._add_long_short(returns)
+        self._group_turnover = pd.concat(turnovers).sort_index(axis = 1) if turnovers else pd.DataFrame()
+
+    def _prepare_sub_data(self):
+        #调仓日的数据在periods()中按窗口计算，参数改变后下一次取结果时重新遍历
+        pass
+
+    def _run(self):
+        for _ in self.periods():
+            pass
+
+    def _cal_returns(self):
+        self._run()
+
+    def _IC(self):
+        self._run()
+
+    def _cal_t_values(self):
+        self._run()
+        return self._t_values
+
+    def group_turnover(self):
+        if self._group_turnover is None: self._run()
+        return self._group_turnover
+
+    #流式计算不保存日度数据和历史数据，这几个接口在这个类上不存在，而不是没有实现：
+    #日度收益是AttributeError(hasattr为False)，update是TypeError
+    @property
+    def daily_returns(self):
+        raise AttributeError('流式计算不保存日度数据，请使用SFPortfolio')
+
+    @property
+    def holding_returns(self):
+        raise AttributeError('流式计算不保存日度数据，请使用SFPortfolio')
+
+    def update(self, new_factors, new_hist_data):
+        raise TypeError('流式计算不保存历史数据，不能update，请重新遍历periods()')
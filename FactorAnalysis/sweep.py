@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:02:44 2026
+
+@author: lenovo
+"""
+import copy
+import inspect
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import pandas as pd
+import numpy as np
+
+from SingleFactorAnalysis import SFPortfolio
+
+#按参数影响的阶段划分，前一阶段相同的参数组合共享前一阶段的结果
+#调仓日 → 预处理 → 中性化
+DATA_PARAMS = ['balance_time', 'preprocess', 'fill_value', 'industry_neutral', 'market_value_neutral']
+#股票池，决定IC和t值
+UNIVERSE_PARAMS = ['subset']
+#排序分组，决定分组收益和换手率
+GROUP_PARAMS = ['group_num', 'select_from_industry']
+#只影响日度收益和换手率，同一分组的各个权重共用分组结果，只重新计算换手率
+OTHER_PARAMS = ['weights']
+SWEEP_PARAMS = DATA_PARAMS + UNIVERSE_PARAMS + GROUP_PARAMS + OTHER_PARAMS
+
+class SharedFrame:
+    '''
+    把DataFrame/Series的列和MultiIndex的编码放进共享内存，子进程按名字读取，不用pickle整个面板
+    object列保存为整数编码，分类列保存它的编码，编码对应的值和索引的levels随spec一起传给子进程
+    '''
+    def __init__(self, data):
+        self._blocks = []
+        self.spec = {'is_series':isinstance(data, pd.Series),
+                     'name':data.name if isinstance(data, pd.Series) else None,
+                     'index':self._share_index(data.index),
+                     'columns':[(name, self._share_column(column.values))
+                                for name, column in pd.DataFrame(data).items()]}
+
+    def _share(self, values):
+        values = np.ascontiguousarray(values)
+        block = shared_memory.SharedMemory(create = True, size = max(values.nbytes, 1))
+        np.ndarray(values.shape, dtype = values.dtype, buffer = block.buf)[:] = values
+        self._blocks.append(block)
+        return block.name, values.shape, values.dtype.str
+
+    def _share_column(self, values):
+        if isinstance(values, pd.Categorical):
+            return 'category', self._share(values.codes), values.categories
+        if values.dtype == object:
+            codes, uniques = pd.factorize(values)
+            return 'object', self._share(codes), np.asarray(uniques, dtype = object)
+        return 'array', self._share(values), None
+
+    def _share_index(self, index):
+        if isinstance(index, pd.MultiIndex):
+            return 'multi', list(index.names), list(index.levels), [self._share(codes) for codes in index.codes]
+        return 'single', index.name, self._share_column(index.values)
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def _read_shared(spec):
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name = name)
+    try:
+        return np.array(np.ndarray(shape, dtype = np.dtype(dtype), buffer = block.buf))
+    finally:
+        block.close()
+
+def _read_column(spec):
+    kind, values, uniques = spec
+    values = _read_shared(values)
+    if kind == 'object':
+        result = uniques[values.clip(min = 0)] if len(uniques) else np.full(len(values), np.nan, dtype = object)
+        result[values < 0] = np.nan
+        return result
+    if kind == 'category':
+        return pd.Categorical.from_codes(values, uniques)
+    return values
+
+def read_shared_frame(spec):
+    '''
+    从SharedFrame.spec复原DataFrame/Series
+    '''
+    if spec['index'][0] == 'multi':
+        _, names, levels, codes = spec['index']
+        index = pd.MultiIndex(levels = levels, codes = [_read_shared(c) for c in codes], names = names, verify_integrity = False)
+    else:
+        _, name, values = spec['index']
+        index = pd.Index(_read_column(values), name = name)
+    data = pd.DataFrame({name:_read_column(column) for name, column in spec['columns']}, index = index)
+    if spec['is_series']:
+        return data.iloc[:, 0].rename(spec['name'])
+    return data
+
+def _default_params():
+    signature = inspect.signature(SFPortfolio.__init__)
+    return {name:signature.parameters[name].default for name in SWEEP_PARAMS}
+
+def expand_grid(param_grid):
+    '''
+    param_grid: {参数名:取值列表}，没有给出的参数使用SFPortfolio的默认值
+    返回所有参数组合的列表
+    '''
+    unknown = set(param_grid) - set(SWEEP_PARAMS)
+    if unknown:
+        raise ValueError('不支持的参数: {}'.format(sorted(unknown)))
+    params = _default_params()
+    grid = {name:list(param_grid.get(name, [params[name]])) for name in SWEEP_PARAMS}
+    return [dict(zip(SWEEP_PARAMS, values)) for values in itertools.product(*grid.values())]
+
+def build_stage_graph(param_sets):
+    '''
+    把参数组合整理成阶段树：{数据阶段参数:{股票池:{分组参数:[参数组合]}}}
+    树上每个节点对应一个只计算一次的阶段，不同的数据阶段之间互不依赖
+    '''
+    graph = {}
+    for params in param_sets:
+        data_key = tuple(params[name] for name in DATA_PARAMS)
+        group_key = tuple(params[name] for name in GROUP_PARAMS)
+        universe = graph.setdefault(data_key, {}).setdefault(params['subset'], {})
+        universe.setdefault(group_key, []).append(params)
+    return graph
+
+def _derive(portfolio, **attributes):
+    '''
+    浅拷贝一个SFPortfolio并替换部分属性，上游阶段的结果直接共用，受影响的下游阶段失效
+    '''
+    return copy.copy(portfolio)._assign(**attributes)
+
+def _run_data_stage(factors, hist_data, data_key, universes, only_rebalance_date):
+    '''
+    一个数据阶段：调仓日、预处理、中性化只做一次，之后依次计算各股票池和分组
+    '''
+    data_params = dict(zip(DATA_PARAMS, data_key))
+    base = SFPortfolio(factors, hist_data, only_rebalance_date = only_rebalance_date, subset = 'all', **data_params)
+    results = []
+    for subset, groups in universes.items():
+        sub_data = base._sub_data if subset == 'all' else base._sub_data[base._sub_data[subset] == 1]
+        universe = _derive(base, _subset = subset, _sub_data = sub_data)
+        universe._IC()
+        universe.t_values()
+        for group_key, param_sets in groups.items():
+            group_params = dict(zip(GROUP_PARAMS, group_key))
+            portfolio = _derive(universe, _group_num = group_params['group_num'],
+                                _select_from_industry = group_params['select_from_industry'])
+            portfolio._cal_returns()
+            for params in param_sets:
+                results.append((params, _derive(portfolio, _weights = params['weights']).statistics()))
+    return results
+
+def _run_shared_data_stage(factors_spec, hist_data_spec, data_key, universes, only_rebalance_date):
+    return _run_data_stage(read_shared_frame(factors_spec), read_shared_frame(hist_data_spec),
+                           data_key, universes, only_rebalance_date)
+
+def sweep(factors, hist_data, param_grid, only_rebalance_date = False, n_jobs = None):
+    '''
+    对SFPortfolio的参数组合做网格搜索
+    factors, hist_data, only_rebalance_date: 与SFPortfolio相同
+    param_grid: {参数名:取值列表}，参数名见SWEEP_PARAMS
+    n_jobs: 大于1时不同的数据阶段在进程池中并行，面板通过共享内存传给子进程
+    返回每个参数组合一行、列为summary统计量的DataFrame，索引为参数
+    '''
+    param_sets = expand_grid(param_grid)
+    graph = build_stage_graph(param_sets)
+
+    if n_jobs is not None and n_jobs > 1 and len(graph) > 1:
+        with SharedFrame(factors) as shared_factors, SharedFrame(hist_data) as shared_hist_data:
+            with ProcessPoolExecutor(min(n_jobs, len(graph))) as executor:
+                futures = [executor.submit(_run_shared_data_stage, shared_factors.spec, shared_hist_data.spec,
+                                           data_key, universes, only_rebalance_date)
+                           for data_key, universes in graph.items()]
+                results = [result for future in futures for result in future.result()]
+    else:
+        results = [result for data_key, universes in graph.items()
+                   for result in _run_data_stage(factors, hist_data, data_key, universes, only_rebalance_date)]
+
+    #按param_grid展开的顺序排列
+    keys = [tuple(params[name] for name in SWEEP_PARAMS) for params in param_sets]
+    statistics = dict((tuple(params[name] for name in SWEEP_PARAMS), statistics) for params, statistics in results)
+    statistics = pd.DataFrame([statistics[key] for key in keys])
+    statistics.index = pd.MultiIndex.from_tuples(keys, names = SWEEP_PARAMS)
+    return statistics
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 11:40:52 2026
+
+@author: lenovo
+"""
+import os
+
+import pandas as pd
+import numpy as np
+
+TRADE_DATE_SQL = 'select date from trading_calendar where is_trading_day = 1 order by date'
+
+class TradingCalendar:
+
+    def __init__(self, dates, cache_path = None, loader = None):
+        '''
+        dates: 交易日序列，内部保存为排好序的datetime64数组
+        cache_path: 本地缓存文件(.npy)
+        loader: 刷新时重新读取交易日的函数
+        '''
+        dates = pd.DatetimeIndex(pd.to_datetime(dates)).unique().sort_values()
+        self._dates = dates.values.astype('datetime64[ns]')
+        self._cache_path = cache_path
+        self._loader = loader
+
+    @classmethod
+    def from_sql(cls, engine = None, cache_path = None):
+        '''
+        从数据库读取，engine为None时使用utils中的行情数据库
+        '''
+        def loader():
+            con = engine
+            if con is None:
+                import utils
+                con = utils.get_market_engine()
+            return pd.read_sql(TRADE_DATE_SQL, con = con)['date']
+        return cls.load(loader, cache_path)
+
+    @classmethod
+    def from_csv(cls, file_path, cache_path = None):
+        return cls.load(lambda:_select_trading_day(pd.read_csv(file_path)), cache_path)
+
+    @classmethod
+    def from_parquet(cls, file_path, cache_path = None):
+        return cls.load(lambda:_select_trading_day(pd.read_parquet(file_path)), cache_path)
+
+    @classmethod
+    def load(cls, loader, cache_path = None):
+        '''
+        有缓存时直接读缓存，否则调用loader并写缓存
+        '''
+        if cache_path is not None and os.path.isfile(cache_path):
+            return cls(np.load(cache_path), cache_path = cache_path, loader = loader)
+        calendar = cls(loader(), cache_path = cache_path, loader = loader)
+        calendar.save()
+        return calendar
+
+    def save(self, cache_path = None):
+        cache_path = cache_path if cache_path is not None else self._cache_path
+        if cache_path is None:
+            return
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok = True)
+        np.save(cache_path, self._dates)
+
+    def refresh(self):
+        '''
+        重新从数据源读取交易日并覆盖缓存
+        '''
+        if self._loader is None:
+            raise ValueError('没有可以刷新的数据源')
+        self._dates = TradingCalendar(self._loader())._dates
+        self.save()
+        return self
+
+    @property
+    def dates(self):
+        return pd.DatetimeIndex(self._dates, name = 'date')
+
+    def __len__(self):
+        return len(self._dates)
+
+    def _to_array(self, dates):
+        return np.atleast_1d(pd.to_datetime(dates).values.astype('datetime64[ns]') if np.ndim(dates) else np.datetime64(pd.Timestamp(dates), 'ns'))
+
+    def _result(self, values, dates):
+        if np.ndim(dates) == 0:
+            return pd.Timestamp(values[0])
+        return pd.DatetimeIndex(values, name = 'date')
+
+    def is_trading_day(self, dates):
+        values = self._to_array(dates)
+        position = np.searchsorted(self._dates, values).clip(max = len(self._dates) - 1)
+        result = self._dates[position] == values
+        return bool(result[0]) if np.ndim(dates) == 0 else result
+
+    def offset(self, dates, n):
+        '''
+        交易日dates之后第n个交易日，n为负数时为之前的交易日
+        '''
+        values = self._to_array(dates)
+        is_trading_day = self.is_trading_day(values)
+        if not is_trading_day.all():
+            raise ValueError('{}不是交易日'.format(pd.Timestamp(values[~is_trading_day][0])))
+        position = np.searchsorted(self._dates, values) + n
+        if (position < 0).any() or (position >= len(self._dates)).any():
+            raise ValueError('超出交易日历的范围')
+        return self._result(self._dates[position], dates)
+
+    def next_trading_day(self, dates):
+        '''
+        严格晚于dates的第一个交易日
+        '''
+        values = self._to_array(dates)
+        position = np.searchsorted(self._dates, values, side = 'right')
+        if (position >= len(self._dates)).any():
+            raise ValueError('超出交易日历的范围')
+        return self._result(self._dates[position], dates)
+
+    def previous_trading_day(self, dates):
+        '''
+        严格早于dates的最后一个交易日
+        '''
+        values = self._to_array(dates)
+        position = np.searchsorted(self._dates, values, side = 'left') - 1
+        if (position < 0).any():
+            raise ValueError('超出交易日历的范围')
+        return self._result(self._dates[position], dates)
+
+    def range(self, start_date, end_date):
+        '''
+        [start_date, end_date]之间的交易日
+        '''
+        start = np.searchsorted(self._dates, np.datetime64(pd.Timestamp(start_date), 'ns'), side = 'left')
+        end = np.searchsorted(self._dates, np.datetime64(pd.Timestamp(end_date), 'ns'), side = 'right')
+        return pd.DatetimeIndex(self._dates[start:end], name = 'date')
+
+def _select_trading_day(data):
+    if 'is_trading_day' in data.columns:
+        data = data[data['is_trading_day'] == 1]
+    return data['date']
+
+_default_calendar = None
+
+def get_default_calendar():
+    '''
+    进程内只从数据库读取一次交易日
+    '''
+    global _default_calendar
+    if _default_calendar is None:
+        _default_calendar = TradingCalendar.from_sql(cache_path = os.environ.get('TRADING_CALENDAR_CACHE'))
+    return _default_calendar
+
+def set_default_calendar(calendar):
+    '''
+    替换默认交易日历，例如离线时使用TradingCalendar.from_csv
+    '''
+    global _default_calendar
+    _default_calendar = calendar
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:05:12 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import numpy as np
+
+import segment
+
+def _level_codes(index, name, rows):
+    '''
+    索引某一层在rows上的整数编码和取值，编码的顺序与取值的大小顺序一致
+    MultiIndex直接使用已有的编码，不重新对字符串做哈希
+    '''
+    if isinstance(index, pd.MultiIndex):
+        level = index.names.index(name)
+        levels = index.levels[level]
+        rank = np.empty(len(levels), dtype = np.int64)
+        rank[np.argsort(levels.values, kind = 'mergesort')] = np.arange(len(levels))
+        return rank[index.codes[level][rows]], levels.sort_values()
+    return pd.factorize(index.get_level_values(name)[rows], sort = True)
+
+def holdings(group, weights = None):
+    '''
+    把组号整理成按(group, date, code)排好序的长表持仓
+    group: 调仓日每只股票的组号，索引为(code, date)，缺失或不大于0的行不持有
+    weights: 与group对齐的权重基数，例如市值，为None时等权，缺失的行不持有
+    返回列为group, date, code, weight的DataFrame，每个(date, group)内权重之和为1
+    '''
+    group = pd.Series(group)
+    values = group.values.astype(float)
+    weight = np.ones(len(values)) if weights is None else pd.Series(weights).reindex(group.index).values.astype(float)
+    held = np.flatnonzero(~np.isnan(values) & (values > 0) & ~np.isnan(weight))
+    date_id, dates = _level_codes(group.index, 'date', held)
+    code_id, codes = _level_codes(group.index, 'code', held)
+    values = values[held].astype(np.int64)
+    order = np.argsort((values * len(dates) + date_id) * len(codes) + code_id)
+    data = pd.DataFrame({'group':values[order], 'date':dates[date_id[order]],
+                         'code':codes[code_id[order]], 'weight':weight[held][order]})
+    starts = segment.segment_starts(data['group'].values, date_id[order])
+    data['weight'] /= np.add.reduceat(data['weight'].values, starts)[segment.segment_id(starts, len(data))] if len(data) else 1
+    return data
+
+def group_turnover(data):
+    '''
+    每组相邻两个调仓日之间的换手率：新旧权重之差的绝对值之和的一半
+    data: holdings的结果，每组的上一个调仓日为该组上一个有持仓的日期
+    (组, 调仓日, 股票)编码成排好序的整数键，上一期的持仓把调仓日后移一期，
+    两个有序数组用二分查找做归并连接，不展开成日期×股票的宽表
+    返回date×group的DataFrame，每组第一个调仓日没有上一期，不包含在内
+    '''
+    n = len(data)
+    group = data['group'].values
+    starts = segment.segment_starts(group, data['date'].values)
+    period = segment.segment_id(starts, n)
+    code_id, codes = pd.factorize(data['code'].values, sort = True)
+    weight = data['weight'].values
+    key = period * len(codes) + code_id
+
+    #上一期的每只股票对应到同组的下一个调仓日，每组最后一个调仓日的持仓没有下一期
+    has_next = np.append(group[starts[1:]] == group[starts[:-1]], False)[period]
+    previous_key = key[has_next] + len(codes)
+    previous_weight = weight[has_next]
+    position = np.minimum(np.searchsorted(key, previous_key), max(n - 1, 0))
+    matched = key[position] == previous_key if n else np.zeros(0, dtype = bool)
+
+    diff = weight.copy()
+    diff[position[matched]] -= previous_weight[matched]
+    turn = np.bincount(period, np.abs(diff), minlength = len(starts))
+    turn += np.bincount(period[has_next][~matched] + 1, previous_weight[~matched], minlength = len(starts))
+    turn /= 2
+
+    is_first = np.append(True, group[starts[1:]] != group[starts[:-1]]) if len(starts) else np.zeros(0, dtype = bool)
+    turn = pd.Series(turn[~is_first], index = pd.MultiIndex.from_arrays(
+        [data['date'].values[starts[~is_first]], group[starts[~is_first]]], names = ['date', 'group']))
+    return turn.unstack('group').sort_index()
+
+def annual_periods(rebalance_date):
+    '''
+    按实际的调仓间隔计算每年的调仓次数，而不是假设固定的频率
+    '''
+    rebalance_date = pd.DatetimeIndex(rebalance_date).sort_values()
+    if len(rebalance_date) < 2:
+        return np.nan
+    return 365.25 / ((rebalance_date[-1] - rebalance_date[0]).days / (len(rebalance_date) - 1))
+
+def long_short_turnover(turn, group_num, rebalance_date):
+    '''
+    第1组与最后一组每期换手率之和的均值，按annual_periods年化
+    某一组没有股票的调仓日不计入，第1组或最后一组从来没有股票时(例如按行业分组、行业内只有一只股票)为NaN
+    '''
+    turn = turn.reindex(columns = range(1, group_num + 1))
+    return (turn[1] + turn[group_num]).mean() * annual_periods(rebalance_date)
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 20:45:27 2026
+
+@author: lenovo
+
+基准测试：synthetic生成合成面板，run运行各项基准并保存为JSON，bench_*为单项的新旧实现对比
+"""
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 18:20:41 2026
+
+@author: lenovo
+
+groupby(...).rank(pct = True)分组与bucketing.bucket_factors的速度对比
+python benchmarks/bench_bucketing.py --dates 500 --stocks 4000 --factors 10 --group_num 10
+"""
+import os
+import sys
+import time
+import argparse
+
+import pandas as pd
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'FactorAnalysis'))
+import bucketing
+import synthetic
+
+def make_data(date_num, stock_num, factor_num, seed = 0):
+    hist_data, factors = synthetic.make_panel(stock_num, date_num, factor_num, seed = seed)
+    return factors, hist_data['industry']
+
+def pandas_groups(factors, group_num, industry = None):
+    keys = factors.index.get_level_values('date')
+    if industry is not None:
+        keys = [keys, industry.values]
+    group = factors.groupby(keys).rank(pct = True) * 100 // (100 // group_num) + 1
+    return group.mask(group == group_num + 1, group_num)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dates', type = int, default = 500)
+    parser.add_argument('--stocks', type = int, default = 4000)
+    parser.add_argument('--factors', type = int, default = 10)
+    parser.add_argument('--group_num', type = int, default = 10)
+    parser.add_argument('--n_jobs', type = int, default = None)
+    args = parser.parse_args()
+
+    factors, industry = make_data(args.dates, args.stocks, args.factors)
+    print('dates: {}, stocks: {}, factors: {}, group_num: {}'.format(args.dates, args.stocks, args.factors, args.group_num))
+    for name, by in [('date', None), ('date-industry', industry)]:
+        start = time.perf_counter()
+        expected = pandas_groups(factors, args.group_num, by)
+        pandas_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        groups = bucketing.bucket_factors(factors, args.group_num, by = by, method = 'percent', n_jobs = args.n_jobs)
+        kernel_time = time.perf_counter() - start
+
+        same = (expected.fillna(0).values == groups.values).all()
+        print('{}: pandas: {:.2f}s, bucketing: {:.2f}s, speedup: {:.1f}x, same groups: {}, memory: {:.0f}MB -> {:.0f}MB'.format(
+              name, pandas_time, kernel_time, pandas_time / kernel_time, same,
+              expected.values.nbytes / 2 ** 20, groups.values.nbytes / 2 ** 20))
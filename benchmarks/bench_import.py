@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:48:06 2026
+
+@author: lenovo
+
+在新的解释器中冷启动导入核心模块的耗时，超过预算或导入了可选依赖时返回非零
+python benchmarks/bench_import.py --budget 1.0 --repeat 5
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+FACTOR_ANALYSIS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'FactorAnalysis')
+#只计算IC和分组收益时需要的模块
+CORE_MODULES = ['utils', 'SingleFactorAnalysis', 'MultiFactorAnalysis']
+#只在第一次使用时才导入的依赖
+LAZY_MODULES = ['matplotlib', 'statsmodels', 'cvxopt', 'sqlalchemy', 'pymysql']
+
+CHILD_CODE = '''
+import sys, time, json
+start = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'elapsed':elapsed, 'loaded':sorted(set(name.split('.')[0] for name in sys.modules) & set({lazy}))}}))
+'''
+
+def cold_import(modules = CORE_MODULES):
+    '''
+    在新的解释器中导入modules，返回(耗时, 导入了的可选依赖)
+    '''
+    code = CHILD_CODE.format(imports = '\n'.join('import ' + name for name in modules), lazy = LAZY_MODULES)
+    env = dict(os.environ, PYTHONPATH = FACTOR_ANALYSIS_PATH + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    output = subprocess.check_output([sys.executable, '-c', code], env = env)
+    result = json.loads(output.decode().strip().splitlines()[-1])
+    return result['elapsed'], result['loaded']
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--budget', type = float, default = 1.0, help = '允许的最长导入时间(秒)')
+    parser.add_argument('--repeat', type = int, default = 5)
+    args = parser.parse_args()
+
+    #第一次运行包含.pyc编译和文件系统缓存，取多次中的最小值
+    results = [cold_import() for _ in range(args.repeat)]
+    elapsed = min(result[0] for result in results)
+    loaded = sorted(set(name for result in results for name in result[1]))
+    print('import {}: {:.3f}s (budget {:.3f}s)'.format(', '.join(CORE_MODULES), elapsed, args.budget))
+    if loaded:
+        print('optional dependencies imported eagerly: {}'.format(', '.join(loaded)))
+    if elapsed > args.budget or loaded:
+        sys.exit(1)
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 10:18:40 2026
+
+@author: lenovo
+
+默认类型与schema.compact的紧凑类型下，读取面板并完成SFPortfolio全部计算的峰值内存(RSS)
+日度收益用low_memory逐个调仓区间计算，峰值由数据本身决定
+默认规模约为全市场10年的日度数据
+python benchmarks/bench_memory.py --stocks 4000 --dates 2500
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+FACTOR_ANALYSIS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'FactorAnalysis')
+sys.path.insert(0, FACTOR_ANALYSIS_PATH)
+import panel_store
+import synthetic
+
+MODES = {'default':{'compact':False, 'float32':False},
+         'compact':{'compact':True, 'float32':False},
+         'compact_float32':{'compact':True, 'float32':True}}
+
+#每种类型在新的进程中运行，峰值RSS互不影响
+CHILD_CODE = '''
+import os, sys, time, json, resource
+import utils, schema
+
+def peak_rss():
+    #Linux下ru_maxrss会继承父进程(生成数据的进程)的峰值，VmHWM在exec后重新计算
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+from SingleFactorAnalysis import SFPortfolio
+start = time.perf_counter()
+hist_data = utils.read_data({hist_path!r}, compact = {compact}, float32 = {float32})
+factors = utils.read_data({factors_path!r}, compact = {compact}, float32 = {float32})['factor_0']
+data_bytes = schema.memory_usage(hist_data) + schema.memory_usage(factors)
+portfolio = SFPortfolio(factors, hist_data, balance_time = 20, low_memory = True)
+statistics = portfolio.statistics()
+portfolio.daily_returns
+portfolio.holding_returns
+elapsed = time.perf_counter() - start
+print(json.dumps({{'data_bytes':data_bytes, 'peak_rss':peak_rss(), 'elapsed':elapsed, 'statistics':statistics.to_dict()}}))
+'''
+
+def measure(hist_path, factors_path, compact, float32):
+    code = CHILD_CODE.format(hist_path = hist_path, factors_path = factors_path, compact = compact, float32 = float32)
+    env = dict(os.environ, PYTHONPATH = FACTOR_ANALYSIS_PATH + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    output = subprocess.check_output([sys.executable, '-c', code], env = env)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+def write_stores(stock_num, date_num, seed, work_path):
+    '''
+    合成面板写成PanelStore，子进程直接读取，生成数据本身的内存不计入峰值
+    '''
+    hist_data, factors = synthetic.make_panel(stock_num, date_num, seed = seed)
+    hist_path, factors_path = os.path.join(work_path, 'hist_data'), os.path.join(work_path, 'factors')
+    panel_store.write_panel(hist_data, hist_path)
+    panel_store.write_panel(factors, factors_path)
+    return hist_path, factors_path, len(hist_data)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stocks', type = int, default = 4000)
+    parser.add_argument('--dates', type = int, default = 2500)
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--output', default = None, help = '结果写成JSON文件')
+    args = parser.parse_args()
+
+    work_path = tempfile.mkdtemp(prefix = 'factor_memory_')
+    try:
+        hist_path, factors_path, rows = write_stores(args.stocks, args.dates, args.seed, work_path)
+        results = {mode:measure(hist_path, factors_path, **params) for mode, params in MODES.items()}
+    finally:
+        shutil.rmtree(work_path, ignore_errors = True)
+
+    print('stocks: {}, dates: {}, rows: {}'.format(args.stocks, args.dates, rows))
+    base = results['default']
+    for mode, result in results.items():
+        difference = max(abs(result['statistics'][name] - value) for name, value in base['statistics'].items())
+        print('{:<16} data: {:7.0f}MB  peak RSS: {:7.0f}MB ({:+.0%})  time: {:6.1f}s  max statistics diff: {:.1e}'.format(
+              mode, result['data_bytes'] / 2 ** 20, result['peak_rss'] / 2 ** 20,
+              result['peak_rss'] / base['peak_rss'] - 1, result['elapsed'], difference))
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump({'stocks':args.stocks, 'dates':args.dates, 'rows':rows, 'results':results}, f, indent = 2)
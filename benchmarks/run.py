@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:02:51 2026
+
+@author: lenovo
+
+在合成面板上运行各项基准，结果保存为JSON，并可以与之前保存的基准结果比较
+python benchmarks/run.py --stocks 1000 --dates 500 --output results.json
+python benchmarks/run.py --baseline results.json --output new.json --threshold 1.1
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from collections import OrderedDict
+
+import pandas as pd
+import numpy as np
+from cvxopt import solvers
+
+BENCHMARK_PATH = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_PATH, '..', 'FactorAnalysis'))
+sys.path.insert(0, BENCHMARK_PATH)
+import synthetic
+import utils
+import risk_model
+from SingleFactorAnalysis import SFPortfolio
+
+CASES = OrderedDict()
+
+def case(name):
+    '''
+    注册一个基准：被装饰的函数接收准备好的数据，返回一个无参数的函数，只有这个函数计时
+    '''
+    def decorator(setup):
+        CASES[name] = setup
+        return setup
+    return decorator
+
+def prepare(stock_num, date_num, factor_num, balance_time, seed, work_path):
+    hist_data, factors = synthetic.make_panel(stock_num, date_num, factor_num, seed = seed)
+    portfolio = SFPortfolio(factors.iloc[:, 0], hist_data, balance_time = balance_time)
+    portfolio._cal_returns()
+    return {'hist_data':hist_data, 'factors':factors, 'portfolio':portfolio,
+            'balance_time':balance_time, 'seed':seed, 'work_path':work_path}
+
+@case('read_data')
+def read_data_case(data):
+    file_path = os.path.join(data['work_path'], 'hist_data.csv')
+    data['hist_data'].to_csv(file_path)
+    return lambda:utils.read_data(file_path)
+
+@case('preprocess')
+def preprocess_case(data):
+    factors = data['factors'].iloc[:, 0]
+    return lambda:utils.preprocess(factors, factors.name, data['hist_data'])
+
+@case('industry_market_value_neutral')
+def neutral_case(data):
+    factors = data['factors'].iloc[:, 0]
+    return lambda:utils.industry_market_value_neutral(factors, data['hist_data'])
+
+@case('_rank_and_divide')
+def rank_and_divide_case(data):
+    return data['portfolio']._rank_and_divide
+
+@case('_cal_returns')
+def cal_returns_case(data):
+    return data['portfolio']._cal_returns
+
+@case('daily_returns')
+def daily_returns_case(data):
+    #daily_returns、holding_returns和turnover()都会缓存结果，与t_values一样直接计时计算部分
+    return data['portfolio']._cal_portfolio_returns_between_balancing
+
+@case('holding_returns')
+def holding_returns_case(data):
+    return lambda:data['portfolio']._cal_portfolio_returns_between_balancing(hold = True)
+
+@case('t_values')
+def t_values_case(data):
+    #t_values()会缓存结果，这里直接计时计算部分
+    return data['portfolio']._cal_t_values
+
+@case('turnover')
+def turnover_case(data):
+    return data['portfolio']._cal_group_turnover
+
+def _top_group_weights(portfolio):
+    group = portfolio._group['group']
+    top = group[group == group.max()]
+    weights = pd.Series(1.0, index = top.index).unstack('code').fillna(0)
+    return weights.div(weights.sum(axis = 1), axis = 0), pd.Index(portfolio._rebalance_date)
+
+@case('portfolio_returns')
+def portfolio_returns_case(data):
+    weights, rebalance_date = _top_group_weights(data['portfolio'])
+    return lambda:utils.portfolio_returns(weights, data['hist_data'], rebalance_date)
+
+def _risk_model_setup(data, factor_model):
+    if 'risk_model' not in data:
+        data['risk_model'] = synthetic.make_risk_model(data['hist_data'], seed = data['seed'])
+    #每个日期都要解一次二次规划，只取前几个调仓日
+    trade_date_list = list(data['portfolio']._rebalance_date[:6])
+    return lambda:utils.backtest_risk_models(data['hist_data'], *data['risk_model'], trade_date_list, factor_model = factor_model)
+
+@case('backtest_risk_models')
+def backtest_risk_models_case(data):
+    return _risk_model_setup(data, False)
+
+@case('backtest_risk_models_factor_model')
+def backtest_risk_models_factor_case(data):
+    return _risk_model_setup(data, True)
+
+@case('risk_model_estimate')
+def risk_model_estimate_case(data):
+    if 'risk_model' not in data:
+        data['risk_model'] = synthetic.make_risk_model(data['hist_data'], seed = data['seed'])
+    return lambda:risk_model.estimate(data['hist_data']['returns'], data['risk_model'][0], newey_west_lags = 2, shrinkage = True)
+
+def measure(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        function()
+        times.append((time.perf_counter_ns() - start) / 1e9)
+    return {'repeat':repeat, 'min':min(times), 'median':float(np.median(times)), 'mean':float(np.mean(times))}
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd = BENCHMARK_PATH,
+                                       stderr = subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(stock_num = 1000, date_num = 500, factor_num = 1, balance_time = 20, seed = 0, repeat = 3, cases = None):
+    '''
+    运行cases中的基准(默认全部)，返回可以直接保存为JSON的字典
+    '''
+    names = list(CASES) if cases is None else cases
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        raise ValueError('没有这些基准: {}'.format(unknown))
+    #二次规划的迭代过程会打断输出
+    solvers.options['show_progress'] = False
+    work_path = tempfile.mkdtemp()
+    try:
+        data = prepare(stock_num, date_num, factor_num, balance_time, seed, work_path)
+        results = OrderedDict()
+        for name in names:
+            results[name] = measure(CASES[name](data), repeat)
+            print('{:<36}{:>10.4f}s'.format(name, results[name]['median']))
+    finally:
+        shutil.rmtree(work_path, ignore_errors = True)
+    meta = {'stocks':stock_num, 'dates':date_num, 'factors':factor_num, 'balance_time':balance_time,
+            'seed':seed, 'rows':len(data['hist_data']), 'commit':_git_commit(),
+            'time':time.strftime('%Y-%m-%d %H:%M:%S'), 'python':platform.python_version(),
+            'numpy':np.__version__, 'pandas':pd.__version__, 'machine':platform.platform()}
+    return {'meta':meta, 'results':results}
+
+def compare(result, baseline, threshold = 1.1):
+    '''
+    与基准结果按中位数比较，返回DataFrame，ratio大于threshold的标记为regression
+    数据规模不同时比较没有意义，直接报错
+    '''
+    for key in ['stocks', 'dates', 'factors', 'balance_time', 'seed']:
+        if result['meta'][key] != baseline['meta'][key]:
+            raise ValueError('数据规模不同，不能比较: {} {} != {}'.format(key, result['meta'][key], baseline['meta'][key]))
+    names = [name for name in result['results'] if name in baseline['results']]
+    table = pd.DataFrame({'baseline':[baseline['results'][name]['median'] for name in names],
+                          'current':[result['results'][name]['median'] for name in names]}, index = names)
+    table['ratio'] = table['current'] / table['baseline']
+    table['regression'] = table['ratio'] > threshold
+    return table
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stocks', type = int, default = 1000)
+    parser.add_argument('--dates', type = int, default = 500)
+    parser.add_argument('--factors', type = int, default = 1)
+    parser.add_argument('--balance_time', type = int, default = 20)
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--repeat', type = int, default = 3)
+    parser.add_argument('--cases', nargs = '*', default = None, help = '可选: ' + ', '.join(CASES))
+    parser.add_argument('--output', default = None, help = '结果保存为JSON')
+    parser.add_argument('--baseline', default = None, help = '与之前保存的JSON比较')
+    parser.add_argument('--threshold', type = float, default = 1.1)
+    args = parser.parse_args()
+
+    result = run(args.stocks, args.dates, args.factors, args.balance_time, args.seed, args.repeat, args.cases)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent = 2)
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            table = compare(result, json.load(f), args.threshold)
+        print(table.to_string())
+        if table['regression'].any():
+            sys.exit(1)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 20:45:27 2026
+
+@author: lenovo
+
+合成的A股面板数据，列与utils.read_data读到的行情数据相同，用于基准测试，不需要连接数据库
+"""
+import pandas as pd
+import numpy as np
+from scipy.signal import lfilter
+
+#上市后多少个交易日内算作新股
+NEW_STOCK_DAYS = 120
+#指数成分股调整的间隔(交易日)
+INDEX_REBALANCE_DAYS = 120
+#涨跌停限制
+PRICE_LIMIT = 0.1
+
+def _segment_starts(code_id):
+    return np.flatnonzero(np.r_[True, code_id[1:] != code_id[:-1]])
+
+def _ar1(noise, starts, rho):
+    '''
+    每只股票一段的AR(1)序列，不同股票之间不延续
+    '''
+    result = np.empty_like(noise)
+    bounds = np.append(starts, len(noise))
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        result[start:end] = lfilter([np.sqrt(1 - rho ** 2)], [1, -rho], noise[start:end])
+        result[start] = noise[start]
+    return result
+
+def make_panel(stock_num = 1000, date_num = 500, factor_num = 1, industry_num = 30,
+               factor_ic = 0.05, seed = 0, start_date = '2010-01-04'):
+    '''
+    生成(hist_data, factors)，索引都是(code, date)，行按(code, date)排序
+    hist_data包含returns, adj_close, close, industry, market_value, is_ST, is_new_stock, status, is_hs300, is_zz500，
+    股票有先后上市和退市，停牌日status为0、收益为0，ST为连续的一段，指数成分按市值定期调整
+    factors: factor_num列的因子，与未来20个交易日的收益相关(IC约为factor_ic)，在时间上有持续性，约5%缺失
+    相同的参数和seed总是生成相同的数据
+    '''
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start_date, periods = date_num, name = 'date')
+    codes = pd.Index(['{:0>6}'.format(i) for i in range(stock_num)], name = 'code')
+
+    #70%的股票在开始时已经上市，其余在样本期内上市，5%在样本期内退市
+    list_day = np.where(rng.random(stock_num) < 0.7, 0, rng.integers(0, max(date_num - 1, 1), stock_num))
+    delist_day = np.where(rng.random(stock_num) < 0.05, rng.integers(0, date_num, stock_num) + list_day + 1, date_num)
+    delist_day = np.clip(delist_day, list_day + 1, date_num)
+    length = delist_day - list_day
+    code_id = np.repeat(np.arange(stock_num), length)
+    day = np.arange(len(code_id)) - np.repeat(np.cumsum(length) - length, length) + np.repeat(list_day, length)
+    n = len(code_id)
+    starts = _segment_starts(code_id)
+
+    industry_id = rng.integers(0, industry_num, stock_num)
+    beta = rng.normal(1, 0.3, stock_num)
+    market = rng.normal(0.0003, 0.013, date_num)
+    industry_returns = rng.normal(0, 0.008, (date_num, industry_num))
+    returns = (beta[code_id] * market[day] + industry_returns[day, industry_id[code_id]]
+               + rng.normal(0, 0.02, n) * rng.lognormal(0, 0.3, stock_num)[code_id])
+    returns = np.clip(returns, -PRICE_LIMIT, PRICE_LIMIT)
+
+    #停牌约1%，上市第一天不停牌
+    status = (rng.random(n) > 0.01).astype(np.int64)
+    status[starts] = 1
+    returns[status == 0] = 0
+
+    log_price = np.cumsum(np.log1p(returns))
+    log_price -= np.repeat(log_price[starts] - np.log1p(returns[starts]), length)
+    adj_close = 10 * rng.lognormal(0, 0.5, stock_num)[code_id] * np.exp(log_price)
+    #除权除息让复权价与收盘价逐渐分开
+    #在对数上累加，全市场多年的面板直接累乘会溢出
+    log_adj_factor = np.cumsum(np.where(rng.random(n) < 0.002, np.log(1.05), 0.0))
+    adj_factor = np.exp(log_adj_factor - np.repeat(log_adj_factor[starts], length))
+    close = adj_close / adj_factor
+    market_value = rng.lognormal(20, 1, stock_num)[code_id] * close
+
+    is_new_stock = ((day - list_day[code_id] < NEW_STOCK_DAYS) & (list_day[code_id] > 0)).astype(np.int64)
+    #3%的股票有一段ST
+    st_start = rng.integers(0, date_num, stock_num)
+    st_end = st_start + rng.integers(20, 250, stock_num)
+    is_ST = ((rng.random(stock_num) < 0.03)[code_id] & (day >= st_start[code_id]) & (day < st_end[code_id])).astype(np.int64)
+
+    index = pd.MultiIndex.from_arrays([codes[code_id], dates[day]], names = ['code', 'date'])
+    hist_data = pd.DataFrame({'returns':returns, 'adj_close':adj_close, 'close':close,
+                              'industry':np.array(['industry_{}'.format(i) for i in range(industry_num)], dtype = object)[industry_id[code_id]],
+                              'market_value':market_value, 'is_ST':is_ST, 'is_new_stock':is_new_stock,
+                              'status':status}, index = index)
+    hs300, zz500 = _index_members(market_value, code_id, day, stock_num)
+    hist_data['is_hs300'] = hs300
+    hist_data['is_zz500'] = zz500
+
+    #未来20个交易日的累计对数收益，用于给因子加上预测能力
+    horizon = 20
+    position = np.arange(n)
+    future = np.minimum(position + horizon, np.repeat(np.cumsum(length) - 1, length))
+    forward = log_price[future] - log_price
+    forward = (forward - forward.mean()) / forward.std()
+    factors = {}
+    for i in range(factor_num):
+        noise = _ar1(rng.normal(size = n), starts, 0.95)
+        values = factor_ic * forward + np.sqrt(1 - factor_ic ** 2) * noise
+        values[rng.random(n) < 0.05] = np.nan
+        factors['factor_{}'.format(i)] = values
+    factors = pd.DataFrame(factors, index = index)
+    return hist_data, factors
+
+def _index_members(market_value, code_id, day, stock_num):
+    '''
+    按市值排名的沪深300、中证500成分，每INDEX_REBALANCE_DAYS个交易日调整一次，成分数量按股票数量从4000只缩放
+    调整日的市值排名决定整个调整期的成分，调整日之后上市的股票要等到下一次调整
+    '''
+    hs300_num = max(1, int(round(300 * stock_num / 4000)))
+    zz500_num = max(1, int(round(500 * stock_num / 4000)))
+    period = day // INDEX_REBALANCE_DAYS
+    on_rebalance_day = day % INDEX_REBALANCE_DAYS == 0
+    rank = pd.Series(-market_value[on_rebalance_day]).groupby(day[on_rebalance_day]).rank(method = 'first').values
+    period_rank = np.full((period.max() + 1, stock_num), np.inf)
+    period_rank[period[on_rebalance_day], code_id[on_rebalance_day]] = rank
+    rank = period_rank[period, code_id]
+    return (rank <= hs300_num).astype(np.int64), ((rank > hs300_num) & (rank <= hs300_num + zz500_num)).astype(np.int64)
+
+def make_risk_model(hist_data, factor_num = 10, seed = 0):
+    '''
+    与hist_data对齐的风险模型(因子暴露, {date:因子协方差}, 特异方差)，格式与utils.backtest_risk_models的参数相同
+    暴露以每只股票固定的部分为主，因子协方差随日期整体缩放
+    '''
+    rng = np.random.default_rng(seed)
+    code_id, codes = pd.factorize(hist_data.index.get_level_values('code'))
+    n = len(code_id)
+    columns = ['risk_factor_{}'.format(i) for i in range(factor_num)]
+    exposure = rng.normal(size = (len(codes), factor_num))[code_id] + 0.1 * rng.normal(size = (n, factor_num))
+    factors_expo = pd.DataFrame(exposure, index = hist_data.index, columns = columns)
+
+    loading = rng.normal(0, 0.004, (factor_num, factor_num))
+    covariance = loading.dot(loading.T) + np.eye(factor_num) * 1e-5
+    dates = hist_data.index.get_level_values('date').unique().sort_values()
+    scale = np.exp(rng.normal(0, 0.2, len(dates)))
+    factors_covariance_dict = {date:pd.DataFrame(covariance * s, index = columns, columns = columns) for date, s in zip(dates, scale)}
+
+    specific_variance = pd.Series((0.02 * rng.lognormal(0, 0.3, len(codes)))[code_id] ** 2, index = hist_data.index)
+    return factors_expo, factors_covariance_dict, specific_variance
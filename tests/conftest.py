@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 10:12:36 2026
+
+@author: lenovo
+"""
+import os
+import sys
+
+import pytest
+
+ROOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT_PATH, 'FactorAnalysis'))
+sys.path.insert(0, os.path.join(ROOT_PATH, 'benchmarks'))
+import synthetic
+
+@pytest.fixture(scope = 'session')
+def panel():
+    '''
+    小规模的合成面板(hist_data, factors)，列与utils.read_data读到的数据相同
+    '''
+    return synthetic.make_panel(200, 300, seed = 0)
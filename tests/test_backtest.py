@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 25 14:02:51 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import numpy as np
+import pytest
+
+import utils
+
+def reference_portfolio_returns(w, hist_data, rebalance_date, weight_change, transaction_cost = 0):
+    '''
+    原来的utils.portfolio_returns，逐个调仓区间计算
+    '''
+    hist_data2 = hist_data.copy()
+    hist_data2 = hist_data2[hist_data2.index.get_level_values('code').isin(w.columns)]
+    hist_data2 = hist_data2['returns'].unstack('code').fillna(0)
+    hist_data2 = hist_data2.T.reindex(w.columns).fillna(0).T.sort_index()
+    returns_between_rebalance_date = []
+    long_term_returns =  []
+    for i in range(len(rebalance_date) - 1):
+        start_date, end_date = rebalance_date[i], rebalance_date[i + 1]
+        returns = hist_data2[(hist_data2.index > start_date) & (hist_data2.index <= end_date)]
+        cum_returns = (returns + 1).cumprod()
+        portfolio_cum_returns = cum_returns.dot(w.iloc[i])
+        portfolio_cum_returns.iloc[-1] = weight_change.loc[end_date] * portfolio_cum_returns.iloc[-1] / ((1+transaction_cost)/(1-transaction_cost)) + (1 - weight_change.loc[end_date]) * portfolio_cum_returns.iloc[-1]
+        long_term_returns_i = portfolio_cum_returns.iloc[-1] - 1
+        portfolio_returns = portfolio_cum_returns.pct_change()
+        portfolio_returns.iloc[0] = portfolio_cum_returns.iloc[0] - 1
+        returns_between_rebalance_date.append(portfolio_returns)
+        long_term_returns.append(long_term_returns_i)
+    returns = pd.concat(returns_between_rebalance_date)
+    long_term_returns = pd.Series(long_term_returns, index = rebalance_date[1:])
+    return returns, long_term_returns
+
+def make_weights(hist_data, rebalance_date, stock_num, seed):
+    '''
+    每个调仓日从当天有数据的股票中随机选stock_num只，随机权重
+    '''
+    rng = np.random.default_rng(seed)
+    codes = hist_data.index.get_level_values('code').unique()
+    weights = pd.DataFrame(0.0, index = rebalance_date, columns = codes)
+    for date in rebalance_date:
+        available = hist_data.xs(date, level = 'date').index
+        chosen = rng.choice(available, stock_num, replace = False)
+        weights.loc[date, chosen] = rng.random(stock_num)
+    return weights.div(weights.sum(axis = 1), axis = 0)
+
+@pytest.fixture(scope = 'module')
+def setup(panel):
+    hist_data, factors = panel
+    dates = hist_data.index.get_level_values('date').unique().sort_values()
+    rebalance_date = dates[5::20]
+    rng = np.random.default_rng(1)
+    weight_change = pd.Series(rng.uniform(0.2, 0.8, len(rebalance_date)), index = rebalance_date)
+    return hist_data, rebalance_date, weight_change
+
+@pytest.mark.parametrize('stock_num', [100, 10])
+@pytest.mark.parametrize('drop_last', [False, True])
+def test_matches_reference(setup, stock_num, drop_last):
+    #100只为普通矩阵，10只时非零元素少于10%，使用稀疏矩阵
+    hist_data, rebalance_date, weight_change = setup
+    w = make_weights(hist_data, rebalance_date, stock_num, seed = stock_num)
+    if drop_last:
+        w = w.iloc[:-1]
+    expected_returns, expected_long_term = reference_portfolio_returns(w, hist_data, rebalance_date, weight_change, 0.002)
+    returns, long_term_returns = utils.portfolio_returns(w, hist_data, rebalance_date, weight_change, 0.002)
+    pd.testing.assert_series_equal(returns, expected_returns, check_names = False, check_freq = False, rtol = 1e-12)
+    pd.testing.assert_series_equal(long_term_returns, expected_long_term, check_freq = False, rtol = 1e-12)
+
+def test_string_dates(setup):
+    hist_data, rebalance_date, weight_change = setup
+    w = make_weights(hist_data, rebalance_date, 30, seed = 2)
+    expected_returns, expected_long_term = reference_portfolio_returns(w, hist_data, rebalance_date, weight_change)
+    string_date = [date.strftime('%Y-%m-%d') for date in rebalance_date]
+    string_weight_change = weight_change.set_axis(string_date)
+    returns, long_term_returns = utils.portfolio_returns(w, hist_data, string_date, string_weight_change)
+    pd.testing.assert_series_equal(returns, expected_returns, check_names = False, check_freq = False, rtol = 1e-12)
+    np.testing.assert_allclose(long_term_returns.values, expected_long_term.values, rtol = 1e-12)
+    assert list(long_term_returns.index) == string_date[1:]
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 25 10:06:14 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import numpy as np
+import pytest
+
+import utils
+import covariance_cache
+
+def make_risk_model(seed, date_num = 4, code_num = 30):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2021-01-04', periods = date_num, name = 'date')
+    codes = ['{:06d}.SZ'.format(i) for i in range(code_num)]
+    index = pd.MultiIndex.from_product([codes, dates], names = ['code', 'date'])
+    factors_expo = pd.DataFrame(rng.normal(size = (len(index), 3)), index = index, columns = ['size', 'beta', 'value'])
+    specific_variance = pd.Series(rng.uniform(0.01, 0.05, len(index)), index = index)
+    #部分股票缺少特异方差，不进入协方差矩阵
+    specific_variance[rng.random(len(index)) < 0.1] = np.nan
+    factors_covariance_dict = {}
+    for date in dates:
+        A = rng.normal(size = (3, 3))
+        factors_covariance_dict[date] = pd.DataFrame(A.dot(A.T), index = factors_expo.columns, columns = factors_expo.columns)
+    return dates, factors_expo, specific_variance, factors_covariance_dict
+
+def expected_covariance(date, factors_expo, specific_variance, factors_covariance_dict):
+    return utils.get_covariance_specific_date(date, None, factors_expo, factors_covariance_dict, specific_variance)
+
+def test_hits_and_misses():
+    dates, *model = make_risk_model(0)
+    cache = covariance_cache.CovarianceCache(*model)
+    for date in dates:
+        pd.testing.assert_frame_equal(cache.covariance(date), expected_covariance(date, *model))
+    #第一次计算协方差只算一次未命中，低秩形式不放入缓存
+    assert cache.stats()['misses'] == len(dates)
+    assert cache.stats()['entries'] == len(dates)
+    for date in dates:
+        cache.covariance(date)
+        cache.factor_model(date)
+    assert (cache.hits, cache.misses) == (len(dates), 2 * len(dates))
+    assert cache.stats()['entries'] == 2 * len(dates)
+
+def test_eviction_by_bytes():
+    dates, *model = make_risk_model(0)
+    sizes = []
+    probe = covariance_cache.CovarianceCache(*model)
+    for date in dates:
+        before = probe.nbytes
+        probe.covariance(date)
+        sizes.append(probe.nbytes - before)
+    #只放得下最后两个日期
+    max_bytes = sizes[-1] + sizes[-2]
+    cache = covariance_cache.CovarianceCache(*model, max_bytes = max_bytes)
+    for date in dates:
+        cache.covariance(date)
+        assert cache.nbytes <= max_bytes
+    assert cache.stats()['entries'] == 2
+    #最早的日期已经被淘汰，最近的日期仍在内存中
+    cache.covariance(dates[-1])
+    assert cache.hits == 1
+    cache.covariance(dates[0])
+    assert cache.misses == len(dates) + 1
+
+@pytest.mark.parametrize('kind', ['covariance', 'factor_model'])
+def test_disk_round_trip(tmp_path, kind):
+    dates, *model = make_risk_model(0)
+    cache = covariance_cache.CovarianceCache(*model, max_bytes = 0, cache_dir = str(tmp_path))
+    first = [getattr(cache, kind)(date) for date in dates]
+    assert cache.stats()['entries'] == 0
+    second = [getattr(cache, kind)(date) for date in dates]
+    assert (cache.misses, cache.disk_hits) == (len(dates), len(dates))
+    for expected, result in zip(first, second):
+        if kind == 'covariance':
+            pd.testing.assert_frame_equal(result, expected, check_exact = True)
+        else:
+            pd.testing.assert_frame_equal(result[0], expected[0], check_exact = True)
+            pd.testing.assert_frame_equal(result[1], expected[1], check_exact = True)
+            pd.testing.assert_series_equal(result[2], expected[2], check_exact = True, check_names = False)
+
+def test_shared_cache_dir(tmp_path):
+    dates, *first_model = make_risk_model(0)
+    _, *second_model = make_risk_model(1)
+    first = covariance_cache.CovarianceCache(*first_model, max_bytes = 0, cache_dir = str(tmp_path))
+    first.covariance(dates[0])
+    #另一组数据使用同一个目录，不能读到第一组数据的结果
+    second = covariance_cache.CovarianceCache(*second_model, max_bytes = 0, cache_dir = str(tmp_path))
+    result = second.covariance(dates[0])
+    assert (second.misses, second.disk_hits) == (1, 0)
+    pd.testing.assert_frame_equal(result, expected_covariance(dates[0], *second_model))
+    #相同的数据仍然从磁盘读取
+    third = covariance_cache.CovarianceCache(*first_model, max_bytes = 0, cache_dir = str(tmp_path))
+    third.covariance(dates[0])
+    assert (third.misses, third.disk_hits) == (0, 1)
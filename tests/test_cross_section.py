@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 26 09:41:27 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import numpy as np
+import statsmodels.api as sm
+import pytest
+
+import cross_section
+
+#statsmodels在原始市值(1e8~1e11)上条件数约1e11，参考结果中先把市值缩小，t值和其余系数不变
+MARKET_VALUE_SCALE = 1e10
+
+@pytest.fixture(scope = 'module')
+def data(panel):
+    hist_data, factors = panel
+    data = hist_data[['industry', 'market_value', 'returns']].join(factors['factor_0'].rename('factors'))
+    dates = data.index.get_level_values('date').unique().sort_values()[:40]
+    return data[data.index.get_level_values('date').isin(dates)].dropna()
+
+def reference(data, industry):
+    '''
+    逐日statsmodels回归，返回(系数, t值, 自由度)，市值的系数换算回原始单位
+    '''
+    coef, t, dof = {}, {}, {}
+    for date, data_date in data.groupby('date'):
+        X = data_date[['market_value', 'factors']].astype(float)
+        X['market_value'] /= MARKET_VALUE_SCALE
+        if industry:
+            X = pd.concat([pd.get_dummies(data_date['industry']).astype(float), X], axis = 1)
+        model = sm.OLS(data_date['returns'], X).fit()
+        coef[date] = model.params[['market_value', 'factors']] * [1 / MARKET_VALUE_SCALE, 1]
+        t[date] = model.tvalues[['market_value', 'factors']]
+        dof[date] = model.df_resid
+    return pd.DataFrame(coef).T, pd.DataFrame(t).T, pd.Series(dof)
+
+@pytest.mark.parametrize('industry', [True, False])
+def test_matches_statsmodels(data, industry):
+    result = cross_section.cross_sectional_regression(data['returns'], data[['market_value', 'factors']],
+                                                      industry = data['industry'] if industry else None)
+    coef, t, dof = reference(data, industry)
+    np.testing.assert_allclose(result['coef'].values, coef.values, rtol = 1e-10)
+    np.testing.assert_allclose(result['t'].values, t.values, rtol = 1e-10)
+    np.testing.assert_array_equal(result['dof'].values, dof.values)
+    assert list(result.index) == list(coef.index)
+
+def test_missing_values(data):
+    data = data.copy()
+    data.iloc[::7, data.columns.get_loc('factors')] = np.nan
+    data.iloc[::11, data.columns.get_loc('industry')] = np.nan
+    result = cross_section.cross_sectional_regression(data['returns'], data[['market_value', 'factors']], industry = data['industry'])
+    _, t, _ = reference(data.dropna(), True)
+    np.testing.assert_allclose(result['t'].values, t.values, rtol = 1e-10)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 10:20:14 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import numpy as np
+import pytest
+from pandas.tseries.offsets import Day
+
+from SingleFactorAnalysis import SFPortfolio
+
+def reference_returns(portfolio, hold = False):
+    '''
+    原来逐区间循环的实现：区间内每只股票累乘(1 + 收益率)，按(日期, 组)平均，再逐区间pct_change
+    hold: 区间内的行使用区间开始的调仓日的分组，否则只有当天有分组的行参与平均
+    '''
+    hist_data = portfolio._hist_data
+    group = portfolio._group['group']
+    rebalance_date = list(portfolio._rebalance_date)
+    dates = hist_data.index.get_level_values('date')
+    bounds = []
+    for i in range(len(rebalance_date) - 1):
+        start_date, end_date = rebalance_date[i], rebalance_date[i + 1]
+        if i == len(rebalance_date) - 2: end_date += Day(1)
+        bounds.append((start_date, end_date))
+
+    values = []
+    for start_date, end_date in bounds:
+        data = hist_data[(dates >= start_date) & (dates < end_date)]
+        cum_returns = (data['returns'].fillna(0) + 1).groupby('code', group_keys = False).cumprod()
+        if hold:
+            start_group = group[group.index.get_level_values('date') == start_date].droplevel('date')
+            data_group = data.index.get_level_values('code').map(start_group).values
+        else:
+            data_group = group.reindex(data.index).values
+        frame = pd.DataFrame({'cum_returns':cum_returns.reindex(data.index).values, 'group':data_group,
+                              'weights':data['market_value'].values}, index = data.index.get_level_values('date'))
+        frame = frame.dropna(subset = ['group'])
+        grouped = frame.groupby(['date', 'group'])
+        if portfolio._weights == 'EW':
+            values.append(grouped['cum_returns'].mean())
+        else:
+            values.append(grouped.apply(lambda df:np.average(df['cum_returns'], weights = df['weights'])))
+    cum_returns = pd.concat(values).unstack('group').sort_index()
+
+    result = []
+    for start_date, end_date in bounds:
+        period = cum_returns[(cum_returns.index >= start_date) & (cum_returns.index < end_date)]
+        returns = period.pct_change()
+        if len(period) != 0:
+            returns.iloc[0] = period.iloc[0] - 1
+        result.append(returns)
+    result = pd.concat(result).sort_index()
+    result.columns = result.columns.astype(np.int64)
+    return result
+
+@pytest.mark.parametrize('low_memory', [False, True])
+@pytest.mark.parametrize('weights', ['EW', 'MV'])
+@pytest.mark.parametrize('balance_time', [20, 7])
+def test_daily_returns_matches_loop(panel, weights, balance_time, low_memory):
+    hist_data, factors = panel
+    portfolio = SFPortfolio(factors['factor_0'], hist_data, balance_time = balance_time, weights = weights, low_memory = low_memory)
+    result = portfolio.daily_returns
+    expected = reference_returns(portfolio)
+    #只有调仓日
+    assert result.index.isin(portfolio._rebalance_date).all()
+    pd.testing.assert_frame_equal(result, expected, check_freq = False, rtol = 1e-12)
+
+@pytest.mark.parametrize('low_memory', [False, True])
+@pytest.mark.parametrize('weights', ['EW', 'MV'])
+@pytest.mark.parametrize('balance_time', [20, 7])
+def test_holding_returns_matches_loop(panel, weights, balance_time, low_memory):
+    hist_data, factors = panel
+    portfolio = SFPortfolio(factors['factor_0'], hist_data, balance_time = balance_time, weights = weights, low_memory = low_memory)
+    result = portfolio.holding_returns
+    expected = reference_returns(portfolio, hold = True)
+    assert len(result) > len(portfolio.daily_returns)
+    pd.testing.assert_frame_equal(result, expected, check_freq = False, rtol = 1e-12)
+
+def test_daily_returns_with_missing_market_value(panel):
+    hist_data, factors = panel
+    hist_data = hist_data.copy()
+    hist_data.iloc[::50, hist_data.columns.get_loc('market_value')] = np.nan
+    portfolio = SFPortfolio(factors['factor_0'], hist_data, balance_time = 20, weights = 'MV', preprocess = False,
+                            market_value_neutral = False, industry_neutral = False)
+    pd.testing.assert_frame_equal(portfolio.holding_returns, reference_returns(portfolio, hold = True), check_freq = False, rtol = 1e-12)
+
+@pytest.mark.parametrize('hold', [False, True])
+def test_low_memory_is_identical(panel, hold):
+    '''
+    逐区间计算与一次计算的结果完全相同，low_memory只改变计算方式，改变它不会让缓存失效
+    '''
+    hist_data, factors = panel
+    portfolio = SFPortfolio(factors['factor_0'], hist_data, balance_time = 20, weights = 'MV', select_from_industry = True)
+    expected = portfolio._cal_portfolio_returns_between_balancing(hold = hold)
+    group = portfolio._group
+    portfolio.set_params(low_memory = True)
+    assert portfolio._group is group
+    pd.testing.assert_frame_equal(portfolio._cal_portfolio_returns_between_balancing(hold = hold), expected, check_exact = True)
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 26 11:15:40 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import numpy as np
+import pytest
+
+import utils
+
+pytest.importorskip('cvxopt')
+
+@pytest.fixture
+def covariance():
+    rng = np.random.default_rng(0)
+    loading = rng.normal(size = (6, 6))
+    codes = ['{:06d}'.format(i) for i in range(6)]
+    return pd.DataFrame(loading.dot(loading.T) / 6 + np.eye(6) * 0.1, index = codes, columns = codes)
+
+def test_short_without_expected_return(covariance):
+    #只有权重和为1的约束时最小方差组合为Σ⁻¹1 / 1'Σ⁻¹1
+    weights, objective = utils.mean_variance_optimization(covariance, can_short = True)
+    expected = np.linalg.solve(covariance.values, np.ones(6))
+    expected /= expected.sum()
+    np.testing.assert_allclose(weights.values, expected, atol = 1e-6)
+    assert list(weights.index) == list(covariance.index)
+    assert np.isclose(objective, expected.dot(covariance.values).dot(expected) / 2, rtol = 1e-6)
+
+def test_long_only(covariance):
+    weights, objective = utils.mean_variance_optimization(covariance)
+    short_weights, short_objective = utils.mean_variance_optimization(covariance, can_short = True)
+    assert (weights > -1e-8).all()
+    assert np.isclose(weights.sum(), 1)
+    assert objective >= short_objective - 1e-10
+
+def test_short_with_expected_return(covariance):
+    mean = pd.Series(np.linspace(0.01, 0.06, 6), index = covariance.index)
+    weights, _ = utils.mean_variance_optimization(covariance, mean = mean, expected_return = 0.08, can_short = True)
+    assert np.isclose(weights.sum(), 1)
+    assert weights.dot(mean) >= 0.08 - 1e-7
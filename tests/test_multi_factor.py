@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 25 15:31:09 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import pytest
+
+import synthetic
+from SingleFactorAnalysis import SFPortfolio
+from MultiFactorAnalysis import MultiFactorScreen
+
+@pytest.fixture(scope = 'module')
+def multi_panel():
+    return synthetic.make_panel(200, 300, factor_num = 3, seed = 1)
+
+@pytest.mark.parametrize('params', [{'balance_time':20},
+                                    {'balance_time':7, 'group_num':3, 'select_from_industry':True},
+                                    {'balance_time':20, 'subset':'is_zz500', 'industry_neutral':False, 'fill_value':'min'}])
+def test_summary_matches_single_factor(multi_panel, params):
+    hist_data, factors = multi_panel
+    summary = MultiFactorScreen(factors, hist_data, **params).summary()
+    assert list(summary.index) == list(factors.columns)
+    for name in factors.columns:
+        expected = SFPortfolio(factors[name], hist_data, **params).statistics()
+        pd.testing.assert_series_equal(summary.loc[name], expected, check_names = False, rtol = 1e-10)
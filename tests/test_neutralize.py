@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 11:32:09 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import numpy as np
+import pytest
+import statsmodels.api as sm
+
+import utils
+import neutralize
+import synthetic
+
+NEUTRAL_PARAMS = [(True, True), (True, False), (False, True)]
+
+def reference_neutral(factors, hist_data, industry = True, market_value = True):
+    '''
+    原来的industry_market_value_neutral：按日期groupby，每天用statsmodels对行业哑变量和对数市值做OLS，返回残差
+    '''
+    name = pd.DataFrame(factors).columns[0]
+    hist_data2 = hist_data.join(factors, how = 'left')
+    neutral_names = []
+    if industry:
+        neutral_names.append('industry')
+    if market_value:
+        neutral_names.append('market_value')
+    hist_data2 = hist_data2[neutral_names + [name]].dropna()
+    def regress_t(data):
+        if not market_value:
+            X = pd.get_dummies(data['industry'])
+        elif not industry:
+            X = np.log(data[['market_value']])
+        else:
+            X = pd.concat([pd.get_dummies(data['industry']), np.log(data[['market_value']])], axis = 1)
+        return sm.OLS(data[name], X.astype(float)).fit().resid
+    return hist_data2.groupby('date').apply(regress_t)
+
+@pytest.fixture(scope = 'module')
+def data():
+    hist_data, factors = synthetic.make_panel(150, 40, factor_num = 3, seed = 1)
+    return hist_data, factors
+
+@pytest.mark.parametrize('industry, market_value', NEUTRAL_PARAMS)
+def test_series_matches_statsmodels(data, industry, market_value):
+    hist_data, factors = data
+    result = neutralize.neutralize(factors['factor_0'], hist_data, industry = industry, market_value = market_value)
+    expected = reference_neutral(factors['factor_0'], hist_data, industry, market_value)
+    assert isinstance(result, pd.Series)
+    pd.testing.assert_series_equal(result.sort_index(), expected.droplevel(0).sort_index(), check_names = False, rtol = 0, atol = 1e-10)
+
+@pytest.mark.parametrize('industry, market_value', NEUTRAL_PARAMS)
+@pytest.mark.parametrize('n_jobs', [None, 2])
+def test_frame_matches_statsmodels(data, industry, market_value, n_jobs):
+    hist_data, factors = data
+    result = neutralize.neutralize(factors, hist_data, industry = industry, market_value = market_value, n_jobs = n_jobs)
+    assert list(result.columns) == list(factors.columns)
+    for name in factors.columns:
+        expected = reference_neutral(factors[name], hist_data, industry, market_value).droplevel(0).sort_index()
+        #每一列只保留自己有值的行
+        column = result[name].dropna().sort_index()
+        pd.testing.assert_series_equal(column, expected, check_names = False, rtol = 0, atol = 1e-10)
+
+@pytest.mark.parametrize('industry, market_value', NEUTRAL_PARAMS)
+def test_industry_market_value_neutral_output(data, industry, market_value):
+    hist_data, factors = data
+    result = utils.industry_market_value_neutral(factors['factor_0'], hist_data, industry, market_value, cache = False)
+    expected = reference_neutral(factors['factor_0'], hist_data, industry, market_value)
+    pd.testing.assert_series_equal(result, expected, check_names = False, rtol = 0, atol = 1e-10)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 11:05:48 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import pytest
+
+import utils
+import schema
+import panel_store
+
+@pytest.fixture(scope = 'module')
+def stores(panel, tmp_path_factory):
+    '''
+    合成面板写成CSV，read_data读CSV的结果作为标准，同一个CSV用convert_csv转换成PanelStore
+    '''
+    hist_data, factors = panel
+    path = tmp_path_factory.mktemp('panel_store')
+    result = {}
+    for name, data in [('hist_data', hist_data), ('factors', factors)]:
+        csv_path = str(path / (name + '.csv'))
+        data.reset_index().to_csv(csv_path, index = False)
+        result[name] = (utils.read_data(csv_path), panel_store.convert_csv(csv_path, str(path / name)), str(path / name))
+    return result
+
+@pytest.mark.parametrize('name', ['hist_data', 'factors'])
+def test_full_read(stores, name):
+    expected, store, store_path = stores[name]
+    pd.testing.assert_frame_equal(store.read().sort_index(), expected.sort_index())
+    pd.testing.assert_frame_equal(utils.read_data(store_path).sort_index(), expected.sort_index())
+
+@pytest.mark.parametrize('name', ['hist_data', 'factors'])
+@pytest.mark.parametrize('start_date, end_date', [('2010-03-01', '2010-06-15'), ('2009-01-01', '2010-01-20'),
+                                                  ('2010-12-01', '2012-01-01'), ('2010-05-05', '2010-05-05')])
+def test_date_slice(stores, name, start_date, end_date):
+    expected, store, store_path = stores[name]
+    start_date, end_date = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    expected = utils.get_data_between_date(expected, start_date, end_date).sort_index()
+    pd.testing.assert_frame_equal(store.get_data_between_date(start_date, end_date).sort_index(), expected)
+    pd.testing.assert_frame_equal(utils.get_data_between_date(store, start_date, end_date).sort_index(), expected)
+
+@pytest.mark.parametrize('columns', [['returns'], ['industry', 'market_value', 'is_hs300'], ['adj_close', 'industry']])
+def test_read_columns(stores, columns):
+    expected, store, store_path = stores['hist_data']
+    pd.testing.assert_frame_equal(utils.read_data(store_path, columns = columns).sort_index(), expected[columns].sort_index())
+    start_date, end_date = pd.Timestamp('2010-02-01'), pd.Timestamp('2010-04-01')
+    pd.testing.assert_frame_equal(store.get_data_between_date(start_date, end_date, columns = columns).sort_index(),
+                                  utils.get_data_between_date(expected, start_date, end_date)[columns].sort_index())
+
+def test_compact_read(stores):
+    expected, store, store_path = stores['hist_data']
+    pd.testing.assert_frame_equal(utils.read_data(store_path, compact = True).sort_index(),
+                                  schema.compact(expected).sort_index())
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 25 18:05:36 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import numpy as np
+import pytest
+
+import utils
+import preprocessing
+
+@pytest.fixture(scope = 'module')
+def data(panel):
+    hist_data, factors = panel
+    #原来的逐日apply较慢，只取前60个交易日
+    dates = hist_data.index.get_level_values('date').unique().sort_values()[:60]
+    hist_data = hist_data[hist_data.index.get_level_values('date').isin(dates)]
+    factor = factors['factor_0'][factors.index.get_level_values('date').isin(dates)].copy()
+    #加入极端值，去极值时需要截尾
+    rng = np.random.default_rng(0)
+    factor[rng.random(len(factor)) < 0.01] *= 50
+    hist_data = hist_data[['industry', 'market_value']].copy()
+    hist_data.loc[hist_data.index[rng.random(len(hist_data)) < 0.01], 'industry'] = np.nan
+    return hist_data, factor
+
+def reference_preprocess(factor, hist_data, fill_value, outlier = 'median'):
+    factor = utils.handle_outlier(factor, outlier)
+    factor = utils.fill_missing_values(factor, factor.name, hist_data, fill_value = fill_value)
+    return utils.standardlize_factors(factor)
+
+@pytest.mark.parametrize('fill_value', ['mean', 'min', 'max'])
+def test_matches_utils_chain(data, fill_value):
+    hist_data, factor = data
+    expected = reference_preprocess(factor, hist_data, fill_value)
+    result = preprocessing.preprocess_factors(factor, hist_data, fill_value = fill_value)
+    pd.testing.assert_series_equal(result, expected, rtol = 1e-12, atol = 1e-12)
+
+def test_std_outlier(data):
+    hist_data, factor = data
+    expected = reference_preprocess(factor, hist_data, 'mean', outlier = 'std')
+    result = preprocessing.preprocess_factors(factor, hist_data, outlier = 'std')
+    pd.testing.assert_series_equal(result, expected, rtol = 1e-12, atol = 1e-12)
+
+def test_columns_are_independent(data):
+    hist_data, factor = data
+    factors = pd.DataFrame({'a':factor, 'b':-2 * factor.sample(frac = 1, random_state = 0).values})
+    result = preprocessing.preprocess_factors(factors, hist_data)
+    for name in factors.columns:
+        pd.testing.assert_series_equal(result[name], preprocessing.preprocess_factors(factors[name], hist_data), rtol = 1e-12)
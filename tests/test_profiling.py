@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 25 11:20:47 2026
+
+@author: lenovo
+"""
+import gc
+
+import pytest
+
+import profiling
+from SingleFactorAnalysis import SFPortfolio
+
+@pytest.fixture
+def enabled():
+    profiling.reset()
+    profiling.enable()
+    yield
+    profiling.disable()
+    profiling.reset()
+
+class Owner:
+
+    @profiling.profiled()
+    def run(self):
+        return nested()
+
+@profiling.profiled()
+def nested():
+    return None
+
+def test_records_follow_owner(enabled):
+    first, second = Owner(), Owner()
+    first.run()
+    second.run()
+    second.run()
+    records = profiling.records(second)
+    assert list(records['stage']) == ['nested', 'Owner.run'] * 2
+    assert len(profiling.records(first)) == 2
+    assert len(profiling.records()) == 6
+    assert len(profiling.records(Owner())) == 0
+
+def test_collected_owner_records_are_not_reused(enabled):
+    #对象被回收后id会被重用，新对象不能得到旧对象的记录
+    for _ in range(20):
+        owner = Owner()
+        owner.run()
+        del owner
+        gc.collect()
+    owner = Owner()
+    assert len(profiling.records(owner)) == 0
+    owner.run()
+    assert len(profiling.records(owner)) == 2
+
+def test_portfolio_profile(enabled, panel):
+    hist_data, factors = panel
+    SFPortfolio(factors['factor_0'], hist_data, balance_time = 20).statistics()
+    gc.collect()
+    portfolio = SFPortfolio(factors['factor_0'], hist_data, balance_time = 20)
+    portfolio.statistics()
+    records = portfolio.profile(raw = True)
+    assert len(records) * 2 == len(profiling.records())
+    assert records['stage'].str.startswith('SFPortfolio.').any()
+    assert (portfolio.profile()['calls'] >= 1).all()
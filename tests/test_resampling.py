@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 25 21:48:50 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import numpy as np
+import pytest
+
+import synthetic
+import resampling
+from SingleFactorAnalysis import SFPortfolio
+
+@pytest.fixture(scope = 'module')
+def portfolios():
+    hist_data, factors = synthetic.make_panel(200, 300, factor_num = 3, seed = 2)
+    return {name:SFPortfolio(factors[name], hist_data, balance_time = 20) for name in factors.columns}
+
+def significance(portfolios, **kwargs):
+    return resampling.significance(portfolios, n_permutations = 120, n_bootstrap = 120, batch_size = 25, seed = 7, **kwargs)
+
+@pytest.mark.parametrize('n_jobs', [2, 4])
+def test_worker_count(portfolios, n_jobs):
+    expected = significance(portfolios, n_jobs = 1)
+    pd.testing.assert_frame_equal(significance(portfolios, n_jobs = n_jobs), expected, check_exact = True)
+
+def test_other_factors(portfolios):
+    together = significance(portfolios)
+    alone = significance({'factor_1':portfolios['factor_1']}, n_jobs = 2)
+    columns = [column for column in together.columns if not column.endswith('_q')]
+    pd.testing.assert_series_equal(alone.loc['factor_1', columns], together.loc['factor_1', columns], check_exact = True)
+    #只有一个因子时q值就是p值
+    for statistic in resampling.STATISTICS:
+        assert alone.loc['factor_1', statistic + '_q'] == alone.loc['factor_1', statistic + '_p']
+
+def test_observed_matches_portfolio(portfolios):
+    result = significance(portfolios)
+    for name, portfolio in portfolios.items():
+        IC = portfolio.IC()
+        assert np.isclose(result.loc[name, 'Rank_IC'], IC['Rank_IC'], rtol = 1e-10)
+        assert np.isclose(result.loc[name, 'IC'], IC['IC'], rtol = 1e-10)
+    assert ((result.filter(like = '_p') > 0) & (result.filter(like = '_p') <= 1)).all().all()
+
+def test_fdr():
+    p_values = pd.Series([0.01, 0.04, 0.03, np.nan, 0.2], index = list('abcde'), name = 'p')
+    #有效的p值4个，排序后为0.01, 0.03, 0.04, 0.2，p·m/k为0.04, 0.06, 0.04/3·4, 0.2，再从后往前取最小值
+    expected = pd.Series([0.04, 0.16 / 3, 0.16 / 3, np.nan, 0.2], index = list('abcde'), name = 'p')
+    pd.testing.assert_series_equal(resampling.fdr(p_values), expected, rtol = 1e-12)
+    np.testing.assert_allclose(resampling.fdr(np.array([0.6, 0.8])), [0.8, 0.8])
+    np.testing.assert_allclose(resampling.fdr(np.array([0.02])), [0.02])
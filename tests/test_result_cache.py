@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 25 20:37:05 2026
+
+@author: lenovo
+"""
+import os
+
+import pandas as pd
+import numpy as np
+import pytest
+
+import result_cache
+from SingleFactorAnalysis import SFPortfolio
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = result_cache.enable(str(tmp_path / 'cache'))
+    yield cache
+    result_cache.disable()
+
+def make_frame():
+    dates = pd.bdate_range('2021-01-04', periods = 3, name = 'date')
+    index = pd.MultiIndex.from_product([['000001', '600000'], dates], names = ['code', 'date'])
+    return pd.DataFrame({'returns':np.linspace(-0.02, 0.03, 6),
+                         'industry':['银行', '银行', None, '地产', '地产', '银行'],
+                         'group':np.arange(6, dtype = np.int8),
+                         'board':pd.Categorical(['main', 'main', 'star', 'main', 'star', 'star']),
+                         'is_ST':[True, False, False, False, True, False],
+                         'list_date':pd.to_datetime(['2000-01-01'] * 3 + ['2010-06-30'] * 3)}, index = index)
+
+@pytest.mark.parametrize('value', [make_frame(), make_frame()['industry'].rename('name'), make_frame()['board'],
+                                   make_frame().reset_index(drop = True), make_frame().xs('000001')])
+def test_round_trip(cache, value):
+    assert cache.put('key', value)
+    result = cache.get('key')
+    if isinstance(value, pd.Series):
+        pd.testing.assert_series_equal(result, value, check_exact = True)
+    else:
+        pd.testing.assert_frame_equal(result, value, check_exact = True, check_freq = False)
+    assert cache.stats()['hits'] == 1
+
+def test_unsupported_values(cache):
+    #不能按列保存的结果不缓存
+    assert not cache.put('mixed', pd.Series([1, 'a', 2.0], dtype = object))
+    assert not cache.put('scalar', 1.0)
+    assert cache.get('mixed') is None and cache.get('scalar') is None
+    assert cache.stats()['entries'] == 0
+
+def test_content_hash():
+    frame = make_frame()[['returns', 'group']]
+    assert result_cache.content_hash(frame, 5) == result_cache.content_hash(frame.copy(), 5)
+    assert result_cache.content_hash(frame, 5) != result_cache.content_hash(frame, 10)
+    assert result_cache.content_hash(frame) != result_cache.content_hash(frame.astype({'returns':np.float32}))
+    assert result_cache.content_hash(frame) != result_cache.content_hash(frame.astype({'group':np.int64}))
+    assert result_cache.content_hash(frame) != result_cache.content_hash(frame.rename(columns = {'group':'group2'}))
+    assert result_cache.content_hash(frame['returns'].values) != result_cache.content_hash(frame['returns'].values.astype(np.float32))
+    assert result_cache.content_hash({'a':1, 'b':2}) == result_cache.content_hash({'b':2, 'a':1})
+
+def test_eviction_by_bytes(tmp_path):
+    value = pd.Series(np.arange(1000, dtype = float))
+    probe = result_cache.ResultCache(str(tmp_path / 'probe'))
+    probe.put('a', value)
+    size = probe.nbytes
+    cache = result_cache.ResultCache(str(tmp_path / 'cache'), max_bytes = 3 * size)
+    for i, key in enumerate(['a', 'b', 'c']):
+        cache.put(key, value)
+        #读写时间记录在meta.json的修改时间上，设成确定的先后顺序
+        os.utime(os.path.join(str(tmp_path / 'cache'), key, result_cache.META_FILE), (1e9 + i, 1e9 + i))
+    assert cache.evictions == 0
+    #读取a之后b是最久没有使用的
+    assert cache.get('a') is not None
+    cache.put('d', value)
+    assert cache.evictions == 1
+    assert cache.get('b') is None
+    assert all(cache.get(key) is not None for key in ['a', 'c', 'd'])
+    assert cache.nbytes <= 3 * size
+
+def test_disabled_and_use_cache(cache):
+    calls = []
+    def compute():
+        calls.append(1)
+        return pd.Series([1.0, 2.0])
+    result_cache.cached('stage', [1], compute)
+    result_cache.cached('stage', [1], compute)
+    assert len(calls) == 1
+    result_cache.cached('stage', [1], compute, use_cache = False)
+    with result_cache.disabled():
+        assert result_cache.get_cache() is None
+        result_cache.cached('stage', [1], compute)
+    assert len(calls) == 3
+    assert result_cache.get_cache() is cache
+    #参数不同时重新计算
+    result_cache.cached('stage', [2], compute)
+    assert len(calls) == 4
+    assert cache.stats()['writes'] == 2
+
+def test_portfolio_statistics(cache, panel):
+    hist_data, factors = panel
+    with result_cache.disabled():
+        expected = SFPortfolio(factors['factor_0'], hist_data, balance_time = 20).statistics()
+    first = SFPortfolio(factors['factor_0'], hist_data, balance_time = 20).statistics()
+    assert cache.stats()['writes'] > 0
+    hits = cache.hits
+    second = SFPortfolio(factors['factor_0'], hist_data, balance_time = 20).statistics()
+    assert cache.hits > hits
+    pd.testing.assert_series_equal(first, expected, check_exact = True)
+    pd.testing.assert_series_equal(second, expected, check_exact = True)
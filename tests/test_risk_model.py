@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 25 16:48:22 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import numpy as np
+import statsmodels.api as sm
+import pytest
+
+import utils
+import risk_model
+import covariance_cache
+
+def make_returns(seed = 0, date_num = 30, code_num = 40, factor_num = 3):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2021-01-04', periods = date_num, name = 'date')
+    codes = ['{:06d}.SH'.format(i) for i in range(code_num)]
+    index = pd.MultiIndex.from_product([codes, dates], names = ['code', 'date'])
+    factors_expo = pd.DataFrame(rng.normal(size = (len(index), factor_num)), index = index,
+                                columns = ['factor_{}'.format(i) for i in range(factor_num)])
+    returns = pd.Series(rng.normal(0, 0.02, len(index)), index = index, name = 'returns')
+    weights = pd.Series(rng.uniform(1, 100, len(index)), index = index)
+    #部分收益和暴露缺失
+    returns[rng.random(len(index)) < 0.05] = np.nan
+    factors_expo[rng.random(factors_expo.shape) < 0.02] = np.nan
+    return returns, factors_expo, weights
+
+@pytest.mark.parametrize('use_weights', [False, True])
+@pytest.mark.parametrize('lag', [0, 1])
+def test_factor_returns_match_wls(use_weights, lag):
+    returns, factors_expo, weights = make_returns()
+    coef, specific_returns = risk_model.factor_returns(returns, factors_expo, weights if use_weights else None, lag = lag)
+    dates = returns.index.get_level_values('date').unique()
+    expected_coef = {}
+    expected_specific = pd.Series(np.nan, index = returns.index)
+    for i in range(lag, len(dates)):
+        #第i天的收益用第i - lag天的暴露解释
+        y = returns.xs(dates[i], level = 'date')
+        X = factors_expo.xs(dates[i - lag], level = 'date')
+        w = weights.xs(dates[i], level = 'date') if use_weights else pd.Series(1.0, index = y.index)
+        valid = y.notna() & X.notna().all(axis = 1)
+        params = sm.WLS(y[valid], X[valid], weights = w[valid]).fit().params
+        expected_coef[dates[i]] = params
+        residual = y - X.dot(params)
+        expected_specific.loc[pd.MultiIndex.from_arrays([residual.index, [dates[i]] * len(residual)])] = residual.values
+    expected_coef = pd.DataFrame(expected_coef).T
+    pd.testing.assert_frame_equal(coef, expected_coef, check_names = False, check_freq = False, rtol = 1e-10, atol = 1e-12)
+    np.testing.assert_allclose(specific_returns.values, expected_specific.values, rtol = 1e-10, atol = 1e-12)
+
+def test_ewma_covariance_equal_weights():
+    rng = np.random.default_rng(0)
+    values = rng.normal(size = (50, 4))
+    factor_return = pd.DataFrame(values, index = pd.bdate_range('2021-01-04', periods = 50, name = 'date'))
+    result = risk_model.ewma_covariance(factor_return, half_life = None, min_periods = 1)
+    assert list(result) == list(factor_return.index)
+    for t, date in enumerate(factor_return.index):
+        f = values[:t + 1]
+        np.testing.assert_allclose(result[date].values, f.T.dot(f) / (t + 1), rtol = 1e-12)
+
+def test_ewma_covariance_weights_and_missing():
+    rng = np.random.default_rng(1)
+    values = rng.normal(size = (40, 3))
+    values[rng.random(values.shape) < 0.1] = np.nan
+    factor_return = pd.DataFrame(values, index = pd.bdate_range('2021-01-04', periods = 40, name = 'date'))
+    result = risk_model.ewma_covariance(factor_return, half_life = 10, min_periods = 5)
+    decay = 0.5 ** (1 / 10)
+    valid = ~np.isnan(values)
+    f = np.where(valid, values, 0)
+    for t, date in enumerate(result):
+        position = factor_return.index.get_loc(date)
+        w = decay ** np.arange(position, -1, -1)
+        #每一对因子只用两者都有数据的日期
+        expected = (f[:position + 1] * w[:, None]).T.dot(f[:position + 1]) / (valid[:position + 1] * w[:, None]).T.dot(valid[:position + 1])
+        np.testing.assert_allclose(result[date].values, expected, rtol = 1e-12)
+    assert valid.any(axis = 1).cumsum()[factor_return.index.get_indexer(list(result))].min() >= 5
+
+def test_ledoit_wolf_intensity():
+    rng = np.random.default_rng(2)
+    n, p = 60, 5
+    data = pd.DataFrame(rng.normal(size = (n, p)).dot(rng.normal(size = (p, p))))
+    covariance, intensity = risk_model.ledoit_wolf(data)
+    #Ledoit and Wolf (2004)：b² = Σ_t ||x_t·x_t' - S||² / n²，d² = ||S - μI||²，强度为min(b², d²) / d²
+    x = data.values - data.values.mean(axis = 0)
+    S = x.T.dot(x) / n
+    mu = np.trace(S) / p
+    d2 = ((S - mu * np.eye(p)) ** 2).sum()
+    b2 = sum(((np.outer(row, row) - S) ** 2).sum() for row in x) / n ** 2
+    expected_intensity = min(b2, d2) / d2
+    assert 0 < expected_intensity < 1
+    assert np.isclose(intensity, expected_intensity, rtol = 1e-12)
+    np.testing.assert_allclose(covariance.values, expected_intensity * mu * np.eye(p) + (1 - expected_intensity) * S, rtol = 1e-12)
+
+def test_factor_covariance_mapping():
+    returns, factors_expo, weights = make_returns()
+    factors_expo = factors_expo.fillna(0)
+    model = risk_model.estimate(returns, factors_expo, half_life = 10, min_periods = 5)
+    factors_covariance = model['factors_covariance']
+    as_dict = dict(factors_covariance.items())
+    assert len(factors_covariance) == len(as_dict) == len(returns.index.get_level_values('date').unique()) - 5
+    date = list(factors_covariance)[3]
+    pd.testing.assert_frame_equal(factors_covariance[date.strftime('%Y-%m-%d')], as_dict[date])
+    assert date in factors_covariance and factors_expo.index[0][1] not in factors_covariance
+
+    #与{date:DataFrame}一样用于组装协方差和低秩形式
+    specific_variance = model['specific_variance']
+    from_mapping = covariance_cache.CovarianceCache(factors_expo, specific_variance, factors_covariance)
+    from_dict = covariance_cache.CovarianceCache(factors_expo, specific_variance, as_dict)
+    for date in factors_covariance:
+        expected = utils.get_covariance_specific_date(date, None, factors_expo, as_dict, specific_variance)
+        pd.testing.assert_frame_equal(from_mapping.covariance(date), expected)
+        for result, expected in zip(from_mapping.factor_model(date), from_dict.factor_model(date)):
+            assert result.equals(expected)
+
+def test_backtest_risk_models_mapping(panel):
+    pytest.importorskip('cvxopt')
+    hist_data, factors = panel
+    returns = hist_data['returns']
+    factors_expo = pd.DataFrame({'size':np.log(hist_data['market_value']), 'factor':factors['factor_0']}).fillna(0)
+    model = risk_model.estimate(returns, factors_expo, half_life = 20, min_periods = 20)
+    trade_date_list = list(model['factors_covariance'])[::20][:4]
+    expected = utils.backtest_risk_models(hist_data, factors_expo, dict(model['factors_covariance'].items()),
+                                          model['specific_variance'], trade_date_list, subset = None)
+    result = utils.backtest_risk_models(hist_data, factors_expo, model['factors_covariance'],
+                                        model['specific_variance'], trade_date_list, subset = None)
+    for result_part, expected_part in zip(result, expected):
+        pd.testing.assert_series_equal(result_part, expected_part)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 15:40:52 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import numpy as np
+import pytest
+
+import panel_store
+import streaming
+from SingleFactorAnalysis import SFPortfolio
+
+def write_sources(hist_data, factors, path):
+    panel_store.write_panel(hist_data, str(path / 'hist_data'))
+    panel_store.write_panel(factors[['factor_0']], str(path / 'factors'))
+    return str(path / 'factors'), str(path / 'hist_data')
+
+@pytest.fixture(scope = 'module')
+def sources(panel, tmp_path_factory):
+    return write_sources(*panel, tmp_path_factory.mktemp('streaming'))
+
+@pytest.fixture(scope = 'module')
+def gap_panel(panel):
+    '''
+    一只股票在第3、4个调仓日(以及之间的交易日)没有数据，第5个调仓日之后又出现，
+    返回(hist_data, factors, 股票代码, 调仓日)
+    '''
+    hist_data, factors = panel
+    dates = hist_data.index.get_level_values('date').unique().sort_values()
+    rebalance_date = dates[::20]
+    on_date = hist_data.xs(rebalance_date[2], level = 'date')
+    code = on_date.index[(on_date['status'] == 1) & (on_date['is_ST'] == 0) & (on_date['is_new_stock'] == 0)][0]
+    code_level = hist_data.index.get_level_values('code')
+    date_level = hist_data.index.get_level_values('date')
+    missing = (code_level == code) & (date_level > rebalance_date[2]) & (date_level <= rebalance_date[4])
+    return hist_data[~missing], factors.reindex(hist_data.index[~missing]), code, rebalance_date
+
+@pytest.mark.parametrize('max_gap', [1, None])
+def test_statistics_match_in_memory(panel, sources, max_gap):
+    hist_data, factors = panel
+    expected = SFPortfolio(factors['factor_0'], hist_data, balance_time = 20).statistics()
+    portfolio = streaming.StreamingSFPortfolio(*sources, balance_time = 20, max_gap = max_gap, chunk_dates = 7)
+    pd.testing.assert_series_equal(portfolio.statistics(), expected, rtol = 1e-10)
+
+def test_reappearing_stock(gap_panel, tmp_path):
+    hist_data, factors, code, rebalance_date = gap_panel
+    sources = write_sources(hist_data, factors, tmp_path)
+    expected = SFPortfolio(factors['factor_0'], hist_data, balance_time = 20)
+    #一直等到数据结束时结果相同
+    unbounded = streaming.StreamingSFPortfolio(*sources, balance_time = 20, max_gap = None)
+    pd.testing.assert_series_equal(unbounded.statistics(), expected.statistics(), rtol = 1e-10)
+
+    #默认的max_gap = 1：两个调仓日没有数据的股票在第3个调仓日的period_returns为NaN，
+    #相当于再次出现时是另一只股票，这只影响第3个调仓日的收益和IC
+    portfolio = streaming.StreamingSFPortfolio(*sources, balance_time = 20)
+    codes = hist_data.index.get_level_values('code')
+    dates = hist_data.index.get_level_values('date')
+    renamed = pd.MultiIndex.from_arrays([np.where((codes == code) & (dates > rebalance_date[2]), code + '_new', codes), dates],
+                                        names = ['code', 'date'])
+    as_new_stock = SFPortfolio(factors['factor_0'].set_axis(renamed), hist_data.set_axis(renamed), balance_time = 20)
+    portfolio.statistics()
+    as_new_stock.statistics()
+    pd.testing.assert_frame_equal(portfolio.returns, as_new_stock.returns, check_freq = False, rtol = 1e-10)
+    pd.testing.assert_frame_equal(portfolio._IC_data, as_new_stock._IC_data, check_freq = False, rtol = 1e-10)
+    different = (portfolio.returns - expected.returns).abs().max(axis = 1) > 1e-12
+    assert list(different.index[different]) == [rebalance_date[2]]
+
+def test_unsupported_interface(sources):
+    portfolio = streaming.StreamingSFPortfolio(*sources, balance_time = 20)
+    assert not hasattr(portfolio, 'daily_returns')
+    assert not hasattr(portfolio, 'holding_returns')
+    with pytest.raises(TypeError):
+        portfolio.update(None, None)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 25 19:22:14 2026
+
+@author: lenovo
+"""
+import os
+
+import pandas as pd
+import numpy as np
+import pytest
+
+import utils
+import trading_calendar
+
+DAYS = pd.date_range('2021-01-01', '2021-03-31')
+
+def write_csv(path, end_date = '2021-03-15'):
+    '''
+    周末和2月的前5天休市，只写到end_date
+    '''
+    days = DAYS[DAYS <= end_date]
+    is_trading_day = ((days.dayofweek < 5) & ~((days.month == 2) & (days.day <= 5))).astype(int)
+    pd.DataFrame({'date':days.strftime('%Y-%m-%d'), 'is_trading_day':is_trading_day}).to_csv(path, index = False)
+    return days[is_trading_day == 1]
+
+@pytest.fixture
+def calendar_files(tmp_path):
+    csv_path = str(tmp_path / 'calendar.csv')
+    cache_path = str(tmp_path / 'cache' / 'calendar.npy')
+    return csv_path, cache_path, write_csv(csv_path)
+
+def test_cache(calendar_files):
+    csv_path, cache_path, trade_days = calendar_files
+    calendar = trading_calendar.TradingCalendar.from_csv(csv_path, cache_path = cache_path)
+    assert os.path.isfile(cache_path)
+    pd.testing.assert_index_equal(calendar.dates, pd.DatetimeIndex(trade_days, name = 'date'))
+    #有缓存时不再读取数据源
+    os.remove(csv_path)
+    cached = trading_calendar.TradingCalendar.from_csv(csv_path, cache_path = cache_path)
+    pd.testing.assert_index_equal(cached.dates, calendar.dates)
+
+def test_refresh(calendar_files):
+    csv_path, cache_path, trade_days = calendar_files
+    trading_calendar.TradingCalendar.from_csv(csv_path, cache_path = cache_path)
+    new_trade_days = write_csv(csv_path, end_date = '2021-03-31')
+    calendar = trading_calendar.TradingCalendar.from_csv(csv_path, cache_path = cache_path)
+    assert len(calendar) == len(trade_days)
+    calendar.refresh()
+    assert len(calendar) == len(new_trade_days)
+    assert len(trading_calendar.TradingCalendar.from_csv(csv_path, cache_path = cache_path)) == len(new_trade_days)
+    with pytest.raises(ValueError):
+        trading_calendar.TradingCalendar(trade_days).refresh()
+
+def test_queries(calendar_files):
+    csv_path, cache_path, trade_days = calendar_files
+    calendar = trading_calendar.TradingCalendar.from_csv(csv_path)
+    assert calendar.is_trading_day('2021-01-04')
+    assert not calendar.is_trading_day('2021-01-02')
+    assert not calendar.is_trading_day('2021-02-03')
+    np.testing.assert_array_equal(calendar.is_trading_day(['2021-01-04', '2021-01-09', '2030-01-01']), [True, False, False])
+
+    #跨过2月初的休市
+    assert calendar.offset('2021-01-29', 1) == pd.Timestamp('2021-02-08')
+    assert calendar.offset('2021-02-08', -1) == pd.Timestamp('2021-01-29')
+    pd.testing.assert_index_equal(calendar.offset(['2021-01-04', '2021-01-05'], 2),
+                                  pd.DatetimeIndex(['2021-01-06', '2021-01-07'], name = 'date'))
+    with pytest.raises(ValueError):
+        calendar.offset('2021-01-02', 1)
+    with pytest.raises(ValueError):
+        calendar.offset('2021-03-15', 1)
+
+    assert calendar.next_trading_day('2021-01-29') == pd.Timestamp('2021-02-08')
+    assert calendar.next_trading_day('2021-02-03') == pd.Timestamp('2021-02-08')
+    assert calendar.previous_trading_day('2021-02-08') == pd.Timestamp('2021-01-29')
+    assert calendar.previous_trading_day('2021-01-09') == pd.Timestamp('2021-01-08')
+    with pytest.raises(ValueError):
+        calendar.previous_trading_day(trade_days[0])
+
+    pd.testing.assert_index_equal(calendar.range('2021-01-30', '2021-02-09'),
+                                  pd.DatetimeIndex(['2021-02-08', '2021-02-09'], name = 'date'))
+    assert len(calendar.range('2021-02-01', '2021-02-05')) == 0
+
+def test_get_trade_date_before(calendar_files, monkeypatch):
+    csv_path, cache_path, trade_days = calendar_files
+    monkeypatch.setattr(trading_calendar, '_default_calendar', None)
+    trading_calendar.set_default_calendar(trading_calendar.TradingCalendar.from_csv(csv_path))
+    assert utils.get_trade_date_before(pd.Timestamp('2021-02-09'), 2) == pd.Timestamp('2021-01-29')
+    dates = [trade_days[10], trade_days[30]]
+    assert utils.get_trade_date_before(dates, 5) == [trade_days[5], trade_days[25]]
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 15:02:37 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import numpy as np
+
+import turnover
+from SingleFactorAnalysis import SFPortfolio
+
+def test_long_short_turnover_missing_group():
+    dates = pd.bdate_range('2020-01-01', periods = 4, name = 'date')
+    turn = pd.DataFrame({1:[0.2, 0.4, 0.6], 2:[0.1, 0.1, 0.1], 3:[0.3, np.nan, 0.5]}, index = dates[1:])
+    periods = turnover.annual_periods(dates)
+    #最后一组从来没有股票
+    assert np.isnan(turnover.long_short_turnover(turn, 5, dates))
+    #最后一组部分调仓日没有股票，这些调仓日不计入
+    assert np.isclose(turnover.long_short_turnover(turn, 3, dates), (0.5 + 1.1) / 2 * periods)
+
+def test_turnover_with_empty_top_group(panel):
+    '''
+    中证500成分按行业分组，行业内只有一只股票时都分到第1组，最后一组可能一直没有股票
+    '''
+    hist_data, factors = panel
+    portfolio = SFPortfolio(factors['factor_0'], hist_data, balance_time = 20, subset = 'is_zz500',
+                            select_from_industry = True, group_num = 5)
+    assert 5 not in portfolio.group_turnover().columns
+    assert np.isnan(portfolio.turnover())
+    assert np.isnan(portfolio.statistics()['Turnover'])
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 13:48:21 2026
+
+@author: lenovo
+"""
+import pandas as pd
+import pytest
+
+from SingleFactorAnalysis import SFPortfolio
+
+#第一次构建使用前150个交易日，之后依次追加的区间，最后一个区间到数据结束
+SPLITS = [150, 151, 200, None]
+
+def _between(data, dates, start, end):
+    date = data.index.get_level_values('date')
+    return data[(date >= dates[start]) & ((date < dates[end]) if end is not None else True)]
+
+def _compute(portfolio):
+    portfolio._cal_returns()
+    portfolio._IC()
+    portfolio.t_values()
+    portfolio.group_turnover()
+
+def _assert_same(portfolio, expected, holding = True):
+    pd.testing.assert_frame_equal(portfolio._sub_data, expected._sub_data)
+    pd.testing.assert_frame_equal(portfolio.returns, expected.returns)
+    pd.testing.assert_frame_equal(portfolio._IC_data, expected._IC_data)
+    pd.testing.assert_series_equal(portfolio.IC(), expected.IC())
+    assert portfolio.t_values() == expected.t_values()
+    pd.testing.assert_frame_equal(portfolio.group_turnover(), expected.group_turnover())
+    assert portfolio.turnover() == expected.turnover()
+    pd.testing.assert_frame_equal(portfolio.daily_returns, expected.daily_returns)
+    if holding:
+        pd.testing.assert_frame_equal(portfolio.holding_returns, expected.holding_returns)
+
+@pytest.mark.parametrize('balance_time', [20, 7])
+@pytest.mark.parametrize('weights', ['EW', 'MV'])
+@pytest.mark.parametrize('saved', [False, True])
+def test_update_matches_full_recompute(panel, tmp_path, balance_time, weights, saved):
+    hist_data, factors = panel
+    factors = factors['factor_0']
+    dates = hist_data.index.get_level_values('date').unique().sort_values()
+    expected = SFPortfolio(factors, hist_data, balance_time = balance_time, weights = weights)
+    _compute(expected)
+
+    portfolio = SFPortfolio(_between(factors, dates, 0, SPLITS[0]), _between(hist_data, dates, 0, SPLITS[0]),
+                            balance_time = balance_time, weights = weights)
+    _compute(portfolio)
+    for start, end in zip(SPLITS[:-1], SPLITS[1:]):
+        if saved:
+            portfolio.save(str(tmp_path / 'portfolio.pkl'))
+            portfolio = SFPortfolio.load(str(tmp_path / 'portfolio.pkl'))
+        portfolio.update(_between(factors, dates, start, end), _between(hist_data, dates, start, end))
+    #load之后只保留下一次update需要的日度数据，持有期的逐日收益只能在没有保存过的对象上比较
+    _assert_same(portfolio, expected, holding = not saved)
+
+def test_update_before_computing(panel):
+    '''
+    还没有计算任何结果时update，之后的结果也与重新构建相同
+    '''
+    hist_data, factors = panel
+    factors = factors['factor_0']
+    dates = hist_data.index.get_level_values('date').unique().sort_values()
+    expected = SFPortfolio(factors, hist_data, balance_time = 10)
+    portfolio = SFPortfolio(_between(factors, dates, 0, 100), _between(hist_data, dates, 0, 100), balance_time = 10)
+    portfolio.update(_between(factors, dates, 100, None), _between(hist_data, dates, 100, None))
+    _compute(expected)
+    _compute(portfolio)
+    _assert_same(portfolio, expected)